@@ -1,12 +1,39 @@
-﻿from fastapi import FastAPI, HTTPException
+﻿from fastapi import FastAPI, File, HTTPException, Request, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
-from ingest.ingest import ResumeIngestor
-import uvicorn
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, conint
+from typing import List, Dict, Any, Literal, Optional, Union
+from contextlib import asynccontextmanager
+from ingest.jobs import IngestAlreadyRunning, IngestJobManager, IngestProgress
+from app.deps import embeddings_manager, vectorstore_manager
+from app.executor import BoundedExecutor, ExecutorSaturated
+from app.filters import UnknownFilterField
+from app.http_metrics import PROFILING_ENABLED, MetricsMiddleware, TimedJSONResponse, profiles
+from app.metrics import registry
+from app.shards import ShardLayout
+import asyncio
+import itertools
+import json
+import os
+import threading
 import traceback
 
-app = FastAPI(title='Resume RAG Assistant', version='1.0.0')
+# 1 = load and warm up before serving (the port opens late); by default the
+# port opens at once and /health/ready turns 200 when loading is done
+STARTUP_BLOCKING = os.getenv('STARTUP_BLOCKING', '0') == '1'
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if RAG_AVAILABLE:
+        if STARTUP_BLOCKING:
+            await asyncio.to_thread(rag_system.start)
+        else:
+            _start_rag()
+    yield
+
+app = FastAPI(title='Resume RAG Assistant', version='1.0.0', default_response_class=TimedJSONResponse,
+              lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -17,6 +44,34 @@ app.add_middleware(
     allow_headers=['*'],
 )
 
+# Blocking RAG work runs on a bounded thread pool so the event loop stays free
+# for /health and other requests. Ingestion runs as background jobs on their
+# own threads, so a long run never takes threads away from queries.
+search_executor = BoundedExecutor(
+    'search',
+    max_workers=int(os.getenv('RAG_WORKERS', '4')),
+    max_queue=int(os.getenv('RAG_QUEUE_DEPTH', '64')),
+)
+# Status files under the store, so every API worker can answer /ingest/{job_id}
+ingest_jobs = IngestJobManager(status_dir=os.path.join(vectorstore_manager.vector_store_path, 'ingest_jobs'))
+registry.collected('executor_in_flight', 'Tasks running or queued on the executor', ('executor',),
+                   lambda: {(search_executor.name,): search_executor.stats()['in_flight']})
+registry.collected('executor_rejected_total', 'Tasks rejected with 503 because the executor was full', ('executor',),
+                   lambda: {(search_executor.name,): search_executor.stats()['rejected']}, kind='counter')
+registry.collected('embedding_cache_entries', 'Entries in the on-disk embedding cache', (),
+                   lambda: {(): (embeddings_manager.cache_stats() or {}).get('entries')})
+registry.collected('embedding_cache_requests_total', 'Lookups in the on-disk embedding cache', ('result',),
+                   lambda: {(result,): (embeddings_manager.cache_stats() or {}).get(result + 's')
+                            for result in ('hit', 'miss')}, kind='counter')
+
+@app.exception_handler(ExecutorSaturated)
+async def executor_saturated_handler(request: Request, exc: ExecutorSaturated):
+    return JSONResponse(status_code=503, content={'detail': str(exc)}, headers={'Retry-After': '1'})
+
+@app.exception_handler(UnknownFilterField)
+async def unknown_filter_field_handler(request: Request, exc: UnknownFilterField):
+    return JSONResponse(status_code=400, content={'detail': str(exc)})
+
 # Try to import RAG system
 RAG_AVAILABLE = False
 rag_system = None
@@ -24,14 +79,49 @@ rag_system = None
 try:
     from app.rag import rag_system
     RAG_AVAILABLE = True
-    print('✅ RAG system loaded successfully')
 except ImportError as e:
     print(f'❌ Failed to import RAG system: {e}')
     traceback.print_exc()
 
+def _start_rag():
+    """Load the model and indexes on a background thread, once"""
+    if rag_system.state == 'idle':
+        threading.Thread(target=rag_system.start, name='rag-startup', daemon=True).start()
+
+def _readiness() -> Dict[str, Any]:
+    if not RAG_AVAILABLE:
+        return {'ready': False, 'state': 'unavailable'}
+    return {
+        'ready': rag_system.ready,
+        'state': rag_system.state,
+        'error': rag_system.startup_error,
+        'startup_seconds': rag_system.startup_seconds,
+        'model_loaded': embeddings_manager.loaded,
+        'shards_loaded': sorted(rag_system.stores),
+    }
+
+def _require_ready():
+    """503 with Retry-After until the model and indexes are loaded and warmed up"""
+    if not RAG_AVAILABLE or rag_system.ready:
+        return
+    # Also covers servers run without the lifespan (lifespan='off')
+    _start_rag()
+    detail = f'RAG system is starting ({rag_system.state})' if rag_system.state != 'failed' else \
+        f'RAG system failed to start: {rag_system.startup_error}'
+    raise HTTPException(status_code=503, detail=detail, headers={'Retry-After': '2'})
+
+# Largest k a query may ask for; out-of-range values get a 422 before any search
+MAX_QUERY_K = int(os.getenv('MAX_QUERY_K', '100'))
+
 # Pydantic models
 class QueryRequest(BaseModel):
     question: str
+    k: conint(ge=1, le=MAX_QUERY_K) = 5
+    nprobe: Optional[conint(ge=1)] = None      # IVF indexes: cells to visit
+    ef_search: Optional[conint(ge=1)] = None   # HNSW indexes: candidate list size
+    # Metadata filters, e.g. {"type": "resume"} or {"company": ["Acme", "Beta"]}
+    filters: Optional[Dict[str, Union[str, List[str]]]] = None
+    mode: Optional[Literal['dense', 'hybrid']] = None  # hybrid = dense + BM25; default SEARCH_MODE
 
 class QueryResponse(BaseModel):
     answer: str
@@ -39,10 +129,33 @@ class QueryResponse(BaseModel):
 
 class SimilarJobsRequest(BaseModel):
     job_description: str
-    k: Optional[int] = 3
+    k: conint(ge=1, le=MAX_QUERY_K) = 3
+    nprobe: Optional[conint(ge=1)] = None
+    ef_search: Optional[conint(ge=1)] = None
+    filters: Optional[Dict[str, Union[str, List[str]]]] = None
+    mode: Optional[Literal['dense', 'hybrid']] = None  # hybrid = dense + BM25; default SEARCH_MODE
+
+class MatchItemModel(BaseModel):
+    id: str
+    text: str
 
-class IngestionResponse(BaseModel):
-    success: bool
+class BulkMatchRequest(BaseModel):
+    jobs: List[MatchItemModel]
+    # Defaults to the resume files in ./data/raw
+    resumes: Optional[List[MatchItemModel]] = None
+    k: conint(ge=1, le=MAX_QUERY_K) = 10
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest]
+    stream: bool = False  # NDJSON, one line per query as each chunk completes
+
+class BatchSimilarJobsRequest(BaseModel):
+    queries: List[SimilarJobsRequest]
+    stream: bool = False
+
+class IngestJobResponse(BaseModel):
+    job_id: str
+    status: str
     message: str
 
 # Routes
@@ -52,7 +165,31 @@ async def root():
 
 @app.get('/health')
 async def health_check():
-    return {'status': 'healthy', 'rag_available': RAG_AVAILABLE}
+    # Liveness, kept for existing probes; see /health/ready for readiness
+    return {'status': 'healthy', 'rag_available': RAG_AVAILABLE, 'ready': _readiness()['ready']}
+
+@app.get('/health/live')
+async def liveness():
+    """The process answers HTTP; never waits for the model or the indexes"""
+    return {'status': 'alive'}
+
+@app.get('/health/ready')
+async def readiness():
+    """200 once the model and indexes are loaded and warmed up, 503 until then or if startup failed"""
+    state = _readiness()
+    return JSONResponse(status_code=200 if state['ready'] else 503, content=state)
+
+async def _search(submit, search, *args, **kwargs):
+    """One query, through the micro-batcher when it is on.
+
+    The batcher is fed from the event loop and its future awaited there, so
+    no search_executor thread sits waiting for a batch to fill (which would
+    cap batches at RAG_WORKERS queries); the batcher bounds its own queue.
+    Without batching the search runs on search_executor as before.
+    """
+    if rag_system.batcher is None:
+        return await search_executor.run(search, *args, **kwargs)
+    return await asyncio.wrap_future(submit(*args, **kwargs))
 
 @app.post('/query', response_model=QueryResponse)
 async def query_resume(request: QueryRequest):
@@ -61,12 +198,16 @@ async def query_resume(request: QueryRequest):
             answer='RAG system not available. Please check server logs.',
             sources=[]
         )
+    _require_ready()
     
     try:
-        print(f'🚀 Received query: {request.question}')
-        result = rag_system.simple_search(request.question)
-        print(f'✅ Query completed')
+        result = await _search(
+            rag_system.submit_simple_search, rag_system.simple_search, request.question, request.k,
+            nprobe=request.nprobe, ef_search=request.ef_search, filters=request.filters, mode=request.mode,
+        )
         return QueryResponse(**result)
+    except (ExecutorSaturated, UnknownFilterField):
+        raise
     except Exception as e:
         print(f'❌ Query failed: {e}')
         traceback.print_exc()
@@ -76,39 +217,266 @@ async def query_resume(request: QueryRequest):
 async def find_similar_jobs(request: SimilarJobsRequest):
     if not RAG_AVAILABLE:
         return {'similar_jobs': [{'error': 'RAG system not available'}]}
+    _require_ready()
     
     try:
-        similar = rag_system.get_similar_jobs(request.job_description, request.k)
+        similar = await _search(
+            rag_system.submit_similar_jobs, rag_system.get_similar_jobs, request.job_description, request.k,
+            nprobe=request.nprobe, ef_search=request.ef_search, filters=request.filters, mode=request.mode,
+        )
         return {'similar_jobs': similar}
+    except (ExecutorSaturated, UnknownFilterField):
+        raise
     except Exception as e:
         print(f'❌ Similar jobs failed: {e}')
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post('/ingest')
-async def ingest_documents():
+MAX_BATCH_QUERIES = int(os.getenv('MAX_BATCH_QUERIES', '1000'))
+BATCH_STREAM_CHUNK = int(os.getenv('BATCH_STREAM_CHUNK', '32'))
+
+async def _run_batch(search_many, queries: List[BaseModel], stream: bool):
+    """Run a list of queries through a rag_system.*_many method.
+
+    Without streaming the whole list is one executor task; with streaming it
+    is split into chunks of BATCH_STREAM_CHUNK and each result is written
+    as an NDJSON line ({"index": i, "result": ...}) as soon as its chunk is
+    done. Results are always in request order. If the executor is full when
+    a chunk's turn comes, the 200 has already been sent, so that query and
+    every later one get an {"index": i, "error": ...} line instead.
+    """
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f'At most {MAX_BATCH_QUERIES} queries per batch')
+    items = [query.dict() for query in queries]
+    # A 400 before anything runs; once a stream has started it can only stop
+    for item in items:
+        rag_system.check_filters(item['filters'])
+    if not stream:
+        return {'results': await search_executor.run(search_many, items)}
+    
+    async def lines():
+        for start in range(0, len(items), BATCH_STREAM_CHUNK):
+            try:
+                results = await search_executor.run(search_many, items[start:start + BATCH_STREAM_CHUNK])
+            except ExecutorSaturated as e:
+                for index in range(start, len(items)):
+                    yield json.dumps({'index': index, 'error': str(e)}) + '\n'
+                return
+            for offset, result in enumerate(results):
+                yield json.dumps({'index': start + offset, 'result': result}) + '\n'
+    
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+@app.post('/query/batch')
+async def query_batch(request: BatchQueryRequest):
+    if not RAG_AVAILABLE:
+        raise HTTPException(status_code=503, detail='RAG system not available')
+    _require_ready()
+    return await _run_batch(rag_system.simple_search_many, request.queries, request.stream)
+
+@app.post('/similar-jobs/batch')
+async def similar_jobs_batch(request: BatchSimilarJobsRequest):
+    if not RAG_AVAILABLE:
+        raise HTTPException(status_code=503, detail='RAG system not available')
+    _require_ready()
+    return await _run_batch(rag_system.get_similar_jobs_many, request.queries, request.stream)
+
+BULK_MATCH_CHUNK = int(os.getenv('BULK_MATCH_CHUNK', '256'))
+
+@app.post('/match/bulk')
+async def bulk_match(request: BulkMatchRequest):
+    """Top-k resumes per job and jobs per resume, streamed as NDJSON.
+
+    Records for each block of jobs are sent as soon as they are scored;
+    records for resumes follow once every job has been seen.
+    """
+    from app.matching import MatchEngine, MatchItem, resumes_from_directory
+    _require_ready()
+    jobs = [MatchItem(job.id, job.text) for job in request.jobs]
+    if request.resumes is None:
+        resumes = await search_executor.run(resumes_from_directory)
+    else:
+        resumes = [MatchItem(resume.id, resume.text) for resume in request.resumes]
+    
+    records = MatchEngine().match(jobs, resumes, request.k)
+    
+    async def lines():
+        # The scoring runs on search_executor a chunk of records at a time, so
+        # bulk matches share its limits (and 503s) with every other search
+        while True:
+            block = await search_executor.run(lambda: list(itertools.islice(records, BULK_MATCH_CHUNK)))
+            if not block:
+                break
+            for record in block:
+                yield json.dumps(record) + '\n'
+    
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
+
+@app.post('/ingest', response_model=IngestJobResponse, status_code=202)
+async def ingest_documents(full_rebuild: bool = False, shard: Optional[str] = None):
+    layout = ShardLayout.from_env()
+    if shard is not None and not layout.sharded:
+        raise HTTPException(status_code=400, detail='The vector store is not sharded (SHARD_BY=none)')
+    if shard is not None:
+        from ingest.loaders import ResumeLoader
+        # The name becomes a directory under the store (and its lock file), so
+        # only shards the data directory defines get that far
+        if shard != os.path.basename(shard) or shard not in layout.discover(ResumeLoader().data_path):
+            raise HTTPException(status_code=404, detail=f'Unknown shard {shard!r}')
+    path = layout.root if shard is None else os.path.join(layout.root, 'shards', shard)
     try:
-        ingestor = ResumeIngestor()
-        success = ingestor.ingest_documents()
-        
-        if success:
-            return IngestionResponse(success=True, message='Documents ingested successfully')
-        else:
-            return IngestionResponse(success=False, message='Failed to ingest documents')
+        job = ingest_jobs.start(path, lambda progress: _run_ingest(full_rebuild, progress, shard),
+                                within=layout.root if shard is not None else None)
+    except IngestAlreadyRunning as e:
+        raise HTTPException(status_code=409, detail={'message': str(e), 'job_id': e.job.job_id})
+    return IngestJobResponse(job_id=job.job_id, status=job.status, message='Ingestion started')
+
+@app.get('/ingest/jobs')
+async def list_ingest_jobs():
+    return {'jobs': [job.to_dict() for job in ingest_jobs.list()]}
+
+@app.get('/ingest/{job_id}')
+async def ingest_status(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail='Unknown ingest job')
+    return job.to_dict()
+
+# Largest file accepted by POST /documents
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_MB', '20')) * 1024 * 1024
+_upload_publisher = None
+_upload_publisher_lock = threading.Lock()
+
+def _uploads():
+    """Publisher for uploaded files, created on the first upload"""
+    global _upload_publisher
+    with _upload_publisher_lock:
+        if _upload_publisher is None:
+            from ingest.upload import UploadPublisher
+            _upload_publisher = UploadPublisher(
+                ingest_jobs,
+                on_accepted=lambda upload: rag_system.add_live(upload.shard, upload.chunk_ids, upload.chunks,
+                                                               upload.vectors),
+                on_published=lambda shard, chunk_ids: rag_system.reload(published={shard: chunk_ids}),
+            )
+        return _upload_publisher
+
+@app.post('/documents', status_code=201)
+async def upload_document(file: UploadFile = File(...), shard: Optional[str] = None):
+    """Ingest one PDF, DOCX, TXT, CSV or Parquet file; searchable when this returns.
+
+    The file is parsed and embedded in memory and served from a small live
+    index at once. It is written to the data directory and published in a
+    new store version in the background (other API processes see it from
+    then on); 'published' is false until that has happened.
+    """
+    from ingest.upload import InvalidUpload, UnsupportedFileType, UploadConflict
+    _require_ready()
+    data = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f'Files are limited to {MAX_UPLOAD_BYTES // (1024 * 1024)} MB')
+    publisher = await asyncio.to_thread(_uploads)
+    try:
+        upload = await search_executor.run(publisher.prepare, file.filename, data, shard)
+        # Builds the live index, so off the event loop too
+        await search_executor.run(publisher.submit, upload)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except UnsupportedFileType as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except InvalidUpload as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'shard': upload.shard, 'source': upload.source_path, 'chunk_ids': upload.chunk_ids, 'published': False}
+
+def _run_ingest(full_rebuild: bool, progress: IngestProgress, shard: Optional[str] = None) -> bool:
+    from ingest.ingest import ResumeIngestor
+    success = ResumeIngestor().ingest_documents(full_rebuild=full_rebuild, progress=progress, shard=shard)
+    if success and RAG_AVAILABLE:
+        # Serve the new index and drop results cached against the old one
+        rag_system.reload()
+    return success
+
+def _shard_store(layout: ShardLayout, shard: Optional[str]):
+    """Store of `shard`; the single store when the layout is not sharded"""
+    if not layout.sharded:
+        if shard is not None:
+            raise HTTPException(status_code=400, detail='The vector store is not sharded (SHARD_BY=none)')
+        return vectorstore_manager
+    if shard is None:
+        raise HTTPException(status_code=400, detail=f'Pass shard, one of {list(layout.shards)}')
+    if shard not in layout.shards:
+        raise HTTPException(status_code=404, detail=f'Unknown shard {shard!r}')
+    return layout.shards[shard].store
+
+def _versions(store, serving) -> Dict[str, Any]:
+    return {'current': store.current_version(), 'serving': serving, 'versions': store.list_versions()}
+
+@app.get('/index/versions')
+async def index_versions(shard: Optional[str] = None):
+    layout = ShardLayout.from_env()
+    serving = rag_system.versions if RAG_AVAILABLE else {}
+    if layout.sharded and shard is None:
+        return {'shards': {name: _versions(layout.shards[name].store, serving.get(name)) for name in layout.shards}}
+    store = _shard_store(layout, shard)
+    return _versions(store, serving.get(shard or 'default'))
+
+@app.post('/index/rollback')
+async def rollback_index(shard: Optional[str] = None):
+    store = _shard_store(ShardLayout.from_env(), shard)
+    try:
+        version = store.rollback()
     except Exception as e:
-        print(f'❌ Ingestion failed: {e}')
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=409, detail=str(e))
+    if RAG_AVAILABLE:
+        await search_executor.run(rag_system.reload)
+    return {'current': version} if shard is None else {'shard': shard, 'current': version}
+
+@app.get('/metrics')
+async def metrics():
+    """Prometheus text exposition of all counters and histograms"""
+    return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
+@app.get('/debug/profiles')
+async def list_profiles():
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail='Profiling is disabled (PROFILING_ENABLED=1 to enable)')
+    return {'profiles': profiles.ids()}
+
+@app.get('/debug/profiles/{profile_id}')
+async def get_profile(profile_id: str, format: str = 'summary'):
+    """summary: hottest frames as JSON; collapsed: stacks for flamegraph.pl or speedscope"""
+    profiler = profiles.get(profile_id) if PROFILING_ENABLED else None
+    if profiler is None:
+        raise HTTPException(status_code=404, detail='Unknown profile')
+    if format == 'collapsed':
+        return PlainTextResponse(profiler.collapsed())
+    return profiler.summary()
 
 @app.get('/status')
 async def system_status():
+    from ingest.ingest import ResumeIngestor
     ingestor = ResumeIngestor()
     return {
         'vector_store_exists': ingestor.check_existing_data(),
+        'startup': _readiness(),
+        'vector_store_version': rag_system.version if RAG_AVAILABLE else None,
         'rag_available': RAG_AVAILABLE,
-        'embeddings_type': 'Local HuggingFace'
+        'embeddings': {
+            'model': embeddings_manager.model_key,
+            'backend': embeddings_manager.backend,
+            'loaded': embeddings_manager.loaded,
+            # Socket of the shared embedding server the model runs in, if any
+            'server': embeddings_manager.server_socket or None,
+        },
+        'embedding_cache': embeddings_manager.cache_stats(),
+        'query_cache': rag_system.cache_stats() if RAG_AVAILABLE else None,
+        'search_executor': search_executor.stats(),
+        'active_ingest_jobs': [job.job_id for job in ingest_jobs.list() if job.status in ('queued', 'running')],
+        'live_uploads': rag_system.live_stats() if RAG_AVAILABLE else None,
+        'unpublished_uploads': _upload_publisher.pending() if _upload_publisher is not None else {},
     }
 
 if __name__ == '__main__':
+    import uvicorn
     print('Starting FastAPI server...')
     uvicorn.run(app, host='0.0.0.0', port=8000)
@@ -0,0 +1,131 @@
+# app/batching.py - micro-batching of concurrent query searches
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+from typing import Any, Callable, List, NamedTuple, Tuple
+
+from app.executor import ExecutorSaturated
+
+
+class _PendingQuery(NamedTuple):
+    text: str
+    k: int
+    options: Tuple[Tuple[str, Any], ...]
+    future: Future
+
+
+class QueryBatcher:
+    """Collects queries from concurrent requests and searches them together.
+
+    A background thread waits for the first query, then keeps collecting for
+    up to max_wait_ms or until max_batch_size queries are queued. The whole
+    batch goes through search_batch(texts, k) in one call - one forward pass
+    of the embedding model and one FAISS search over a matrix of queries -
+    and each caller gets its own top-k slice back. Queries with different
+    search options (e.g. nprobe) are searched as separate sub-batches. If a
+    sub-batch fails, its queries are retried one by one, so an error only
+    reaches the caller whose query caused it.
+
+    Callers should not each hold a thread while they wait (the API awaits
+    the future on the event loop), or the batch size is capped by the
+    number of threads. At most max_pending queries wait or run at once;
+    submit raises ExecutorSaturated beyond that (0 = no limit).
+    """
+
+    def __init__(self, search_batch: Callable[..., List[List[Any]]],
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0, max_pending: int = 0):
+        self.search_batch = search_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending = max_pending
+        self.batches = 0
+        self.queries = 0
+        self.rejected = 0
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, text: str, k: int, **options) -> Future:
+        # Checked here, so a bad request fails alone instead of its whole batch
+        if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+            raise ValueError(f'k must be a positive integer, got {k!r}')
+        self._ensure_started()
+        with self._pending_lock:
+            if self.max_pending and self._pending >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorSaturated(f'query batcher is saturated ({self._pending} queries pending)')
+            self._pending += 1
+        future = Future()
+        future.add_done_callback(self._release)
+        self._queue.put(_PendingQuery(text, k, tuple(sorted(options.items())), future))
+        return future
+
+    def _release(self, future: Future):
+        with self._pending_lock:
+            self._pending -= 1
+
+    def search(self, text: str, k: int, **options) -> List[Any]:
+        """Blocking search through the batcher"""
+        return self.submit(text, k, **options).result()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-batcher', daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> List[_PendingQuery]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Drops queries whose caller went away (e.g. a cancelled request)
+            batch = [item for item in self._collect() if item.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            groups = defaultdict(list)
+            for item in batch:
+                groups[item.options].append(item)
+            for options, items in groups.items():
+                self._search_group(items, dict(options))
+
+    def _search_group(self, items: List[_PendingQuery], options: dict):
+        try:
+            results = self.search_batch([item.text for item in items], max(item.k for item in items), **options)
+        except Exception as e:
+            if len(items) == 1:
+                items[0].future.set_exception(e)
+                return
+            # Find the query that failed; the others still get their results
+            for item in items:
+                self._search_group([item], options)
+            return
+        for item, result in zip(items, results):
+            item.future.set_result(result[:item.k])
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'queries': self.queries,
+            'avg_batch_size': round(self.queries / self.batches, 2) if self.batches else 0.0,
+            'pending': self._pending,
+            'rejected': self.rejected,
+        }
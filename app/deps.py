@@ -1,41 +1,277 @@
 ﻿import os
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import shutil
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+from langchain_core.documents import Document
+import faiss
+import numpy as np
 from dotenv import load_dotenv
+from app.docstore import ColumnarDocstore, RowIdMapping, has_columnar, write_columnar
+from app.embedding_cache import CachedEmbeddings, get_open_cache
+from app.filters import DEFAULT_FILTER_FIELDS, FilterIndex
+from app.lexical import BM25Index
+from app.index_factory import IndexConfig, apply_search_defaults, build_index
+
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
 
 load_dotenv()
 
+EMBEDDING_MODEL = 'sentence-transformers/all-MiniLM-L6-v2'
+NORMALIZE_EMBEDDINGS = True
+EMBEDDING_BACKENDS = ('torch', 'onnx', 'onnx-int8')
+
+# IO_FLAG_MMAP_IFC (faiss >= 1.10) also maps flat and HNSW vector storage;
+# plain IO_FLAG_MMAP only covers IVF inverted lists
+MMAP_READ_FLAGS = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
 class EmbeddingsManager:
+    """Embedding model with its on-disk cache.
+
+    EMBEDDING_BACKEND picks how the model runs on CPU: 'torch' (the
+    sentence-transformers reference), 'onnx' (ONNX Runtime, same weights)
+    or 'onnx-int8' (dynamically quantized weights; faster, slightly
+    different vectors, so it gets its own cache entries). With
+    EMBEDDING_SERVER_SOCKET set, the model runs once per host in
+    app.embedding_server and this process only keeps the cache.
+    """
+
     def __init__(self):
         self._embeddings = None
+        self._load_lock = threading.Lock()
+        self.cache_path = os.getenv('EMBEDDING_CACHE_PATH', './data/embedding_cache')
+        self.cache_max_mb = int(os.getenv('EMBEDDING_CACHE_MB', '256'))
+        self.backend = os.getenv('EMBEDDING_BACKEND', 'torch')
+        self.threads = int(os.getenv('EMBEDDING_THREADS', '0')) or None
+        self.batch_size = int(os.getenv('EMBEDDING_BATCH_SIZE', '32'))
+        self.onnx_path = os.getenv('EMBEDDING_ONNX_PATH', './data/onnx')
+        # Unix socket of `python -m app.embedding_server`: embed there instead
+        # of loading a model in every uvicorn worker
+        self.server_socket = os.getenv('EMBEDDING_SERVER_SOCKET', '')
     
-    def get_embeddings(self):
-        if self._embeddings is None:
-            self._embeddings = HuggingFaceEmbeddings(
-                model_name='sentence-transformers/all-MiniLM-L6-v2',
+    @property
+    def model_key(self) -> str:
+        """Identifies the vectors this backend produces, for the embedding cache"""
+        if self.backend == 'onnx-int8':
+            return f'{EMBEDDING_MODEL}@int8'
+        return EMBEDDING_MODEL
+    
+    def build_backend(self, backend: Optional[str] = None):
+        """The uncached embedding model for a backend (default: the configured one)"""
+        backend = backend or self.backend
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f'Unknown embedding backend {backend!r}, expected one of {EMBEDDING_BACKENDS}')
+        if backend == 'torch':
+            # Imported here: sentence-transformers pulls in torch, which only
+            # the process that actually loads the model should pay for
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            if self.threads:
+                import torch
+                torch.set_num_threads(self.threads)
+            return HuggingFaceEmbeddings(
+                model_name=EMBEDDING_MODEL,
                 model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
+                encode_kwargs={'normalize_embeddings': NORMALIZE_EMBEDDINGS, 'batch_size': self.batch_size}
             )
+        from app.onnx_embeddings import OnnxEmbeddings
+        return OnnxEmbeddings(
+            EMBEDDING_MODEL,
+            self.onnx_path,
+            quantize=backend == 'onnx-int8',
+            threads=self.threads,
+            batch_size=self.batch_size,
+            normalize=NORMALIZE_EMBEDDINGS,
+        )
+    
+    def get_embeddings(self):
+        if self._embeddings is None:
+            # Warm-up, the first query and a bulk match can all ask at once;
+            # only one of them loads the model
+            with self._load_lock:
+                if self._embeddings is None:
+                    if self.server_socket:
+                        from app.embedding_server import RemoteEmbeddings
+                        embeddings = RemoteEmbeddings(self.server_socket, self.model_key)
+                    else:
+                        embeddings = self.build_backend()
+                    if self.cache_max_mb > 0:
+                        embeddings = CachedEmbeddings(
+                            embeddings,
+                            model_name=self.model_key,
+                            normalize=NORMALIZE_EMBEDDINGS,
+                            path=self.cache_path,
+                            max_bytes=self.cache_max_mb * 1024 * 1024,
+                        )
+                    self._embeddings = embeddings
         return self._embeddings
+    
+    def get_uncached_embeddings(self):
+        """The model without the on-disk cache, for one-off texts that should not evict chunk vectors"""
+        embeddings = self.get_embeddings()
+        return embeddings.embeddings if isinstance(embeddings, CachedEmbeddings) else embeddings
+    
+    @property
+    def loaded(self) -> bool:
+        return self._embeddings is not None
+    
+    def flush_cache(self):
+        """Persist cached embeddings to disk"""
+        cache = get_open_cache(self.cache_path)
+        if cache is not None:
+            cache.flush()
+    
+    def cache_stats(self) -> Optional[Dict[str, int]]:
+        cache = get_open_cache(self.cache_path)
+        return cache.stats() if cache is not None else None
 
 class VectorStoreManager:
-    def __init__(self):
-        self.embeddings_manager = EmbeddingsManager()
-        self.vector_store_path = os.getenv('VECTOR_STORE_PATH', './data/vectorstore')
+    """Versioned FAISS store.
+
+    Every save goes into a new directory under <path>/versions/ and is
+    published by atomically rewriting <path>/CURRENT, so readers always see
+    a complete index. Older versions are kept for rollback.
+    """
+    
+    def __init__(self, vector_store_path: Optional[str] = None,
+                 embeddings_manager: Optional[EmbeddingsManager] = None):
+        # Defaults to the process-wide manager, so stores never load a second model
+        self.embeddings_manager = embeddings_manager or globals()['embeddings_manager']
+        self.vector_store_path = vector_store_path or os.getenv('VECTOR_STORE_PATH', './data/vectorstore')
+        self.keep_versions = int(os.getenv('VECTOR_STORE_KEEP_VERSIONS', '3'))
+        self.index_config = IndexConfig.from_env()
+        self.filter_fields = tuple(
+            field.strip() for field in os.getenv('FILTER_FIELDS', ','.join(DEFAULT_FILTER_FIELDS)).split(',')
+        )
+    
+    @property
+    def versions_path(self) -> str:
+        return os.path.join(self.vector_store_path, 'versions')
     
-    def get_vectorstore(self):
+    def current_version(self) -> Optional[str]:
         try:
-            return FAISS.load_local(
-                self.vector_store_path,
-                self.embeddings_manager.get_embeddings(),
-                allow_dangerous_deserialization=True
-            )
+            with open(os.path.join(self.vector_store_path, 'CURRENT'), 'r', encoding='utf-8') as file:
+                return file.read().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def current_path(self) -> str:
+        """Directory of the live index (the root itself for pre-versioning stores)"""
+        version = self.current_version()
+        if version is None:
+            return self.vector_store_path
+        return os.path.join(self.versions_path, version)
+    
+    def list_versions(self) -> List[str]:
+        if not os.path.isdir(self.versions_path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.versions_path)
+            if not name.endswith('.tmp') and os.path.isdir(os.path.join(self.versions_path, name))
+        )
+    
+    def get_vectorstore(self, version: Optional[str] = None, writable: bool = False):
+        """Open a version of the store (the current one by default).
+
+        Read-only opens memory-map the FAISS index and the columnar docstore,
+        so uvicorn workers on one host share pages through the OS cache.
+        writable=True loads everything into memory for in-place updates.
+        """
+        from langchain_community.vectorstores import FAISS
+        path = self.current_path() if version is None else os.path.join(self.versions_path, version)
+        embeddings = self.embeddings_manager.get_embeddings()
+        try:
+            if not has_columnar(path):
+                # Stores written before the columnar format
+                vectorstore = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+            elif writable:
+                docstore, index_to_docstore_id = ColumnarDocstore(path).to_in_memory()
+                index = faiss.read_index(os.path.join(path, 'index.faiss'))
+                vectorstore = FAISS(embeddings, index, docstore, index_to_docstore_id)
+            else:
+                docstore = ColumnarDocstore(path)
+                index = faiss.read_index(os.path.join(path, 'index.faiss'), MMAP_READ_FLAGS)
+                vectorstore = FAISS(embeddings, index, docstore, RowIdMapping(len(docstore)))
+            
+            # Sidecar indexes travel with the FAISS object, so a hot swap
+            # replaces them together
+            vectorstore.filter_index = vectorstore.lexical_index = None
+            vectorstore.path = path
+            if not writable:
+                vectorstore.filter_index = FilterIndex.load(path) or \
+                    FilterIndex.from_vectorstore(vectorstore, self.filter_fields)
+                vectorstore.lexical_index = BM25Index.load(path) or BM25Index.from_vectorstore(vectorstore)
         except Exception as e:
             raise Exception(f'Failed to load vector store: {e}')
+        apply_search_defaults(vectorstore.index, self.index_config)
+        return vectorstore
+    
+    def create_vectorstore(self, documents: List[Document], ids: List[str]) -> 'FAISS':
+        """New store of the configured index type; the first documents are the training sample"""
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        embeddings = self.embeddings_manager.get_embeddings()
+        vectors = np.asarray(
+            embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32
+        )
+        index = build_index(vectors.shape[1], self.index_config, vectors)
+        vectorstore = FAISS(embeddings, index, InMemoryDocstore(), {})
+        vectorstore.add_embeddings(
+            zip([doc.page_content for doc in documents], vectors.tolist()),
+            metadatas=[doc.metadata for doc in documents],
+            ids=ids,
+        )
+        return vectorstore
+    
+    def save_vectorstore(self, vectorstore, write_extras: Optional[Callable[[str], None]] = None) -> str:
+        """Write a new version and make it current. Returns the version name.
+
+        write_extras(directory) may add files (e.g. the ingest manifest) to
+        the version before it is published.
+        """
+        # Sortable by creation time, which is what rollback relies on
+        now = time.time_ns()
+        version = time.strftime('%Y%m%d-%H%M%S', time.localtime(now / 1e9)) + f'-{now % 10**9:09d}'
+        staging_path = os.path.join(self.versions_path, version + '.tmp')
+        os.makedirs(staging_path, exist_ok=True)
+        faiss.write_index(vectorstore.index, os.path.join(staging_path, 'index.faiss'))
+        write_columnar(staging_path, (
+            (doc_id, vectorstore.docstore.search(doc_id))
+            for _, doc_id in sorted(vectorstore.index_to_docstore_id.items())
+        ))
+        FilterIndex.from_vectorstore(vectorstore, self.filter_fields).save(staging_path)
+        BM25Index.from_vectorstore(vectorstore).save(staging_path)
+        if write_extras is not None:
+            write_extras(staging_path)
+        os.replace(staging_path, os.path.join(self.versions_path, version))
+        self._set_current(version)
+        self._prune_versions()
+        return version
+    
+    def rollback(self) -> str:
+        """Make the version before the current one live again"""
+        current = self.current_version()
+        older = [version for version in self.list_versions() if current is None or version < current]
+        if not older:
+            raise Exception('No previous vector store version to roll back to')
+        self._set_current(older[-1])
+        return older[-1]
+    
+    def _set_current(self, version: str):
+        pointer = os.path.join(self.vector_store_path, 'CURRENT')
+        with open(pointer + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(version)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(pointer + '.tmp', pointer)
     
-    def save_vectorstore(self, vectorstore):
-        os.makedirs(self.vector_store_path, exist_ok=True)
-        vectorstore.save_local(self.vector_store_path)
+    def _prune_versions(self):
+        current = self.current_version()
+        versions = self.list_versions()
+        for version in versions[:max(0, len(versions) - self.keep_versions)]:
+            if version != current:
+                shutil.rmtree(os.path.join(self.versions_path, version), ignore_errors=True)
 
+# One model per process: every store (and ingestion) embeds through this manager
 embeddings_manager = EmbeddingsManager()
-vectorstore_manager = VectorStoreManager()
+vectorstore_manager = VectorStoreManager(embeddings_manager=embeddings_manager)
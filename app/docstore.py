@@ -0,0 +1,118 @@
+# app/docstore.py - offset-indexed columnar docstore read lazily through mmap
+import json
+import mmap
+import os
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Tuple, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+if TYPE_CHECKING:
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+COLUMNS = ('ids', 'texts', 'metadata')
+
+
+def write_columnar(directory: str, rows: Iterable[Tuple[str, Document]]):
+    """Write (docstore id, document) rows, in FAISS position order.
+
+    Each column is one file of concatenated UTF-8 values plus an int64
+    offsets array (<column>.idx.npy, n + 1 entries), so any row can be read
+    by slicing without parsing the rest of the file.
+    """
+    files = {name: open(os.path.join(directory, f'docstore.{name}'), 'wb') for name in COLUMNS}
+    offsets: Dict[str, List[int]] = {name: [0] for name in COLUMNS}
+    try:
+        for doc_id, doc in rows:
+            values = {
+                'ids': str(doc_id).encode('utf-8'),
+                'texts': doc.page_content.encode('utf-8'),
+                'metadata': json.dumps(doc.metadata, default=str).encode('utf-8'),
+            }
+            for name, value in values.items():
+                files[name].write(value)
+                offsets[name].append(offsets[name][-1] + len(value))
+    finally:
+        for file in files.values():
+            file.close()
+    for name in COLUMNS:
+        np.save(os.path.join(directory, f'docstore.{name}.idx.npy'), np.asarray(offsets[name], dtype=np.int64))
+
+
+def has_columnar(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, 'docstore.texts.idx.npy'))
+
+
+class _Column:
+    """One variable-width column; nothing is read until a row is asked for"""
+
+    def __init__(self, directory: str, name: str):
+        self.offsets = np.load(os.path.join(directory, f'docstore.{name}.idx.npy'), mmap_mode='r')
+        path = os.path.join(directory, f'docstore.{name}')
+        self._data = b''
+        if os.path.getsize(path):
+            with open(path, 'rb') as file:
+                self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def get(self, row: int) -> str:
+        return self._data[int(self.offsets[row]):int(self.offsets[row + 1])].decode('utf-8')
+
+
+class ColumnarDocstore(Docstore):
+    """Read-only docstore addressed by FAISS row number.
+
+    Pages are shared through the OS page cache between every process that
+    opens the same version, and startup cost does not grow with the corpus.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.columns = {name: _Column(directory, name) for name in COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.columns['texts'])
+
+    def search(self, search: Union[int, str]) -> Union[str, Document]:
+        row = int(search)
+        if not 0 <= row < len(self):
+            return f'ID {search} not found.'
+        return Document(
+            page_content=self.columns['texts'].get(row),
+            metadata=json.loads(self.columns['metadata'].get(row)),
+        )
+
+    def chunk_id(self, row: int) -> str:
+        return self.columns['ids'].get(row)
+
+    def to_in_memory(self) -> Tuple['InMemoryDocstore', Dict[int, str]]:
+        """Materialize into the mutable structures langchain's FAISS expects"""
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        docs, index_to_id = {}, {}
+        for row in range(len(self)):
+            doc_id = self.chunk_id(row)
+            docs[doc_id] = self.search(row)
+            index_to_id[row] = doc_id
+        return InMemoryDocstore(docs), index_to_id
+
+
+class RowIdMapping(Mapping):
+    """Identity index_to_docstore_id for ColumnarDocstore, without a dict of n entries"""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, row: int) -> int:
+        if not 0 <= row < self.size:
+            raise KeyError(row)
+        return int(row)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.size))
+
+    def __len__(self) -> int:
+        return self.size
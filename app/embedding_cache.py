@@ -0,0 +1,218 @@
+# app/embedding_cache.py - content-addressed, memory-mapped embedding cache
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows - single process use only
+    fcntl = None
+
+KEY_BYTES = 16
+
+
+def cache_key(model_name: str, normalize: bool, text: str) -> bytes:
+    payload = f'{model_name}\0{int(normalize)}\0{text}'.encode('utf-8')
+    return hashlib.sha256(payload).digest()[:KEY_BYTES]
+
+
+class EmbeddingCache:
+    """Fixed-capacity vector store on disk, addressed by content hash.
+
+    Three memory-mapped files live in `path`:
+      vectors.f32  float32 [capacity, dim]
+      keys.bin     uint8 [capacity, 16] key per slot (all zero = empty)
+      ticks.bin    uint64 last-use clock per slot, for LRU eviction
+    The keys file doubles as the index: it is scanned once on open to rebuild
+    the key -> slot map. A slot's key is re-checked on every read, so
+    several processes can share one cache without ever returning a vector
+    for the wrong text; writes are serialized with a lock file.
+    """
+
+    def __init__(self, path: str, dim: int, capacity: int):
+        self.path = path
+        self.dim = dim
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        meta_path = os.path.join(path, 'meta.json')
+        meta = {'dim': dim, 'capacity': capacity}
+        reset = True
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as file:
+                reset = json.load(file) != meta
+        if reset:
+            for name in ('vectors.f32', 'keys.bin', 'ticks.bin'):
+                if os.path.exists(os.path.join(path, name)):
+                    os.remove(os.path.join(path, name))
+            with open(meta_path, 'w', encoding='utf-8') as file:
+                json.dump(meta, file)
+
+        self._vectors = self._open('vectors.f32', np.float32, (capacity, dim))
+        self._keys = self._open('keys.bin', np.uint8, (capacity, KEY_BYTES))
+        self._ticks = self._open('ticks.bin', np.uint64, (capacity,))
+        self._lock_path = os.path.join(path, '.lock')
+
+        occupied = np.flatnonzero(self._keys.any(axis=1))
+        occupied = occupied[np.argsort(self._ticks[occupied], kind='stable')]
+        self._slots = OrderedDict((self._keys[slot].tobytes(), int(slot)) for slot in occupied)
+        self._free = sorted(set(range(capacity)) - set(self._slots.values()), reverse=True)
+        self._clock = int(self._ticks.max()) if capacity else 0
+
+    def _open(self, name: str, dtype, shape) -> np.memmap:
+        file_path = os.path.join(self.path, name)
+        mode = 'r+' if os.path.exists(file_path) else 'w+'
+        return np.memmap(file_path, dtype=dtype, mode=mode, shape=shape)
+
+    def _file_lock(self):
+        return _FileLock(self._lock_path)
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = {}
+        with self._lock, self._file_lock():
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None or self._keys[slot].tobytes() != key:
+                    continue
+                self._clock += 1
+                self._ticks[slot] = self._clock
+                self._slots.move_to_end(key)
+                found[key] = np.array(self._vectors[slot])
+            hits = sum(key in found for key in keys)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        with self._lock, self._file_lock():
+            for key, vector in zip(keys, vectors):
+                slot = self._slots.pop(key, None)
+                if slot is None:
+                    slot = self._free.pop() if self._free else self._evict()
+                # Vector before key, so a reader never sees a key with a stale vector
+                self._vectors[slot] = vector
+                self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._clock += 1
+                self._ticks[slot] = self._clock
+                self._slots[key] = slot
+
+    def _evict(self) -> int:
+        _, slot = self._slots.popitem(last=False)
+        self._keys[slot] = 0
+        return slot
+
+    def flush(self):
+        with self._lock:
+            for array in (self._vectors, self._keys, self._ticks):
+                array.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'entries': len(self._slots),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+class _FileLock:
+    """Exclusive advisory lock on a file, shared between processes"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._file = open(self.path, 'a')
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+_open_caches: Dict[str, EmbeddingCache] = {}
+_open_caches_lock = threading.Lock()
+
+
+def open_cache(path: str, dim: int, capacity: int) -> EmbeddingCache:
+    """One EmbeddingCache per directory per process"""
+    key = os.path.abspath(path)
+    with _open_caches_lock:
+        cache = _open_caches.get(key)
+        if cache is None or cache.dim != dim or cache.capacity != capacity:
+            cache = _open_caches[key] = EmbeddingCache(path, dim, capacity)
+        return cache
+
+
+def get_open_cache(path: str) -> Optional[EmbeddingCache]:
+    return _open_caches.get(os.path.abspath(path))
+
+
+def stored_dim(path: str) -> Optional[int]:
+    meta_path = os.path.join(path, 'meta.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r', encoding='utf-8') as file:
+        return json.load(file).get('dim')
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only runs the model for texts not seen before"""
+
+    def __init__(self, embeddings: Embeddings, model_name: str, normalize: bool,
+                 path: str, max_bytes: int):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.normalize = normalize
+        self.path = path
+        self.max_bytes = max_bytes
+        self.cache: Optional[EmbeddingCache] = None
+        self._open_lock = threading.Lock()
+
+    def _get_cache(self, dim: Optional[int] = None) -> Optional[EmbeddingCache]:
+        """Open the cache; dim may be omitted if one already exists on disk"""
+        with self._open_lock:
+            if self.cache is None:
+                if dim is None:
+                    dim = stored_dim(self.path)
+                if dim is not None:
+                    self.cache = open_cache(self.path, dim, max(1, self.max_bytes // (dim * 4)))
+            return self.cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [cache_key(self.model_name, self.normalize, text) for text in texts]
+        cache = self._get_cache()
+        found = cache.get_many(keys) if cache is not None else {}
+
+        missing = list({key: i for i, key in enumerate(keys) if key not in found}.values())
+        if missing:
+            computed = np.asarray(
+                self.embeddings.embed_documents([texts[i] for i in missing]), dtype=np.float32
+            )
+            cache = self._get_cache(computed.shape[1])
+            new_keys = [keys[i] for i in missing]
+            cache.put_many(new_keys, computed)
+            found.update(zip(new_keys, computed))
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    def flush(self):
+        if self.cache is not None:
+            self.cache.flush()
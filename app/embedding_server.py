@@ -0,0 +1,386 @@
+# app/embedding_server.py - one embedding model shared by every API worker on a host
+#
+#   python -m app.embedding_server --socket ./data/embedding.sock
+#   EMBEDDING_SERVER_SOCKET=./data/embedding.sock uvicorn app.api:app --workers 4
+#
+# The server owns the model (EMBEDDING_BACKEND, EMBEDDING_THREADS as usual)
+# and batches the texts of concurrent requests into one forward pass. API
+# workers started with EMBEDDING_SERVER_SOCKET get RemoteEmbeddings from
+# EmbeddingsManager.get_embeddings() instead of loading their own copy.
+#
+# Wire format: each message is a 4-byte length and a JSON object. Texts go
+# over the socket; vectors come back through a shared-memory buffer the
+# client owns and attaches once per connection, so the reply is only
+# {"n", "dim"} and the client reads n x dim float32 values out of its buffer.
+import argparse
+import json
+import os
+import queue
+import resource
+import signal
+import socket
+import struct
+import sys
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, NamedTuple, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.metrics import SIZE_BUCKETS, registry
+
+_HEADER = struct.Struct('!I')
+MIN_BUFFER_BYTES = 1 << 20
+
+REMOTE_SECONDS = registry.histogram('embedding_server_request_seconds',
+                                    'Round trip of an embed request to the embedding server')
+REMOTE_TEXTS = registry.histogram('embedding_server_request_texts', 'Texts per embed request to the embedding server',
+                                  buckets=SIZE_BUCKETS)
+
+
+def _send(sock: socket.socket, message: dict):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks, remaining = [], size
+    while remaining:
+        chunk = sock.recv(min(remaining, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv(sock: socket.socket) -> Optional[dict]:
+    """Next message, or None once the peer has closed the connection"""
+    header = _recv_exact(sock, _HEADER.size)
+    if header is None:
+        return None
+    data = _recv_exact(sock, _HEADER.unpack(header)[0])
+    return None if data is None else json.loads(data)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open a client's buffer without taking ownership of it.
+
+    Attaching registers the segment with this process's resource tracker,
+    which would unlink it when the server exits; the client created it and
+    unlinks it itself. Python 3.13 can skip the registration (track=False);
+    older versions undo it, which assumes the server does not share a
+    tracker with its clients (run it as its own command, not a child).
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    buffer = shared_memory.SharedMemory(name=name)
+    try:
+        resource_tracker.unregister(buffer._name, 'shared_memory')
+    except Exception:
+        pass
+    return buffer
+
+
+class _PendingEmbed(NamedTuple):
+    texts: List[str]
+    future: Future
+
+
+class EmbeddingServer:
+    """Serves embed requests from local processes over a Unix socket.
+
+    One thread per connection reads requests; a single model thread takes
+    every request queued within max_wait_ms (up to max_batch_texts texts),
+    embeds them in one call and hands each connection its rows. Only that
+    thread runs the model, so its thread pool has the cores to itself
+    instead of competing with a copy in every worker.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_key: str, socket_path: str,
+                 max_batch_texts: int = 256, max_wait_ms: float = 2.0):
+        self.embeddings = embeddings
+        self.model_key = model_key
+        self.socket_path = socket_path
+        self.max_batch_texts = max_batch_texts
+        self.max_wait = max_wait_ms / 1000.0
+        self.dim = len(embeddings.embed_query('embedding server warm-up'))
+        self.connections = 0
+        self.requests = 0
+        self.batches = 0
+        self.texts = 0
+        self._queue = queue.Queue()
+        self._listener: Optional[socket.socket] = None
+
+    def stats(self) -> dict:
+        return {
+            'model': self.model_key,
+            'dim': self.dim,
+            'pid': os.getpid(),
+            'connections': self.connections,
+            'requests': self.requests,
+            'batches': self.batches,
+            'texts': self.texts,
+            'avg_batch_texts': round(self.texts / self.batches, 2) if self.batches else 0.0,
+            # ru_maxrss is KiB on Linux, bytes on macOS
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss /
+                                 (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+        }
+
+    def _bind(self) -> socket.socket:
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.remove(self.socket_path)  # left behind by a server that died
+            else:
+                raise RuntimeError(f'An embedding server is already listening on {self.socket_path}')
+            finally:
+                probe.close()
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        listener.bind(self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        listener.listen(128)
+        return listener
+
+    def serve_forever(self):
+        self._listener = self._bind()
+        threading.Thread(target=self._run_model, name='embedding-model', daemon=True).start()
+        print(f'✅ Embedding server for {self.model_key} (dim {self.dim}) listening on {self.socket_path}')
+        try:
+            while True:
+                conn, _ = self._listener.accept()
+                self.connections += 1
+                threading.Thread(target=self._serve_connection, args=(conn,), name='embedding-conn',
+                                 daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def _collect(self) -> List[_PendingEmbed]:
+        batch = [self._queue.get()]
+        size = len(batch[0].texts)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_texts:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item.texts)
+        return batch
+
+    def _run_model(self):
+        while True:
+            batch = self._collect()
+            texts = [text for item in batch for text in item.texts]
+            self.batches += 1
+            self.texts += len(texts)
+            try:
+                vectors = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            except Exception as e:
+                for item in batch:
+                    item.future.set_exception(e)
+                continue
+            start = 0
+            for item in batch:
+                item.future.set_result(vectors[start:start + len(item.texts)])
+                start += len(item.texts)
+
+    def _serve_connection(self, conn: socket.socket):
+        buffer: Optional[shared_memory.SharedMemory] = None
+        try:
+            while True:
+                message = _recv(conn)
+                if message is None:
+                    return
+                op = message.get('op')
+                if op == 'hello':
+                    _send(conn, {'model': self.model_key, 'dim': self.dim})
+                elif op == 'buffer':
+                    if buffer is not None:
+                        buffer.close()
+                    buffer = _attach(message['name'])
+                    _send(conn, {'ok': True})
+                elif op == 'embed':
+                    _send(conn, self._embed(message['texts'], buffer))
+                elif op == 'stats':
+                    _send(conn, self.stats())
+                else:
+                    _send(conn, {'error': f'Unknown op {op!r}'})
+        except (OSError, ValueError) as e:
+            print(f'❌ Embedding server connection failed: {e}')
+        finally:
+            if buffer is not None:
+                buffer.close()
+            conn.close()
+
+    def _embed(self, texts: List[str], buffer: Optional[shared_memory.SharedMemory]) -> dict:
+        if buffer is None or len(texts) * self.dim * 4 > buffer.size:
+            return {'error': 'Shared buffer missing or too small for the reply'}
+        self.requests += 1
+        future = Future()
+        self._queue.put(_PendingEmbed(texts, future))
+        try:
+            vectors = future.result()
+        except Exception as e:
+            return {'error': f'Embedding failed: {e}'}
+        np.ndarray(vectors.shape, dtype=np.float32, buffer=buffer.buf)[:] = vectors
+        return {'n': len(texts), 'dim': self.dim}
+
+
+class _Connection:
+    """One client socket and the shared buffer the server writes its vectors into"""
+
+    def __init__(self, socket_path: str, connect_timeout: float):
+        deadline = time.monotonic() + connect_timeout
+        while True:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                self.sock.connect(socket_path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                self.sock.close()
+                if time.monotonic() > deadline:
+                    raise ConnectionError(f'No embedding server on {socket_path} '
+                                          f'(start one with python -m app.embedding_server)')
+                time.sleep(0.1)
+        self.buffer: Optional[shared_memory.SharedMemory] = None
+        self._finalizer = weakref.finalize(self, _Connection._release, self.sock, [None])
+        hello = self.request({'op': 'hello'})
+        self.model, self.dim = hello['model'], hello['dim']
+
+    @staticmethod
+    def _release(sock: socket.socket, buffers: list):
+        sock.close()
+        for buffer in buffers:
+            if buffer is not None:
+                buffer.close()
+                buffer.unlink()
+
+    def request(self, message: dict) -> dict:
+        _send(self.sock, message)
+        reply = _recv(self.sock)
+        if reply is None:
+            raise ConnectionError('Embedding server closed the connection')
+        if 'error' in reply:
+            raise RuntimeError(reply['error'])
+        return reply
+
+    def _ensure_buffer(self, size: int):
+        if self.buffer is not None and self.buffer.size >= size:
+            return
+        old = self.buffer
+        self.buffer = shared_memory.SharedMemory(create=True, size=max(size, MIN_BUFFER_BYTES,
+                                                                       2 * (old.size if old else 0)))
+        self._finalizer.detach()
+        self._finalizer = weakref.finalize(self, _Connection._release, self.sock, [self.buffer])
+        self.request({'op': 'buffer', 'name': self.buffer.name})
+        if old is not None:
+            old.close()
+            old.unlink()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        self._ensure_buffer(len(texts) * self.dim * 4)
+        reply = self.request({'op': 'embed', 'texts': texts})
+        return np.ndarray((reply['n'], reply['dim']), dtype=np.float32, buffer=self.buffer.buf).copy()
+
+    def close(self):
+        self._finalizer()
+
+
+class RemoteEmbeddings(Embeddings):
+    """Embeddings computed by an EmbeddingServer on this host.
+
+    Each thread keeps its own connection and buffer, so concurrent callers
+    (search executor, batcher, ingest jobs) never wait on each other here;
+    the server batches them. model_key is checked against the server's, so
+    vectors never end up in a cache or index built for another model.
+    """
+
+    def __init__(self, socket_path: str, model_key: str, connect_timeout: float = 30.0):
+        self.socket_path = socket_path
+        self.model_key = model_key
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+    def _connection(self) -> _Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = _Connection(self.socket_path, self.connect_timeout)
+            if conn.model != self.model_key:
+                conn.close()
+                raise ValueError(f'The embedding server runs {conn.model}, this process expects {self.model_key}')
+            self._local.conn = conn
+        return conn
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        REMOTE_TEXTS.observe(len(texts))
+        with REMOTE_SECONDS.time():
+            conn = self._connection()
+            try:
+                return conn.embed(texts)
+            except (ConnectionError, OSError):
+                # Server restarted since this thread connected: reconnect once
+                self._local.conn = None
+                conn.close()
+                return self._connection().embed(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+def server_stats(socket_path: str, connect_timeout: float = 5.0) -> dict:
+    """Counters and peak memory of the embedding server on socket_path"""
+    conn = _Connection(socket_path, connect_timeout)
+    try:
+        return conn.request({'op': 'stats'})
+    finally:
+        conn.close()
+
+
+def main():
+    from app.deps import EmbeddingsManager
+
+    parser = argparse.ArgumentParser(description='Serve the embedding model to the API workers on this host')
+    parser.add_argument('--socket', default=os.getenv('EMBEDDING_SERVER_SOCKET') or './data/embedding.sock')
+    parser.add_argument('--max-batch-texts', type=int, default=int(os.getenv('EMBEDDING_SERVER_BATCH', '256')))
+    parser.add_argument('--max-wait-ms', type=float, default=float(os.getenv('EMBEDDING_SERVER_WAIT_MS', '2')))
+    args = parser.parse_args()
+
+    manager = EmbeddingsManager()
+    print(f'📦 Loading {manager.model_key} ({manager.backend})...', file=sys.stderr)
+    server = EmbeddingServer(manager.build_backend(), manager.model_key, args.socket,
+                             max_batch_texts=args.max_batch_texts, max_wait_ms=args.max_wait_ms)
+    # SIGTERM (docker stop, systemd) unwinds like Ctrl-C, so the socket file is removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
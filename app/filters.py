@@ -0,0 +1,125 @@
+# app/filters.py - inverted metadata filters applied inside the FAISS search
+import json
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+
+from app.cache import LRUCache
+
+FilterValues = Union[str, List[str]]
+DEFAULT_FILTER_FIELDS = ('type', 'source', 'company', 'section')
+
+
+def freeze_filters(filters: Optional[Dict[str, FilterValues]]) -> Optional[Tuple]:
+    """Hashable, order-independent form of a filter dict (for cache keys and batching)"""
+    if not filters:
+        return None
+    return tuple(sorted(
+        (field, tuple(sorted([values] if isinstance(values, str) else values)))
+        for field, values in filters.items()
+    ))
+
+
+class UnknownFilterField(ValueError):
+    """A filter names a metadata field that is not indexed"""
+
+
+class RowSelector:
+    """A bitmap over FAISS rows plus the faiss selector that reads it.
+
+    The selector only holds a pointer into the bitmap, so both are kept
+    together for as long as searches may use them.
+    """
+
+    def __init__(self, rows: np.ndarray, ntotal: int):
+        self.count = len(rows)
+        mask = np.zeros(ntotal, dtype=bool)
+        mask[rows] = True
+        self.bitmap = np.packbits(mask, bitorder='little')
+        self.selector = faiss.IDSelectorBitmap(ntotal, faiss.swig_ptr(self.bitmap))
+
+
+class FilterIndex:
+    """Postings lists (sorted row ids) per metadata field and value.
+
+    Built when a version is saved and stored as filters.json (value ->
+    [start, end) slice) plus filters.rows.npy, which is memory-mapped on
+    load. A filter matches rows whose value is any of the given values for
+    every given field.
+    """
+
+    def __init__(self, ntotal: int, postings: Dict[str, Dict[str, Tuple[int, int]]], rows: np.ndarray):
+        self.ntotal = ntotal
+        self.postings = postings
+        self.rows = rows
+        self._selectors = LRUCache(maxsize=int(os.getenv('FILTER_CACHE_SIZE', '256')))
+
+    @classmethod
+    def build(cls, metadatas: Iterable[Dict], fields=DEFAULT_FILTER_FIELDS) -> 'FilterIndex':
+        lists = {field: defaultdict(list) for field in fields}
+        ntotal = 0
+        for row, metadata in enumerate(metadatas):
+            ntotal = row + 1
+            for field in fields:
+                value = metadata.get(field)
+                if value is not None and value == value:  # skip None / NaN
+                    lists[field][str(value)].append(row)
+
+        postings, chunks, start = {}, [], 0
+        for field, values in lists.items():
+            postings[field] = {}
+            for value, value_rows in values.items():
+                postings[field][value] = (start, start + len(value_rows))
+                chunks.append(np.asarray(value_rows, dtype=np.int64))
+                start += len(value_rows)
+        rows = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+        return cls(ntotal, postings, rows)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore, fields=DEFAULT_FILTER_FIELDS) -> 'FilterIndex':
+        ids = (doc_id for _, doc_id in sorted(vectorstore.index_to_docstore_id.items()))
+        return cls.build((vectorstore.docstore.search(doc_id).metadata for doc_id in ids), fields)
+
+    def save(self, directory: str):
+        np.save(os.path.join(directory, 'filters.rows.npy'), self.rows)
+        with open(os.path.join(directory, 'filters.json'), 'w', encoding='utf-8') as file:
+            json.dump({'ntotal': self.ntotal, 'postings': self.postings}, file)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['FilterIndex']:
+        path = os.path.join(directory, 'filters.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        rows = np.load(os.path.join(directory, 'filters.rows.npy'), mmap_mode='r')
+        postings = {field: {value: tuple(span) for value, span in values.items()}
+                    for field, values in data['postings'].items()}
+        return cls(data['ntotal'], postings, rows)
+
+    def values(self, field: str) -> List[str]:
+        return sorted(self.postings.get(field, {}))
+
+    def matching_rows(self, filters: Dict[str, FilterValues]) -> np.ndarray:
+        result = None
+        for field, values in filters.items():
+            if field not in self.postings:
+                raise UnknownFilterField(f'Cannot filter on {field!r}; indexed fields are {sorted(self.postings)}')
+            values = [values] if isinstance(values, str) else values
+            spans = [self.postings[field].get(str(value)) for value in values]
+            parts = [self.rows[start:end] for start, end in (span for span in spans if span)]
+            field_rows = np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+            result = field_rows if result is None else np.intersect1d(result, field_rows, assume_unique=True)
+        return result
+
+    def selector(self, filters: Dict[str, FilterValues]) -> RowSelector:
+        """Selector for a filter; cached, since recruiters reuse a few filters"""
+        key = freeze_filters(filters)
+        selector = self._selectors.get(key)
+        if selector is None:
+            selector = RowSelector(self.matching_rows(filters), self.ntotal)
+            self._selectors.set(key, selector)
+        return selector
@@ -0,0 +1,84 @@
+# app/http_metrics.py - request timing, response encoding time and per-request profiling for the API
+import contextvars
+import os
+import time
+from typing import Optional
+from urllib.parse import parse_qs
+
+from fastapi.responses import JSONResponse
+
+from app.metrics import registry
+from app.profiling import ProfileStore, SamplingProfiler
+
+REQUEST_SECONDS = registry.histogram('http_request_duration_seconds', 'Time to the end of the response body',
+                                     ('method', 'route', 'status'))
+SERIALIZE_SECONDS = registry.histogram('http_response_serialize_seconds', 'JSON encoding of response bodies',
+                                       ('route',))
+# Off by default: profiles expose code paths and cost a sampler thread per request
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '2'))
+profiles = ProfileStore()
+
+_scope: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar('http_scope', default=None)
+
+
+def _route(scope: Optional[dict]) -> str:
+    """Route template ('/ingest/{job_id}'), so label values stay bounded"""
+    route = scope.get('route') if scope else None
+    return getattr(route, 'path', 'unmatched')
+
+
+def _wants_profile(scope: dict) -> bool:
+    if (b'x-profile', b'1') in scope.get('headers', ()):
+        return True
+    return parse_qs(scope.get('query_string', b'').decode('latin-1')).get('profile') == ['1']
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSONResponse that records how long encoding the body took"""
+
+    def render(self, content) -> bytes:
+        start = time.perf_counter()
+        body = super().render(content)
+        SERIALIZE_SECONDS.observe(time.perf_counter() - start, route=_route(_scope.get()))
+        return body
+
+
+class MetricsMiddleware:
+    """Times every HTTP request by route and status.
+
+    With PROFILING_ENABLED=1, a request sent with "X-Profile: 1" (or
+    ?profile=1) also runs under a SamplingProfiler; the response carries
+    X-Profile-Id, and /debug/profiles/<id> returns the stacks.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+        profiler = profile_id = None
+        if PROFILING_ENABLED and _wants_profile(scope):
+            profiler = SamplingProfiler(interval=PROFILE_INTERVAL_MS / 1000).start()
+            profile_id = profiles.add(profiler)
+
+        async def send_with_status(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+                if profile_id is not None:
+                    message['headers'] = list(message.get('headers', ())) + [(b'x-profile-id', profile_id.encode())]
+            await send(message)
+
+        token = _scope.set(scope)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+            REQUEST_SECONDS.observe(time.perf_counter() - start, method=scope['method'], route=_route(scope),
+                                    status=str(status[0]))
+            _scope.reset(token)
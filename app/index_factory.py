@@ -0,0 +1,134 @@
+# app/index_factory.py - FAISS index types for the vector store
+import os
+from typing import Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ('flat', 'ivf_flat', 'hnsw', 'ivf_pq')
+
+
+class IndexConfig:
+    """Which FAISS index to build and its default search-time knobs.
+
+    flat      exact search, cost grows linearly with chunk count
+    ivf_flat  inverted lists over k-means cells, full vectors; tune nprobe
+    hnsw      graph index, no training; tune ef_search (no deletes)
+    ivf_pq    inverted lists + product quantization, ~32x less RAM at pq_m=48
+    """
+
+    def __init__(self, index_type: str = 'flat', nlist: int = 1024, pq_m: int = 48,
+                 pq_nbits: int = 8, hnsw_m: int = 32, ef_construction: int = 200,
+                 train_size: int = 50000, nprobe: int = 16, ef_search: int = 64):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f'Unknown index type {index_type!r}, expected one of {INDEX_TYPES}')
+        self.index_type = index_type
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.train_size = train_size
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+
+    @classmethod
+    def from_env(cls) -> 'IndexConfig':
+        return cls(
+            index_type=os.getenv('INDEX_TYPE', 'flat'),
+            nlist=int(os.getenv('IVF_NLIST', '1024')),
+            pq_m=int(os.getenv('PQ_M', '48')),
+            pq_nbits=int(os.getenv('PQ_NBITS', '8')),
+            hnsw_m=int(os.getenv('HNSW_M', '32')),
+            ef_construction=int(os.getenv('HNSW_EF_CONSTRUCTION', '200')),
+            train_size=int(os.getenv('INDEX_TRAIN_SIZE', '50000')),
+            nprobe=int(os.getenv('NPROBE', '16')),
+            ef_search=int(os.getenv('EF_SEARCH', '64')),
+        )
+
+    @property
+    def needs_training(self) -> bool:
+        return self.index_type in ('ivf_flat', 'ivf_pq')
+
+
+def build_index(dim: int, config: IndexConfig, training_vectors: np.ndarray) -> faiss.Index:
+    """Create an empty index of the configured type, trained on a sample.
+
+    The number of IVF cells is capped so each gets ~39 training points (the
+    k-means minimum FAISS recommends); with too few points for PQ we fall
+    back to a flat index rather than train a useless codebook.
+    """
+    n = len(training_vectors)
+    if config.index_type == 'hnsw':
+        index = faiss.IndexHNSWFlat(dim, config.hnsw_m)
+        index.hnsw.efConstruction = config.ef_construction
+    elif config.index_type == 'ivf_flat':
+        nlist = max(1, min(config.nlist, n // 39))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+    elif config.index_type == 'ivf_pq' and n >= 2 ** config.pq_nbits and dim % config.pq_m == 0:
+        nlist = max(1, min(config.nlist, n // 39))
+        index = faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, nlist, config.pq_m, config.pq_nbits)
+    else:
+        if config.index_type == 'ivf_pq':
+            print(f'⚠️  Not enough vectors ({n}) to train IVF-PQ, using a flat index')
+        index = faiss.IndexFlatL2(dim)
+
+    if not index.is_trained:
+        index.train(np.ascontiguousarray(training_vectors, dtype=np.float32))
+    apply_search_defaults(index, config)
+    return index
+
+
+def index_type_of(index: faiss.Index) -> str:
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return 'hnsw'
+    if isinstance(index, faiss.IndexIVFPQ):
+        return 'ivf_pq'
+    if isinstance(index, faiss.IndexIVF):
+        return 'ivf_flat'
+    return 'flat'
+
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Whether langchain's FAISS.delete is safe on this index.
+
+    It assumes remove_ids renumbers the remaining vectors, which only holds
+    for flat indexes; IVF keeps the old ids and HNSW cannot remove at all.
+    """
+    return index_type_of(index) == 'flat'
+
+
+def apply_search_defaults(index: faiss.Index, config: IndexConfig):
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(config.nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.ef_search
+
+
+def search_parameters(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None,
+                      selector: Optional[faiss.IDSelector] = None) -> Optional[faiss.SearchParameters]:
+    """Per-request overrides for index.search, or None to use the index defaults.
+
+    selector restricts the search to some rows (see app/filters.py); FAISS
+    applies it while scanning, so no over-fetching is needed.
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        if not nprobe and selector is None:
+            return None
+        params = faiss.SearchParametersIVF()
+        params.nprobe = min(nprobe or index.nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        if not ef_search and selector is None:
+            return None
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search or index.hnsw.efSearch
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    if selector is not None:
+        params.sel = selector
+    return params
@@ -0,0 +1,160 @@
+# app/lexical.py - BM25 inverted index over the chunks of a vector store version
+import json
+import os
+import re
+from collections import Counter
+from typing import Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Keeps tokens like "c++", "c#", "node.js", "aws-saa-c03" in one piece
+TOKEN_PATTERN = re.compile(r'[a-z0-9][a-z0-9+#._-]*')
+# Longer tokens (hashes, base64, URLs run together) are not indexed; they
+# would widen every entry of the fixed-width term array
+MAX_TERM_LENGTH = 64
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = (token.rstrip('._-') for token in TOKEN_PATTERN.findall(text.lower()))
+    return [token for token in tokens if len(token) <= MAX_TERM_LENGTH]
+
+
+def _sorted_by_term(terms: np.ndarray, offsets: np.ndarray, rows: np.ndarray,
+                    tfs: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Postings reordered so terms are sorted, which np.searchsorted lookups need"""
+    order = np.argsort(terms, kind='stable')
+    lengths = np.diff(offsets)[order]
+    sorted_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=sorted_offsets[1:])
+    # Position in the old arrays of every posting, in the new order
+    index = np.repeat(offsets[:-1][order] - sorted_offsets[:-1], lengths) + np.arange(sorted_offsets[-1])
+    return terms[order], sorted_offsets, rows[index], tfs[index]
+
+
+def _term_array(terms: List[str]) -> np.ndarray:
+    # Fixed-width bytes; tokens are ASCII (see TOKEN_PATTERN), so byte order is term order
+    return np.array([term.encode('ascii') for term in terms], dtype=f'S{max(map(len, terms), default=1) or 1}')
+
+
+class BM25Index:
+    """Okapi BM25 over array-backed postings (CSR layout).
+
+    Postings for term t are rows[offsets[t]:offsets[t + 1]] with matching
+    term frequencies in tfs, sorted by row; row ids are FAISS row numbers,
+    so lexical and dense hits can be fused directly. terms is a sorted
+    fixed-width bytes array, and query terms are found by binary search in
+    it. Arrays are saved as .npy files and memory-mapped on load, so
+    opening an index reads nothing in proportion to the vocabulary.
+    """
+
+    def __init__(self, terms: np.ndarray, offsets: np.ndarray, rows: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.terms = terms
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.ntotal = len(doc_lengths)
+        self.avg_length = max(float(doc_lengths.mean()), 1.0) if self.ntotal else 1.0
+
+    @classmethod
+    def build(cls, texts: Iterable[str], k1: float = 1.2, b: float = 0.75) -> 'BM25Index':
+        vocabulary = {}
+        term_ids, rows, tfs, doc_lengths = [], [], [], []
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocabulary.setdefault(term, len(vocabulary)))
+                rows.append(row)
+                tfs.append(tf)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind='stable')  # stable keeps rows sorted within a term
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocabulary)), out=offsets[1:])
+        terms, offsets, rows, tfs = _sorted_by_term(
+            _term_array(list(vocabulary)),
+            offsets,
+            np.asarray(rows, dtype=np.int64)[order],
+            np.asarray(tfs, dtype=np.float32)[order],
+        )
+        return cls(terms, offsets, rows, tfs, np.asarray(doc_lengths, dtype=np.float32), k1, b)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore) -> 'BM25Index':
+        ids = (doc_id for _, doc_id in sorted(vectorstore.index_to_docstore_id.items()))
+        return cls.build(vectorstore.docstore.search(doc_id).page_content for doc_id in ids)
+
+    def save(self, directory: str):
+        for name in ('terms', 'offsets', 'rows', 'tfs', 'doc_lengths'):
+            np.save(os.path.join(directory, f'bm25.{name}.npy'), getattr(self, name))
+        with open(os.path.join(directory, 'bm25.json'), 'w', encoding='utf-8') as file:
+            json.dump({'k1': self.k1, 'b': self.b}, file)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['BM25Index']:
+        path = os.path.join(directory, 'bm25.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        arrays = {name: np.load(os.path.join(directory, f'bm25.{name}.npy'), mmap_mode='r')
+                  for name in ('terms', 'offsets', 'rows', 'tfs', 'doc_lengths')}
+        return cls(k1=data['k1'], b=data['b'], **arrays)
+
+    def _term_ids(self, query: str) -> List[int]:
+        """Vocabulary positions of the query's terms that are in the index"""
+        keys = [term.encode('ascii') for term in set(tokenize(query))]
+        # Longer keys would be truncated to the array width and could match a prefix
+        keys = [key for key in keys if len(key) <= self.terms.itemsize]
+        if not keys or not len(self.terms):
+            return []
+        positions = np.searchsorted(self.terms, np.array(keys, dtype=self.terms.dtype))
+        return [int(position) for position, key in zip(positions, keys)
+                if position < len(self.terms) and self.terms[position] == key]
+
+    def search(self, query: str, k: int, allowed_rows: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(scores, rows) of the k best matches, best first.
+
+        Only the postings of the query terms are touched, so the cost depends
+        on how common the terms are, not on the size of the corpus.
+        allowed_rows (sorted) restricts the result, e.g. to a metadata filter.
+        """
+        term_ids = self._term_ids(query)
+        if not term_ids or (allowed_rows is not None and len(allowed_rows) == 0):
+            return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+        starts, ends = self.offsets[term_ids], self.offsets[np.asarray(term_ids) + 1]
+        rows = np.concatenate([self.rows[start:end] for start, end in zip(starts, ends)])
+        tfs = np.concatenate([self.tfs[start:end] for start, end in zip(starts, ends)])
+        # idf of the query terms only, so nothing is computed over the whole vocabulary
+        df = (ends - starts).astype(np.float32)
+        idf = np.repeat(np.log1p((self.ntotal - df + 0.5) / (df + 0.5)), ends - starts).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / self.avg_length)
+        contributions = idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+        if allowed_rows is not None:
+            positions = np.minimum(np.searchsorted(allowed_rows, rows), len(allowed_rows) - 1)
+            keep = allowed_rows[positions] == rows
+            rows, contributions = rows[keep], contributions[keep]
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions).astype(np.float32)
+
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return scores[top], unique_rows[top]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Iterable[Hashable]], k: int, rrf_k: int = 60) -> List[Hashable]:
+    """Keys (rows, or (shard, row) pairs) ordered by sum of 1 / (rrf_k + rank) over the rankings, top k"""
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)[:k]
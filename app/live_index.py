@@ -0,0 +1,56 @@
+# app/live_index.py - chunks searchable before they are published in a store version
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from app.filters import DEFAULT_FILTER_FIELDS, FilterIndex
+from app.lexical import BM25Index
+
+
+class LiveSegment:
+    """Uploaded chunks of one shard that its serving version does not have yet.
+
+    Looks like the vector stores ResumeRAG searches (index, docstore,
+    index_to_docstore_id, filter_index, lexical_index), so it is searched
+    next to the shard and merged like one more shard. The index is exact
+    (flat L2) and small: it only holds uploads until the next version with
+    them is published. Segments are immutable; adding or dropping chunks
+    builds a new one, so searches holding the old segment are unaffected.
+    """
+
+    def __init__(self, ids: List[str], documents: List[Document], vectors: np.ndarray,
+                 filter_fields: Sequence[str] = DEFAULT_FILTER_FIELDS):
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        self.ids = ids
+        self.documents = documents
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.filter_fields = tuple(filter_fields)
+        self.index = faiss.IndexFlatL2(self.vectors.shape[1])
+        self.index.add(self.vectors)
+        self.docstore = InMemoryDocstore(dict(zip(ids, documents)))
+        self.index_to_docstore_id = dict(enumerate(ids))
+        self.filter_index = FilterIndex.build((doc.metadata for doc in documents), self.filter_fields)
+        self.lexical_index = BM25Index.build(doc.page_content for doc in documents)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, ids: List[str], documents: List[Document], vectors: np.ndarray) -> 'LiveSegment':
+        return LiveSegment(self.ids + list(ids), self.documents + list(documents),
+                           np.concatenate([self.vectors, np.asarray(vectors, dtype=np.float32)]), self.filter_fields)
+
+    def without(self, ids: Iterable[str]) -> Optional['LiveSegment']:
+        """This segment minus `ids` (e.g. just published), or None if nothing is left"""
+        dropped = set(ids)
+        keep = [i for i, chunk_id in enumerate(self.ids) if chunk_id not in dropped]
+        if not keep:
+            return None
+        if len(keep) == len(self.ids):
+            return self
+        return LiveSegment([self.ids[i] for i in keep], [self.documents[i] for i in keep], self.vectors[keep],
+                           self.filter_fields)
+
+    def stats(self) -> Dict[str, int]:
+        return {'chunks': len(self.ids), 'sources': len({doc.metadata.get('source') for doc in self.documents})}
@@ -0,0 +1,162 @@
+# app/matching.py - bulk scoring of job descriptions against resumes
+#
+#   python -m app.matching --jobs data/raw/jobs.csv --resumes data/raw --k 10 --out matches.jsonl
+import argparse
+import json
+import os
+import sys
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from ingest.loaders import TABULAR_EXTENSIONS, ResumeLoader
+
+
+class MatchItem(NamedTuple):
+    id: str
+    text: str
+
+
+def jobs_from_csv(file_path: str) -> List[MatchItem]:
+    """One item per row, with the same text ResumeLoader indexes for job postings"""
+    return [
+        MatchItem(f'{os.path.basename(file_path)}:{doc.metadata["row"]}', doc.page_content)
+        for doc in ResumeLoader().load_file(file_path)
+    ]
+
+
+def resumes_from_directory(data_path: str = './data/raw', mode: Optional[str] = None) -> List[MatchItem]:
+    """One item per resume file (pages joined); job feeds (CSV, Parquet) are skipped.
+
+    With SHARD_BY=tenant (or mode='tenant') the files are in one
+    subdirectory per tenant, as ingest expects them.
+    """
+    loader = ResumeLoader(data_path)
+    if (mode or os.getenv('SHARD_BY', 'none')) == 'tenant':
+        tenants = sorted(name for name in os.listdir(data_path)
+                         if os.path.isdir(os.path.join(data_path, name))) if os.path.isdir(data_path) else []
+        files = [path for tenant in tenants for path in ResumeLoader(os.path.join(data_path, tenant)).list_files()]
+    else:
+        files = loader.list_files()
+    paths = [path for path in files if not path.lower().endswith(TABULAR_EXTENSIONS)]
+    return [
+        MatchItem(loaded.file_path, '\n'.join(doc.page_content for doc in loaded.documents))
+        for loaded in loader.iter_files(paths)
+        if loaded.error is None and loaded.documents
+    ]
+
+
+class TopK:
+    """Running top-k (score, column) per row, merged one score block at a time"""
+
+    def __init__(self, rows: int, k: int):
+        self.k = k
+        self.scores = np.full((rows, k), -np.inf, dtype=np.float32)
+        self.ids = np.full((rows, k), -1, dtype=np.int64)
+
+    def update(self, block: np.ndarray, column_offset: int, row_offset: int = 0):
+        rows = slice(row_offset, row_offset + block.shape[0])
+        columns = np.broadcast_to(np.arange(column_offset, column_offset + block.shape[1]), block.shape)
+        scores = np.concatenate([self.scores[rows], block], axis=1)
+        ids = np.concatenate([self.ids[rows], columns], axis=1)
+        best = np.argpartition(-scores, self.k - 1, axis=1)[:, :self.k]
+        self.scores[rows] = np.take_along_axis(scores, best, axis=1)
+        self.ids[rows] = np.take_along_axis(ids, best, axis=1)
+
+    def ranked(self, row: int):
+        order = np.argsort(-self.scores[row], kind='stable')
+        return [(int(i), float(s)) for i, s in zip(self.ids[row][order], self.scores[row][order]) if i != -1]
+
+
+class MatchEngine:
+    """Cosine top-k between every job and every resume, in both directions.
+
+    Jobs are embedded and scored block_size at a time against the resume
+    matrix, itself split into blocks, so only a block_size x block_size
+    score matrix exists at once; memory is O((N + M) * k + M * dim), never
+    O(N * M). Top-k for each job is yielded as soon as its block is done,
+    top-k for each resume once all jobs have been seen.
+    """
+
+    def __init__(self, embeddings=None, block_size: Optional[int] = None, batch_size: Optional[int] = None):
+        if embeddings is None:
+            from app.deps import embeddings_manager
+            # Bulk texts are seen once; cached, they would push chunk vectors out
+            embeddings = embeddings_manager.get_uncached_embeddings()
+        self.embeddings = embeddings
+        self.block_size = block_size or int(os.getenv('MATCH_BLOCK_SIZE', '1024'))
+        self.batch_size = batch_size or int(os.getenv('MATCH_EMBED_BATCH_SIZE', '256'))
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = [
+            np.asarray(self.embeddings.embed_documents(texts[start:start + self.batch_size]), dtype=np.float32)
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        vectors = np.concatenate(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def match(self, jobs: List[MatchItem], resumes: List[MatchItem], k: int = 10) -> Iterator[dict]:
+        """Yield {'kind': 'job' | 'resume', 'id', 'matches': [{'id', 'score'}]} records"""
+        # Checked here, not in the generator, so a bad k fails before any output
+        if isinstance(k, bool) or not isinstance(k, int) or k < 1:
+            raise ValueError(f'k must be a positive integer, got {k!r}')
+        return self._match(jobs, resumes, k)
+
+    def _match(self, jobs: List[MatchItem], resumes: List[MatchItem], k: int) -> Iterator[dict]:
+        if not jobs or not resumes:
+            return
+        resume_vectors = self.embed([resume.text for resume in resumes])
+        per_resume = TopK(len(resumes), min(k, len(jobs)))
+
+        for job_start in range(0, len(jobs), self.block_size):
+            job_block = jobs[job_start:job_start + self.block_size]
+            job_vectors = self.embed([job.text for job in job_block])
+            per_job = TopK(len(job_block), min(k, len(resumes)))
+            for resume_start in range(0, len(resumes), self.block_size):
+                scores = job_vectors @ resume_vectors[resume_start:resume_start + self.block_size].T
+                per_job.update(scores, resume_start)
+                per_resume.update(scores.T, job_start, row_offset=resume_start)
+            for i, job in enumerate(job_block):
+                yield _record('job', job.id, per_job.ranked(i), resumes)
+
+        for i, resume in enumerate(resumes):
+            yield _record('resume', resume.id, per_resume.ranked(i), jobs)
+
+
+def _record(kind: str, item_id: str, ranked, candidates: List[MatchItem]) -> dict:
+    return {
+        'kind': kind,
+        'id': item_id,
+        'matches': [{'id': candidates[i].id, 'score': round(score, 6)} for i, score in ranked],
+    }
+
+
+def write_ndjson(records: Iterable[dict], file):
+    for record in records:
+        file.write(json.dumps(record) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score every job against every resume')
+    parser.add_argument('--jobs', required=True, help='CSV or Parquet feed of job postings (see JOB_COLUMN_MAP)')
+    parser.add_argument('--resumes', default='./data/raw', help='directory of resume files')
+    parser.add_argument('--k', type=int, default=10, help='matches kept per job and per resume')
+    parser.add_argument('--block-size', type=int, default=None)
+    parser.add_argument('--out', help='NDJSON output file (default: stdout)')
+    args = parser.parse_args()
+
+    jobs = jobs_from_csv(args.jobs)
+    resumes = resumes_from_directory(args.resumes)
+    print(f'📊 Matching {len(jobs)} jobs against {len(resumes)} resumes', file=sys.stderr)
+    engine = MatchEngine(block_size=args.block_size)
+    records = engine.match(jobs, resumes, args.k)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as file:
+            write_ndjson(records, file)
+    else:
+        write_ndjson(records, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# app/onnx_embeddings.py - the sentence-transformers model on ONNX Runtime, optionally int8
+import contextlib
+import os
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+INPUT_NAMES = ('input_ids', 'attention_mask', 'token_type_ids')
+
+
+def onnx_model_dir(base_path: str, model_name: str) -> str:
+    return os.path.join(base_path, model_name.replace('/', '__'))
+
+
+@contextlib.contextmanager
+def _export_lock(directory: str):
+    """Serializes exports into `directory` across processes (e.g. uvicorn workers starting together)"""
+    os.makedirs(directory, exist_ok=True)
+    try:
+        import fcntl
+    except ImportError:  # Windows: concurrent exports still write separate temp files
+        yield
+        return
+    with open(os.path.join(directory, '.export.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+def _temp_path(directory: str) -> str:
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.onnx.tmp')
+    os.close(fd)
+    return path
+
+
+def export_onnx(model_name: str, directory: str, quantize: bool = False) -> str:
+    """Export the transformer to ONNX once and return the model file to load.
+
+    With quantize, a copy with int8 weights (dynamic quantization: weights
+    stored as int8, activations quantized per batch at run time) is made
+    next to the float32 export. Needs torch and transformers, which
+    sentence-transformers already installs, plus onnx
+    (requirements-onnx.txt). Concurrent callers wait for one export.
+    """
+    fp32_path = os.path.join(directory, 'model.onnx')
+    int8_path = os.path.join(directory, 'model.int8.onnx')
+    target = int8_path if quantize else fp32_path
+    if os.path.exists(target):
+        return target
+    with _export_lock(directory):
+        # Another process may have finished the export while we waited
+        if not os.path.exists(fp32_path):
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+
+            print(f'📦 Exporting {model_name} to ONNX...')
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            model = AutoModel.from_pretrained(model_name).eval()
+            sample = tokenizer(['export sample'], return_tensors='pt')
+            tmp_path = _temp_path(directory)
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    tuple(sample[name] for name in INPUT_NAMES),
+                    tmp_path,
+                    input_names=list(INPUT_NAMES),
+                    output_names=['last_hidden_state'],
+                    dynamic_axes={name: {0: 'batch', 1: 'sequence'} for name in INPUT_NAMES + ('last_hidden_state',)},
+                    opset_version=14,
+                )
+            tokenizer.save_pretrained(directory)
+            os.replace(tmp_path, fp32_path)
+
+        if quantize and not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            print('📦 Quantizing ONNX model to int8...')
+            tmp_path = _temp_path(directory)
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+    return target
+
+
+class OnnxEmbeddings(Embeddings):
+    """Mean-pooled sentence embeddings from an ONNX Runtime session.
+
+    Same pooling and normalization as sentence-transformers, so vectors
+    match the PyTorch model to float tolerance (fp32) or closely (int8;
+    check with python -m bench.embedding_backends). Texts are sorted by
+    length before batching so each batch pads to a similar length.
+    """
+
+    def __init__(self, model_name: str, base_path: str, quantize: bool = False, threads: Optional[int] = None,
+                 batch_size: int = 32, normalize: bool = True, max_length: int = 256):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError('The ONNX embedding backends need onnxruntime and onnx: '
+                              'pip install -r requirements-onnx.txt') from e
+        from transformers import AutoTokenizer
+
+        directory = onnx_model_dir(base_path, model_name)
+        model_path = export_onnx(model_name, directory, quantize)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(directory)
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.max_length = max_length
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors='np')
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+        hidden = self.session.run(None, feeds)[0]
+        mask = encoded['attention_mask'][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+        return pooled
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        order = np.argsort([len(text) for text in texts], kind='stable')
+        vectors = np.empty((len(texts), 0), dtype=np.float32)
+        for start in range(0, len(texts), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            batch = self._embed_batch([texts[i] for i in rows])
+            if vectors.shape[1] == 0:
+                vectors = np.empty((len(texts), batch.shape[1]), dtype=np.float32)
+            vectors[rows] = batch
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
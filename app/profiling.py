@@ -0,0 +1,112 @@
+# app/profiling.py - opt-in sampling profiler for single requests
+import collections
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+# Frames that only mean "this thread is idle" (pool workers, the batcher, the event loop)
+_IDLE_FRAMES = {('threading', 'wait'), ('threading', '_wait_for_tstate_lock'), ('selectors', 'select'),
+                ('queue', 'get'), ('thread', '_worker')}
+
+
+def _module(code) -> str:
+    return os.path.splitext(os.path.basename(code.co_filename))[0]
+
+
+class SamplingProfiler:
+    """Samples the Python stacks of every thread while one request runs.
+
+    A daemon thread reads sys._current_frames() every interval and counts
+    each stack in collapsed form ("thread;module:function;... count"), which
+    flamegraph.pl and speedscope read directly. Stacks parked in a wait are
+    dropped. Work for a request hops between threads (event loop, search
+    executor, query batcher, shard pool), so all threads are sampled and
+    each stack is rooted at its thread name; on a busy server concurrent
+    requests show up too.
+    """
+
+    def __init__(self, interval: float = 0.002, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.stacks: Dict[str, int] = collections.Counter()
+        self.started_at = 0.0
+        self.seconds = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'SamplingProfiler':
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'SamplingProfiler':
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.seconds = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if (_module(frame.f_code), frame.f_code.co_name) in _IDLE_FRAMES:
+                    continue
+                self.stacks[self._collapse(names.get(ident, str(ident)), frame)] += 1
+            self.samples += 1
+
+    def _collapse(self, thread_name: str, frame) -> str:
+        parts = []
+        while frame is not None and len(parts) < self.max_depth:
+            code = frame.f_code
+            parts.append(f'{_module(code)}:{code.co_name}:{frame.f_lineno}')
+            frame = frame.f_back
+        return ';'.join([thread_name] + parts[::-1])
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(self.stacks.items(), key=lambda item: -item[1]))
+
+    def summary(self, top: int = 15) -> Dict:
+        """Sample counts of the innermost frames, for a quick look without a flame graph"""
+        leaves = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return {
+            'seconds': round(self.seconds, 4),
+            'samples': self.samples,
+            'interval_ms': self.interval * 1000,
+            'top_frames': [{'frame': frame, 'samples': count} for frame, count in leaves.most_common(top)],
+        }
+
+
+class ProfileStore:
+    """The last few request profiles, fetched by id after the response went out"""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._profiles: 'collections.OrderedDict[str, SamplingProfiler]' = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profiler: SamplingProfiler) -> str:
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._profiles[profile_id] = profiler
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[SamplingProfiler]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._profiles)
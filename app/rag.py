@@ -1,76 +1,603 @@
-﻿from app.deps import vectorstore_manager
-from typing import List, Dict, Any
+﻿from app.shards import ShardLayout
+from app.batching import QueryBatcher
+from app.deps import embeddings_manager, vectorstore_manager
+from app.cache import LRUCache, normalize_query
+from app.executor import ExecutorSaturated
+from langchain_core.documents import Document
+from app.filters import UnknownFilterField, freeze_filters
+from app.index_factory import index_type_of, search_parameters
+from app.lexical import reciprocal_rank_fusion
+from app.live_index import LiveSegment
+from app.metrics import SIZE_BUCKETS, registry
+from typing import List, Dict, Any, Optional, Set, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+import faiss
+import heapq
+import itertools
+import numpy as np
+import os
+import threading
+import time
 import traceback
+from collections import defaultdict
+
+SEARCH_MODES = ('dense', 'hybrid')
+# Generic enough to exercise the tokenizer, the model and every index type
+WARM_UP_TEXTS = ('Senior Python developer with Kubernetes and AWS experience',
+                 'Data engineer who built Spark pipelines and SQL dashboards for a retail company')
+
+QUERIES = registry.counter('rag_queries_total', 'Queries answered, by kind and whether the result cache had them',
+                           ('kind', 'cache'))
+QUERY_EMBEDDING_SECONDS = registry.histogram('rag_query_embedding_seconds',
+                                             'Model time per call embedding queries missing from the cache')
+SEARCH_SECONDS = registry.histogram('rag_faiss_search_seconds', 'FAISS search per shard and batch, by strategy',
+                                    ('strategy',))
+BM25_SECONDS = registry.histogram('rag_bm25_search_seconds', 'BM25 search per shard and batch (hybrid mode)')
+DOCSTORE_SECONDS = registry.histogram('rag_docstore_lookup_seconds', 'Merging hits and loading their documents, per batch')
+BATCH_QUERIES = registry.histogram('rag_search_batch_queries', 'Queries per search_batch call', buckets=SIZE_BUCKETS)
+
+
+def _read_ahead(path: Optional[str]):
+    """Ask the OS to page in the files of a store version without blocking on it"""
+    if path is None or not hasattr(os, 'posix_fadvise') or not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        file_path = os.path.join(path, name)
+        if not os.path.isfile(file_path):
+            continue
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+
+def _merge_hits(per_shard):
+    """Heap-merge per-shard hit lists sorted by ascending key into one (shard, row) stream"""
+    return ((s, row) for _, s, row in heapq.merge(*per_shard))
+
 
 class ResumeRAG:
     def __init__(self):
+        self.query_embeddings = LRUCache(
+            maxsize=int(os.getenv('QUERY_EMBEDDING_CACHE_SIZE', '4096')),
+            ttl=None,
+        )
+        self.results = LRUCache(
+            maxsize=int(os.getenv('RESULT_CACHE_SIZE', '1024')),
+            ttl=float(os.getenv('RESULT_CACHE_TTL', '0')) or None,
+        )
+        self.batcher = None
+        if os.getenv('QUERY_BATCHING', '1') == '1':
+            self.batcher = QueryBatcher(
+                self.search_batch,
+                max_batch_size=int(os.getenv('QUERY_BATCH_SIZE', '32')),
+                max_wait_ms=float(os.getenv('QUERY_BATCH_WAIT_MS', '5')),
+                max_pending=int(os.getenv('QUERY_BATCH_MAX_PENDING', '256')),
+            )
+        self.exact_filter_threshold = int(os.getenv('FILTER_EXACT_THRESHOLD', '4096'))
+        self.search_mode = os.getenv('SEARCH_MODE', 'dense')
+        self.hybrid_candidates = int(os.getenv('HYBRID_CANDIDATES', '50'))
+        self.layout = ShardLayout.from_env()
+        self.stores: Dict[str, Any] = {}
+        self.versions: Dict[str, Optional[str]] = {}
+        # Uploaded chunks per shard, searchable until a version with them is served
+        self.live: Dict[str, LiveSegment] = {}
+        # FAISS releases the GIL, so shards are searched in parallel on threads
+        self.shard_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('SHARD_SEARCH_WORKERS', '4')), thread_name_prefix='shard-search',
+        )
+        self.generation = 0
+        self._reload_lock = threading.Lock()
+        self.watch_interval = float(os.getenv('INDEX_WATCH_INTERVAL', '2'))
+        self.warm_up_enabled = os.getenv('WARM_UP', '1') == '1'
+        # idle -> loading -> warming -> ready, or failed. Nothing is loaded
+        # until start(), so importing the API stays cheap
+        self.state = 'idle'
+        self.startup_error: Optional[str] = None
+        self.startup_seconds: Dict[str, float] = {}
+        self._start_lock = threading.Lock()
+        self._register_metrics()
+    
+    def _register_metrics(self):
+        registry.collected('rag_index_vectors', 'Vectors in the serving index', ('shard',),
+                           lambda: {(name,): store.index.ntotal for name, store in self.stores.items()})
+        registry.collected('rag_live_chunks', 'Uploaded chunks not yet in a published version', ('shard',),
+                           lambda: {(name,): len(segment) for name, segment in self.live.items()})
+        registry.collected('rag_index_generation', 'Index reloads since start', (),
+                           lambda: {(): self.generation}, kind='counter')
+        for cache_name, cache in (('query_embeddings', self.query_embeddings), ('results', self.results)):
+            registry.collected(f'rag_{cache_name}_cache_entries', f'Entries in the {cache_name} cache', (),
+                               lambda cache=cache: {(): cache.stats()['size']})
+            registry.collected(f'rag_{cache_name}_cache_requests_total', f'Lookups in the {cache_name} cache',
+                               ('result',), lambda cache=cache: {('hit',): cache.stats()['hits'],
+                                                                 ('miss',): cache.stats()['misses']},
+                               kind='counter')
+        if self.batcher is not None:
+            registry.collected('rag_batcher_batches_total', 'Batches run by the query micro-batcher', (),
+                               lambda: {(): self.batcher.batches}, kind='counter')
+            registry.collected('rag_batcher_queries_total', 'Queries run through the query micro-batcher', (),
+                               lambda: {(): self.batcher.queries}, kind='counter')
+            registry.collected('rag_batcher_rejected_total', 'Queries rejected with 503 because the batcher was full',
+                               (), lambda: {(): self.batcher.rejected}, kind='counter')
+    
+    @property
+    def ready(self) -> bool:
+        return self.state == 'ready'
+    
+    def start(self):
+        """Load every shard, warm up, then start watching for new versions.
+
+        The API runs this on a background thread from its lifespan, so the
+        port is open while the model and indexes load; readiness only flips
+        once the warm-up pass is done. Only the first call does anything.
+        """
+        with self._start_lock:
+            if self.state != 'idle':
+                return
+            self.state = 'loading'
+        started = time.perf_counter()
         try:
-            self.vectorstore = vectorstore_manager.get_vectorstore()
-            print('✅ Vector store loaded successfully')
+            self.reload()
+            loaded = time.perf_counter()
+            self.startup_seconds['load'] = round(loaded - started, 3)
+            if self.warm_up_enabled:
+                self.state = 'warming'
+                self.warm_up()
+                self.startup_seconds['warm_up'] = round(time.perf_counter() - loaded, 3)
         except Exception as e:
-            print(f'❌ Could not load vector store: {e}')
-            print('This is normal if you have not run ingestion yet')
-            self.vectorstore = None
+            self.startup_error = str(e)
+            self.state = 'failed'
+            print(f'❌ RAG startup failed: {e}')
+            traceback.print_exc()
+            return
+        if self.watch_interval > 0:
+            threading.Thread(target=self._watch_versions, name='index-watcher', daemon=True).start()
+        self.state = 'ready'
+        print(f'✅ RAG system ready in {time.perf_counter() - started:.2f}s')
+    
+    def _ensure_started(self):
+        # Used without the API lifespan (scripts, notebooks): load on first use
+        if self.state == 'idle':
+            self.start()
+    
+    def warm_up(self):
+        """One throwaway pass through the model and every serving index.
+
+        Loads the model and runs it once, so weights are paged in and the
+        runtime has picked its kernels; asks the OS to read the index files
+        ahead, then searches each index (FAISS, BM25, docstore) so the pages
+        a query touches are resident. Goes around the embedding, query and
+        result caches and the metrics, so nothing of it is served or counted.
+        """
+        embeddings = embeddings_manager.get_embeddings()
+        model = getattr(embeddings, 'embeddings', embeddings)  # the model under CachedEmbeddings
+        vectors = np.asarray(model.embed_documents(list(WARM_UP_TEXTS)), dtype=np.float32)
+        for vectorstore in self.stores.values():
+            _read_ahead(getattr(vectorstore, 'path', None))
+            index = vectorstore.index
+            if index.d != vectors.shape[1]:
+                continue
+            _, rows = index.search(vectors, min(10, max(1, index.ntotal)))
+            for row in rows.ravel():
+                if row != -1:
+                    vectorstore.docstore.search(vectorstore.index_to_docstore_id[int(row)])
+            if vectorstore.lexical_index is not None:
+                for text in WARM_UP_TEXTS:
+                    vectorstore.lexical_index.search(text, 10, None)
+    
+    @property
+    def version(self):
+        """Serving version, or {shard: version} for a sharded store"""
+        return self.versions if self.layout.sharded else self.versions.get('default')
+    
+    def reload(self, published: Optional[Dict[str, List[str]]] = None):
+        """Load the current version of every shard and swap them in.
+
+        New indexes are fully loaded before self.stores is replaced, so
+        searches already running keep their references to the old ones and
+        finish against them. Shards whose version did not change are reused;
+        a shard that fails to load keeps serving its old index.
+
+        published ({shard: chunk ids}) names uploads the new versions now
+        contain; they leave the live segments in the same swap.
+        """
+        with self._reload_lock:
+            versions = self.layout.current_versions()
+            stores = {}
+            for name, version in versions.items():
+                if name in self.stores and self.versions.get(name) == version:
+                    stores[name] = self.stores[name]
+                    continue
+                label = 'Vector store' if not self.layout.sharded else f'Shard {name}'
+                try:
+                    stores[name] = self.layout.shards[name].store.get_vectorstore(version)
+                    print(f'✅ {label} loaded successfully (version {version or "legacy"})')
+                except Exception as e:
+                    print(f'❌ Could not load {label.lower()}: {e}')
+                    if name in self.stores:
+                        stores[name], versions[name] = self.stores[name], self.versions[name]
+            if not stores:
+                print('This is normal if you have not run ingestion yet')
+            live = dict(self.live)
+            for name, chunk_ids in (published or {}).items():
+                if name in live:
+                    segment = live.pop(name).without(chunk_ids)
+                    if segment is not None:
+                        live[name] = segment
+            if stores.keys() == self.stores.keys() and all(stores[n] is self.stores[n] for n in stores) \
+                    and live == self.live:
+                return
+            self.stores, self.versions, self.live = stores, versions, live
+            # Query embeddings only depend on the model, so they stay valid.
+            # Bumping the generation also orphans results from in-flight searches.
+            self.generation += 1
+            self.results.clear()
+    
+    def add_live(self, shard: str, chunk_ids: List[str], documents: List[Document], vectors: np.ndarray):
+        """Make embedded chunks of `shard` searchable now, ahead of their next published version"""
+        with self._reload_lock:
+            # An upload may have registered a new tenant shard
+            self.layout.refresh()
+            segment = self.live.get(shard)
+            if segment is None:
+                store = self.layout.shards[shard].store
+                segment = LiveSegment(chunk_ids, documents, vectors, store.filter_fields)
+            else:
+                segment = segment.add(chunk_ids, documents, vectors)
+            self.live = {**self.live, shard: segment}
+            self.generation += 1
+            self.results.clear()
+    
+    def live_stats(self) -> Dict[str, Dict[str, int]]:
+        return {name: segment.stats() for name, segment in self.live.items()}
+    
+    def _watch_versions(self):
+        """Pick up versions published by other processes (ingest, rollback)"""
+        while True:
+            time.sleep(self.watch_interval)
+            try:
+                if self.layout.current_versions() != self.versions:
+                    self.reload()
+            except Exception as e:
+                print(f'❌ Index watcher failed: {e}')
     
-    def simple_search(self, question: str, k: int = 5) -> Dict[str, Any]:
-        print(f'🔍 Searching for: {question}')
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            'query_embeddings': self.query_embeddings.stats(),
+            'results': self.results.stats(),
+            'batching': self.batcher.stats() if self.batcher is not None else None,
+        }
+    
+    def _embed_queries(self, questions: List[str]) -> np.ndarray:
+        """Query vectors, running the model once for every question not cached"""
+        keys = [normalize_query(question) for question in questions]
+        embeddings = [self.query_embeddings.get(key) for key in keys]
+        missing = list({key: i for i, key in enumerate(keys) if embeddings[i] is None}.values())
+        if missing:
+            with QUERY_EMBEDDING_SECONDS.time():
+                computed = embeddings_manager.get_embeddings().embed_documents([keys[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                self.query_embeddings.set(keys[i], embedding)
+            by_key = {keys[i]: embedding for i, embedding in zip(missing, computed)}
+            embeddings = [by_key[key] if embedding is None else embedding
+                          for key, embedding in zip(keys, embeddings)]
+        return np.asarray(embeddings, dtype=np.float32)
+    
+    def search_batch(self, questions: List[str], k: int, nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None, filters=None, mode: str = 'dense') -> List[List[Document]]:
+        """Top-k documents for several questions with one FAISS search call per shard.
+
+        nprobe (IVF) and ef_search (HNSW) override the index defaults for
+        this call only, trading latency for recall. filters (a dict or the
+        output of freeze_filters) restricts results by metadata, inside the
+        search itself, and skips shards that cannot match. mode='hybrid' also
+        ranks the chunks with BM25 and fuses both rankings with
+        reciprocal-rank fusion, which catches exact terms (tool names,
+        certification codes) the embedding model blurs.
+
+        Shards are searched in parallel and their sorted hits merged with a
+        heap, so the merged top-k equals a search over one combined index.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f'Unknown search mode {mode!r}, expected one of {SEARCH_MODES}')
+        stores, live = self.stores, self.live
+        # A shard's live segment (uploads) is searched and merged like one more shard
+        targets = [(source[name], shard_filters) for name, shard_filters in self.layout.route(filters)
+                   for source in (stores, live) if name in source]
+        if not targets:
+            return [[] for _ in questions]
+        BATCH_QUERIES.observe(len(questions))
+        vectors = self._embed_queries(questions)
         
-        if not self.vectorstore:
-            error_msg = 'Vector store not available. Please run document ingestion first.'
-            print(f'❌ {error_msg}')
-            return {
-                'answer': error_msg,
-                'sources': []
-            }
+        def search_shard(target):
+            vectorstore, shard_filters = target
+            if mode == 'dense':
+                return self._search_index(vectorstore, vectors, k, nprobe, ef_search, shard_filters), None
+            return self._shard_candidates(vectorstore, questions, vectors, k, nprobe, ef_search, shard_filters)
         
-        try:
-            print(f'📖 Performing similarity search with k={k}')
-            docs = self.vectorstore.similarity_search(question, k=k)
-            print(f'✅ Found {len(docs)} relevant documents')
-            
-            context = '\n\n'.join([doc.page_content for doc in docs])
-            answer = f'I found these relevant sections from your resume:\n\n{context}'
-            
-            result = {
-                'answer': answer,
-                'sources': [
-                    {
-                        'source': doc.metadata.get('source', 'Unknown'),
-                        'type': doc.metadata.get('type', 'Unknown'),
-                        'content': doc.page_content[:200] + '...'
-                    }
-                    for doc in docs
-                ]
-            }
-            
-            print(f'✅ Search completed successfully')
-            return result
-            
-        except Exception as e:
-            error_msg = f'Error processing query: {e}'
-            print(f'❌ {error_msg}')
-            print('Full traceback:')
-            traceback.print_exc()
-            return {
-                'answer': error_msg,
-                'sources': []
-            }
+        if len(targets) == 1:
+            per_shard = [search_shard(targets[0])]
+        else:
+            per_shard = list(self.shard_executor.map(search_shard, targets))
+        
+        lookup_started = time.perf_counter()
+        results = []
+        for q in range(len(questions)):
+            dense = _merge_hits([
+                [(distance, s, row) for distance, row in zip(hits[0][q], hits[1][q]) if row != -1]
+                for s, (hits, _) in enumerate(per_shard)
+            ])
+            if mode == 'dense':
+                ranked = list(itertools.islice(dense, k))
+            else:
+                lexical = _merge_hits([
+                    [(-score, s, row) for score, row in zip(*lexical_hits[q])]
+                    for s, (_, lexical_hits) in enumerate(per_shard)
+                ])
+                ranked = reciprocal_rank_fusion([list(dense), list(lexical)], k)
+            docs = []
+            for s, row in ranked:
+                vectorstore = targets[s][0]
+                doc = vectorstore.docstore.search(vectorstore.index_to_docstore_id[row])
+                if isinstance(doc, Document):
+                    docs.append(doc)
+            results.append(docs)
+        DOCSTORE_SECONDS.observe(time.perf_counter() - lookup_started)
+        return results
     
-    def get_similar_jobs(self, job_description: str, k: int = 3) -> List[Dict]:
-        if not self.vectorstore:
-            return [{'error': 'Vector store not available'}]
+    def _search_index(self, vectorstore, vectors: np.ndarray, k: int, nprobe: Optional[int],
+                      ef_search: Optional[int], filters) -> Tuple[np.ndarray, np.ndarray]:
+        """(distances, rows) of the k nearest chunks per query, -1 rows padding"""
+        index = vectorstore.index
+        if not filters:
+            params = search_parameters(index, nprobe=nprobe, ef_search=ef_search)
+            with SEARCH_SECONDS.time(strategy='full'):
+                return index.search(vectors, k, params=params)
         
-        try:
-            docs = self.vectorstore.similarity_search(job_description, k=k)
-            return [
+        if vectorstore.filter_index is None:
+            raise ValueError('This vector store has no filter index')
+        selected = vectorstore.filter_index.selector(dict(filters))
+        if selected.count == 0:
+            return np.full((len(vectors), k), np.inf, dtype=np.float32), np.full((len(vectors), k), -1, dtype=np.int64)
+        if selected.count <= self.exact_filter_threshold and index_type_of(index) in ('flat', 'hnsw'):
+            # Very selective filter: scoring the few matching vectors exactly is
+            # cheaper than a full scan, and HNSW graph search misses results
+            # when most neighbours are filtered out
+            rows = vectorstore.filter_index.matching_rows(dict(filters))
+            with SEARCH_SECONDS.time(strategy='exact_subset'):
+                distances, positions = faiss.knn(vectors, index.reconstruct_batch(rows), min(k, len(rows)))
+            found = np.where(positions >= 0, rows[np.maximum(positions, 0)], -1)
+            padding = ((0, 0), (0, k - found.shape[1]))
+            return np.pad(distances, padding, constant_values=np.inf), np.pad(found, padding, constant_values=-1)
+        params = search_parameters(index, nprobe=nprobe, ef_search=ef_search, selector=selected.selector)
+        with SEARCH_SECONDS.time(strategy='filtered'):
+            return index.search(vectors, k, params=params)
+    
+    def _shard_candidates(self, vectorstore, questions: List[str], vectors: np.ndarray, k: int,
+                          nprobe: Optional[int], ef_search: Optional[int], filters):
+        """Dense and BM25 candidates of one shard for hybrid search"""
+        if vectorstore.lexical_index is None:
+            raise ValueError('This vector store has no lexical index')
+        candidates = max(k, self.hybrid_candidates)
+        dense = self._search_index(vectorstore, vectors, candidates, nprobe, ef_search, filters)
+        allowed_rows = vectorstore.filter_index.matching_rows(dict(filters)) if filters else None
+        with BM25_SECONDS.time():
+            lexical = [vectorstore.lexical_index.search(question, candidates, allowed_rows) for question in questions]
+        return dense, lexical
+    
+    def filter_fields(self) -> Set[str]:
+        """Fields every serving index can filter on, plus the shard routing fields"""
+        indexes = [source.filter_index for source in (*self.stores.values(), *self.live.values())
+                   if source.filter_index is not None]
+        if indexes:
+            fields = set.intersection(*(set(index.postings) for index in indexes))
+        else:
+            fields = set(vectorstore_manager.filter_fields)
+        for shard in self.layout.shards.values():
+            fields.update(shard.routing)
+        return fields
+    
+    def check_filters(self, filters: Optional[Dict]):
+        """Raise UnknownFilterField up front, so a bad filter fails alone and not inside a batch"""
+        if not filters:
+            return
+        fields = self.filter_fields()
+        for field in filters:
+            if field not in fields:
+                raise UnknownFilterField(f'Cannot filter on {field!r}; indexed fields are {sorted(fields)}')
+    
+    def _options(self, nprobe: Optional[int], ef_search: Optional[int], filters: Optional[Dict],
+                 mode: Optional[str]) -> Dict[str, Any]:
+        return {'nprobe': nprobe, 'ef_search': ef_search, 'filters': freeze_filters(filters),
+                'mode': mode or self.search_mode}
+    
+    @staticmethod
+    def _job_filters(filters: Optional[Dict]) -> Dict:
+        return {**(filters or {}), 'type': 'job_posting'}
+    
+    @staticmethod
+    def _search_result(docs: List[Document]) -> Dict[str, Any]:
+        context = '\n\n'.join([doc.page_content for doc in docs])
+        return {
+            'answer': f'I found these relevant sections from your resume:\n\n{context}',
+            'sources': [
                 {
-                    'content': doc.page_content,
                     'source': doc.metadata.get('source', 'Unknown'),
                     'type': doc.metadata.get('type', 'Unknown'),
+                    'content': doc.page_content[:200] + '...'
                 }
                 for doc in docs
             ]
+        }
+    
+    @staticmethod
+    def _similar_jobs_result(docs: List[Document]) -> List[Dict]:
+        return [
+            {
+                'content': doc.page_content,
+                'source': doc.metadata.get('source', 'Unknown'),
+                'type': doc.metadata.get('type', 'Unknown'),
+            }
+            for doc in docs
+        ]
+    
+    def simple_search(self, question: str, k: int = 5, nprobe: Optional[int] = None,
+                      ef_search: Optional[int] = None, filters: Optional[Dict] = None,
+                      mode: Optional[str] = None) -> Dict[str, Any]:
+        return self.submit_simple_search(question, k, nprobe, ef_search, filters, mode).result()
+    
+    def submit_simple_search(self, question: str, k: int = 5, nprobe: Optional[int] = None,
+                             ef_search: Optional[int] = None, filters: Optional[Dict] = None,
+                             mode: Optional[str] = None) -> Future:
+        """simple_search as a future; with the micro-batcher on, nothing blocks until it is awaited"""
+        self._ensure_started()
+        if not self.stores and not self.live:
+            error_msg = 'Vector store not available. Please run document ingestion first.'
+            print(f'❌ {error_msg}')
+            return self._resolved({'answer': error_msg, 'sources': []})
+        self.check_filters(filters)
+        
+        def format_error(e: Exception) -> Dict[str, Any]:
+            error_msg = f'Error processing query: {e}'
+            print(f'❌ {error_msg}')
+            print('Full traceback:')
+            traceback.print_exception(type(e), e, e.__traceback__)
+            return {'answer': error_msg, 'sources': []}
+        
+        return self._submit('query', question, k, self._options(nprobe, ef_search, filters, mode),
+                            self._search_result, format_error)
+    
+    def get_similar_jobs(self, job_description: str, k: int = 3, nprobe: Optional[int] = None,
+                         ef_search: Optional[int] = None, filters: Optional[Dict] = None,
+                         mode: Optional[str] = None) -> List[Dict]:
+        return self.submit_similar_jobs(job_description, k, nprobe, ef_search, filters, mode).result()
+    
+    def submit_similar_jobs(self, job_description: str, k: int = 3, nprobe: Optional[int] = None,
+                            ef_search: Optional[int] = None, filters: Optional[Dict] = None,
+                            mode: Optional[str] = None) -> Future:
+        """get_similar_jobs as a future, like submit_simple_search"""
+        self._ensure_started()
+        if not self.stores and not self.live:
+            return self._resolved([{'error': 'Vector store not available'}])
+        self.check_filters(filters)
+        return self._submit('similar_jobs', job_description, k,
+                            self._options(nprobe, ef_search, self._job_filters(filters), mode),
+                            self._similar_jobs_result, lambda e: [{'error': f'Failed to find similar jobs: {e}'}])
+    
+    @staticmethod
+    def _resolved(result: Any) -> Future:
+        future = Future()
+        future.set_result(result)
+        return future
+    
+    def _submit(self, kind: str, text: str, k: int, options: Dict[str, Any], format_docs, format_error) -> Future:
+        """Cached result, or a search through the micro-batcher (inline without it), formatted when done"""
+        cache_key = (kind, self.generation, normalize_query(text), k, tuple(options.items()))
+        cached = self.results.get(cache_key)
+        if cached is not None:
+            QUERIES.inc(kind=kind, cache='hit')
+            return self._resolved(cached)
+        
+        found = Future()
+        try:
+            if self.batcher is not None:
+                found = self.batcher.submit(text, k, **options)
+            else:
+                found.set_result(self.search_batch([text], k, **options)[0])
+        except ExecutorSaturated:
+            raise
         except Exception as e:
-            return [{'error': f'Failed to find similar jobs: {e}'}]
+            found.set_exception(e)
+        
+        result = Future()
+        # Cannot be cancelled from here on, so the callback below always may set it
+        result.set_running_or_notify_cancel()
+        
+        def done(found: Future):
+            try:
+                docs = found.result()
+            except Exception as e:
+                result.set_result(format_error(e))
+                return
+            QUERIES.inc(kind=kind, cache='miss')
+            formatted = format_docs(docs)
+            self.results.set(cache_key, formatted)
+            result.set_result(formatted)
+        
+        found.add_done_callback(done)
+        return result
+    
+    def simple_search_many(self, queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """simple_search for several queries, results in input order.
+
+        Each query is a dict with 'question' and optionally 'k' and the
+        simple_search options. Queries sharing options are embedded in one
+        model call and searched with one multi-query FAISS search.
+        """
+        self._ensure_started()
+        if not self.stores and not self.live:
+            error = {'answer': 'Vector store not available. Please run document ingestion first.', 'sources': []}
+            return [error for _ in queries]
+        for query in queries:
+            self.check_filters(query.get('filters'))
+        return self._search_many(
+            'query',
+            [query['question'] for query in queries],
+            [query.get('k') or 5 for query in queries],
+            [self._options(query.get('nprobe'), query.get('ef_search'), query.get('filters'), query.get('mode'))
+             for query in queries],
+            self._search_result,
+            lambda e: {'answer': f'Error processing query: {e}', 'sources': []},
+        )
+    
+    def get_similar_jobs_many(self, queries: List[Dict[str, Any]]) -> List[List[Dict]]:
+        """get_similar_jobs for several 'job_description' dicts, like simple_search_many"""
+        self._ensure_started()
+        if not self.stores and not self.live:
+            return [[{'error': 'Vector store not available'}] for _ in queries]
+        for query in queries:
+            self.check_filters(query.get('filters'))
+        return self._search_many(
+            'similar_jobs',
+            [query['job_description'] for query in queries],
+            [query.get('k') or 3 for query in queries],
+            [self._options(query.get('nprobe'), query.get('ef_search'), self._job_filters(query.get('filters')),
+                           query.get('mode'))
+             for query in queries],
+            self._similar_jobs_result,
+            lambda e: [{'error': f'Failed to find similar jobs: {e}'}],
+        )
+    
+    def _search_many(self, kind: str, texts: List[str], ks: List[int], options_list: List[Dict[str, Any]],
+                     format_docs, format_error) -> List[Any]:
+        results = [None] * len(texts)
+        groups = defaultdict(list)
+        for i, (text, k, options) in enumerate(zip(texts, ks, options_list)):
+            cache_key = (kind, self.generation, normalize_query(text), k, tuple(options.items()))
+            cached = self.results.get(cache_key)
+            if cached is not None:
+                QUERIES.inc(kind=kind, cache='hit')
+                results[i] = cached
+            else:
+                groups[tuple(options.items())].append((i, cache_key))
+        
+        # Called with a whole batch already, so this bypasses the micro-batcher
+        for options, members in groups.items():
+            try:
+                found = self.search_batch([texts[i] for i, _ in members], max(ks[i] for i, _ in members),
+                                          **dict(options))
+            except Exception as e:
+                print(f'❌ Batch search failed: {e}')
+                traceback.print_exc()
+                for i, _ in members:
+                    results[i] = format_error(e)
+                continue
+            QUERIES.inc(len(members), kind=kind, cache='miss')
+            for (i, cache_key), docs in zip(members, found):
+                results[i] = format_docs(docs[:ks[i]])
+                self.results.set(cache_key, results[i])
+        return results
 
+# Cheap to construct: the API lifespan calls rag_system.start()
 rag_system = ResumeRAG()
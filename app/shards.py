@@ -0,0 +1,144 @@
+# app/shards.py - vector store split into independently versioned shards
+import json
+import os
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from app.deps import VectorStoreManager, embeddings_manager, vectorstore_manager
+from app.filters import freeze_filters
+
+if TYPE_CHECKING:
+    from ingest.loaders import ResumeLoader
+
+SHARD_MODES = ('none', 'type', 'tenant')
+SHARDS_FILENAME = 'shards.json'
+# SHARD_BY=type: resumes and job feeds go to separate shards
+TYPE_SHARDS = {'resumes': {'type': ['resume']}, 'jobs': {'type': ['job_posting']}}
+
+
+class Shard(NamedTuple):
+    name: str
+    store: VectorStoreManager
+    # Metadata values shared by every chunk in the shard, used to route filtered queries
+    routing: Dict[str, List[str]]
+
+
+class ShardLayout:
+    """The shards making up the vector store and how files and queries map to them.
+
+    SHARD_BY=none keeps the single store at VECTOR_STORE_PATH (one shard
+    named 'default'). With 'type' or 'tenant' each shard is a complete
+    versioned store under <path>/shards/<name>, ingested, published and
+    rolled back on its own; <path>/shards.json lists them. Tenants are the
+    subdirectories of the data directory and get a 'tenant' metadata field.
+    Everything is plain files, so any number of API processes can open the
+    same layout and pick up new shard versions by watching it.
+    """
+
+    def __init__(self, root: str, mode: str = 'none'):
+        if mode not in SHARD_MODES:
+            raise ValueError(f'Unknown SHARD_BY {mode!r}, expected one of {SHARD_MODES}')
+        self.root = root
+        self.mode = mode
+        self.shards: Dict[str, Shard] = {}
+        self._manifest_mtime = None
+        if mode == 'none':
+            self.shards['default'] = Shard('default', vectorstore_manager, {})
+        elif mode == 'type':
+            for name, routing in TYPE_SHARDS.items():
+                self._add(name, routing)
+        self.refresh()
+
+    @classmethod
+    def from_env(cls) -> 'ShardLayout':
+        return cls(vectorstore_manager.vector_store_path, os.getenv('SHARD_BY', 'none'))
+
+    @property
+    def sharded(self) -> bool:
+        return self.mode != 'none'
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, SHARDS_FILENAME)
+
+    def _add(self, name: str, routing: Dict[str, List[str]]):
+        store = VectorStoreManager(os.path.join(self.root, 'shards', name), embeddings_manager)
+        self.shards[name] = Shard(name, store, routing)
+
+    def refresh(self):
+        """Pick up shards another process added to shards.json"""
+        if not self.sharded:
+            return
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._manifest_mtime:
+            return
+        with open(self.manifest_path, 'r', encoding='utf-8') as file:
+            data = json.load(file)
+        for name, spec in data.get('shards', {}).items():
+            if name not in self.shards:
+                self._add(name, spec['routing'])
+        self._manifest_mtime = mtime
+
+    def save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({
+                'version': 1,
+                'mode': self.mode,
+                'shards': {name: {'path': os.path.join('shards', name), 'routing': shard.routing}
+                           for name, shard in self.shards.items()},
+            }, file, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    def discover(self, data_path: str) -> List[str]:
+        """Shard names for the data directory, registering new tenants"""
+        if self.mode == 'tenant':
+            tenants = sorted(name for name in os.listdir(data_path)
+                             if os.path.isdir(os.path.join(data_path, name))) if os.path.isdir(data_path) else []
+            for tenant in tenants:
+                if tenant not in self.shards:
+                    self._add(tenant, {'tenant': [tenant]})
+        if self.sharded:
+            self.save()
+        return list(self.shards)
+
+    def files_for(self, name: str, loader: 'ResumeLoader') -> List[str]:
+        from ingest.loaders import TABULAR_EXTENSIONS, ResumeLoader
+        if self.mode == 'tenant':
+            return ResumeLoader(os.path.join(loader.data_path, name)).list_files()
+        files = loader.list_files()
+        if self.mode == 'type':
+            is_feed = name == 'jobs'
+            return [path for path in files if path.endswith(TABULAR_EXTENSIONS) == is_feed]
+        return files
+
+    def current_versions(self) -> Dict[str, Optional[str]]:
+        self.refresh()
+        return {name: shard.store.current_version() for name, shard in self.shards.items()}
+
+    def route(self, filters) -> List[Tuple[str, Optional[Tuple]]]:
+        """Shards that can hold matches, each with the filters left to apply inside it.
+
+        A shard is skipped when a filter excludes its routing value, and a
+        filter every chunk of the shard satisfies is dropped for that shard.
+        """
+        filters = dict(filters or ())
+        targets = []
+        for name, shard in self.shards.items():
+            remaining = dict(filters)
+            excluded = False
+            for field, values in shard.routing.items():
+                if field not in remaining:
+                    continue
+                wanted = {remaining[field]} if isinstance(remaining[field], str) else set(remaining[field])
+                if not wanted.intersection(values):
+                    excluded = True
+                    break
+                if wanted.issuperset(values):
+                    del remaining[field]
+            if not excluded:
+                targets.append((name, freeze_filters(remaining)))
+        return targets
@@ -0,0 +1 @@
+"""Benchmarks"""
\ No newline at end of file
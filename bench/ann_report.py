@@ -0,0 +1,131 @@
+# bench/ann_report.py - recall vs latency of ANN index types against exact search
+#
+#   python -m bench.ann_report                      # synthetic clustered vectors
+#   python -m bench.ann_report --from-store         # vectors of the live vector store
+#   python -m bench.ann_report --n 200000 --json report.json
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import faiss
+import numpy as np
+
+from app.index_factory import IndexConfig, build_index, search_parameters
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, seed: int) -> np.ndarray:
+    """Unit vectors drawn around random centres, roughly like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def store_vectors() -> np.ndarray:
+    from app.deps import vectorstore_manager
+    index = vectorstore_manager.get_vectorstore().index
+    if not isinstance(faiss.downcast_index(index), faiss.IndexFlat):
+        raise SystemExit('--from-store needs a flat index (its vectors are the baseline)')
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row_found) & set(row_truth)) for row_found, row_truth in zip(found, truth))
+    return hits / truth.size
+
+
+def time_search(index, queries: np.ndarray, k: int, params) -> Dict:
+    """Latency of single-query searches, as the API issues them"""
+    latencies = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k, params=params)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = ids[0]
+    latencies = np.array(latencies)
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 4),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 4),
+        'qps': round(len(queries) / (latencies.sum() / 1000), 1),
+        'ids': results,
+    }
+
+
+def run(vectors: np.ndarray, n_queries: int, k: int, config: IndexConfig, seed: int) -> List[Dict]:
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[query_rows] + 0.05 * rng.standard_normal((len(query_rows), vectors.shape[1])).astype(np.float32)
+    faiss.normalize_L2(queries)
+    dim = vectors.shape[1]
+    sample = vectors[rng.choice(len(vectors), size=min(config.train_size, len(vectors)), replace=False)]
+
+    rows = []
+    sweeps = {
+        'flat': [None],
+        'ivf_flat': [1, 4, 16, 64],
+        'ivf_pq': [1, 4, 16, 64],
+        'hnsw': [16, 32, 64, 128],
+    }
+    truth = None
+    for index_type, settings in sweeps.items():
+        config.index_type = index_type
+        start = time.perf_counter()
+        index = build_index(dim, config, sample)
+        index.add(vectors)
+        build_seconds = time.perf_counter() - start
+        memory_bytes = faiss.serialize_index(index).nbytes
+
+        for setting in settings:
+            params = None
+            if index_type in ('ivf_flat', 'ivf_pq'):
+                params = search_parameters(index, nprobe=setting)
+            elif index_type == 'hnsw':
+                params = search_parameters(index, ef_search=setting)
+            timing = time_search(index, queries, k, params)
+            if truth is None:
+                truth = timing['ids']
+            rows.append({
+                'index_type': index_type,
+                'search_param': None if setting is None else (
+                    f'ef_search={setting}' if index_type == 'hnsw' else f'nprobe={setting}'),
+                f'recall@{k}': round(recall_at_k(timing['ids'], truth), 4),
+                'p50_ms': timing['p50_ms'],
+                'p99_ms': timing['p99_ms'],
+                'qps': timing['qps'],
+                'build_seconds': round(build_seconds, 2),
+                'index_mb': round(memory_bytes / 1e6, 2),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Recall vs latency of ANN index types')
+    parser.add_argument('--from-store', action='store_true', help='use vectors of the current vector store')
+    parser.add_argument('--n', type=int, default=100000, help='synthetic vector count')
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--clusters', type=int, default=2000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the rows to this file')
+    args = parser.parse_args()
+
+    vectors = store_vectors() if args.from_store else synthetic_vectors(args.n, args.dim, args.clusters, args.seed)
+    config = IndexConfig.from_env()
+    rows = run(vectors, args.queries, args.k, config, args.seed)
+
+    header = ['index_type', 'search_param', f'recall@{args.k}', 'p50_ms', 'p99_ms', 'qps', 'build_seconds', 'index_mb']
+    print(f'{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, flat = ground truth')
+    print(' | '.join(header))
+    for row in rows:
+        print(' | '.join(str(row[column]) for column in header))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'vectors': len(vectors), 'dim': int(vectors.shape[1]), 'k': args.k, 'rows': rows}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
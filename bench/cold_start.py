@@ -0,0 +1,97 @@
+# bench/cold_start.py - time from process start to the first answered query
+#
+#   python -m bench.cold_start --store ./bench-store --repeats 5
+#   python -m bench.cold_start --store ./bench-store --fake-embeddings 384 --json cold.json
+#
+# Each repeat is a new interpreter, so imports, model load, index load and
+# the first search are all paid again (the OS page cache stays warm).
+# startup_seconds runs until /health/ready answers 200, so it includes the
+# warm-up pass (WARM_UP=0 to leave it to the first query).
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from bench.harness import configure, environment, install_fake_embeddings, peak_rss_mb, wait_until_ready, write_json
+
+PHASES = ('import_seconds', 'startup_seconds', 'first_query_seconds', 'second_query_seconds', 'process_seconds')
+
+
+def child(question: str) -> dict:
+    """Runs in the fresh process; prints its phase timings as JSON"""
+    start = time.perf_counter()
+    install_fake_embeddings()
+    from app.api import app
+    imported = time.perf_counter()
+
+    import httpx
+
+    async def run():
+        timings = {}
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+                await wait_until_ready(client)
+                started = time.perf_counter()
+                for phase in ('first_query_seconds', 'second_query_seconds'):
+                    before = time.perf_counter()
+                    response = await client.post('/query', json={'question': question, 'k': 5})
+                    response.raise_for_status()
+                    timings[phase] = time.perf_counter() - before
+        return started, timings
+
+    started, timings = asyncio.run(run())
+    return {
+        'import_seconds': imported - start,
+        'startup_seconds': started - imported,
+        **timings,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start time of the API against an existing vector store')
+    parser.add_argument('--store', required=True, help='VECTOR_STORE_PATH to serve, e.g. from bench.ingest_report')
+    parser.add_argument('--fake-embeddings', type=int, default=0, metavar='DIM')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--question', default='python engineer with kubernetes experience')
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    configure(args.store, fake_embeddings=args.fake_embeddings, QUERY_BATCHING='0')
+    if args.child:
+        print(json.dumps(child(args.question)))
+        return
+
+    runs = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-m', 'bench.cold_start', '--child', '--store', args.store,
+                                 '--fake-embeddings', str(args.fake_embeddings), '--question', args.question],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SystemExit(f'cold start run failed:\n{result.stderr[-2000:]}')
+        run = json.loads(result.stdout.strip().splitlines()[-1])
+        run['process_seconds'] = time.perf_counter() - start
+        runs.append(run)
+
+    report = {
+        'store': args.store,
+        'environment': environment(),
+        'repeats': args.repeats,
+        # Median over the repeats; the first one may also pay for a cold page cache
+        'median': {phase: round(float(np.median([run[phase] for run in runs])), 4) for phase in PHASES},
+        'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+        'runs': runs,
+    }
+    print(' | '.join(f'{phase} {report["median"][phase]}' for phase in PHASES))
+    write_json(args.json, report)
+
+
+if __name__ == '__main__':
+    main()
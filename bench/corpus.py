@@ -0,0 +1,175 @@
+# bench/corpus.py - synthetic resumes (PDF/DOCX/TXT) and job feeds (CSV) at a given scale
+#
+#   python -m bench.corpus ./bench-data --chunks 10000
+#   python -m bench.corpus ./bench-data --chunks 1000000 --resume-share 0.1 --rows-per-csv 100000
+import argparse
+import csv
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+
+SKILLS = ['Python', 'Kubernetes', 'PySpark', 'SQL', 'AWS', 'Terraform', 'React', 'Java', 'Airflow', 'Docker',
+          'TensorFlow', 'Go', 'Kafka', 'Snowflake', 'CKA certified', 'AWS SAA-C03', 'Scrum', 'GraphQL']
+ROLES = ['data engineer', 'backend developer', 'ML engineer', 'site reliability engineer', 'analyst',
+         'frontend developer', 'platform engineer', 'engineering manager']
+FIRST_NAMES = ['Ana', 'Ben', 'Chen', 'Dara', 'Eli', 'Fatima', 'Goran', 'Hana', 'Ivan', 'Jia', 'Kofi', 'Lena',
+               'Mateo', 'Nia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sven', 'Tariq', 'Uma', 'Viktor', 'Wen', 'Yusuf']
+LAST_NAMES = ['Almeida', 'Baker', 'Costa', 'Dubois', 'Eriksen', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jensen',
+              'Kowalski', 'Laine', 'Moreau', 'Novak', 'Okafor', 'Patel', 'Rossi', 'Silva', 'Tanaka', 'Weber']
+COMPANIES = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark Industries', 'Wayne Enterprises', 'Soylent',
+             'Tyrell', 'Cyberdyne', 'Wonka', 'Vandelay', 'Pied Piper', 'Massive Dynamic', 'Aperture']
+VERBS = ['Built', 'Led', 'Migrated', 'Designed', 'Automated', 'Scaled', 'Maintained', 'Optimized', 'Launched',
+         'Refactored', 'Monitored', 'Reduced cost of']
+THINGS = ['a streaming pipeline', 'the billing service', 'CI/CD for 40 services', 'an internal ML platform',
+          'the search backend', 'a data warehouse', 'customer dashboards', 'the payments API',
+          'an on-call rotation', 'a feature store', 'the mobile release process', 'observability tooling']
+DEGREES = ['BSc Computer Science', 'MSc Data Science', 'BEng Software Engineering', 'BSc Mathematics',
+           'MSc Statistics', 'BA Economics']
+RESUME_FORMATS = ('.pdf', '.docx', '.txt')
+# Sections the generator writes; each becomes about one chunk with the section chunker
+CHUNKS_PER_RESUME = 6
+
+
+def _skills(rng, low: int, high: int) -> List[str]:
+    return list(rng.choice(SKILLS, size=rng.integers(low, high), replace=False))
+
+
+def resume_text(rng) -> str:
+    """A resume in the heading layout the section chunker recognises"""
+    name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+    lines = [name, f'{rng.choice(ROLES).title()} | {name.lower().replace(" ", ".")}@example.com', '',
+             'Summary',
+             f'{rng.integers(1, 20)} years as a {rng.choice(ROLES)} focused on {", ".join(_skills(rng, 2, 5))}. '
+             f'Known for {rng.choice(THINGS)} and {rng.choice(THINGS)}.', '',
+             'Experience']
+    for _ in range(rng.integers(2, 5)):
+        lines.append(f'{rng.choice(ROLES).title()} at {rng.choice(COMPANIES)} '
+                     f'({rng.integers(2008, 2020)}-{rng.integers(2020, 2026)})')
+        for _ in range(rng.integers(2, 4)):
+            lines.append(f'- {rng.choice(VERBS)} {rng.choice(THINGS)} with {", ".join(_skills(rng, 1, 4))}, '
+                         f'improving throughput by {rng.integers(5, 90)}%.')
+    lines += ['', 'Skills', ', '.join(_skills(rng, 6, 12)), '',
+              'Projects'] + [f'- {rng.choice(VERBS)} {rng.choice(THINGS)} using {", ".join(_skills(rng, 1, 3))}.'
+                             for _ in range(rng.integers(1, 4))]
+    lines += ['', 'Education', f'{rng.choice(DEGREES)}, {rng.choice(LAST_NAMES)} University, {rng.integers(2000, 2020)}',
+              '', 'Certifications', ', '.join(_skills(rng, 1, 3))]
+    return '\n'.join(lines)
+
+
+def job_row(rng) -> Dict[str, str]:
+    skills = _skills(rng, 3, 7)
+    return {
+        'title': f'{rng.choice(["Junior", "Senior", "Staff", "Lead", ""])} {rng.choice(ROLES).title()}'.strip(),
+        'company': str(rng.choice(COMPANIES)),
+        'description': f'Join {rng.choice(COMPANIES)} to work on {rng.choice(THINGS)} and {rng.choice(THINGS)}. '
+                       f'You will {rng.choice(VERBS).lower()} {rng.choice(THINGS)} with {", ".join(skills)}.',
+        'requirements': f'{rng.integers(1, 10)}+ years with {", ".join(skills[:3])}; '
+                        f'nice to have: {", ".join(_skills(rng, 1, 3))}.',
+    }
+
+
+def _pdf_escape(line: str) -> str:
+    return line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path: str, text: str):
+    """Single-page PDF with one text line per line of `text` (no PDF library needed)"""
+    commands = ['BT', '/F1 9 Tf', '11 TL', '40 800 Td']
+    commands += [f'({_pdf_escape(line)}) Tj T*' for line in text.splitlines()]
+    stream = '\n'.join(commands + ['ET']).encode('latin-1', 'replace')
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>',
+        b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R '
+        b'/Resources << /Font << /F1 5 0 R >> >> >>',
+        b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>',
+    ]
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as file:
+        file.write(out)
+
+
+def write_docx(path: str, text: str):
+    from docx import Document as DocxDocument
+    document = DocxDocument()
+    for line in text.splitlines():
+        document.add_paragraph(line)
+    document.save(path)
+
+
+def write_resume(path: str, text: str):
+    if path.endswith('.pdf'):
+        write_pdf(path, text)
+    elif path.endswith('.docx'):
+        write_docx(path, text)
+    else:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+
+
+def generate(directory: str, chunks: int, resume_share: float = 0.2, rows_per_csv: int = 50000,
+             formats=RESUME_FORMATS, seed: int = 0) -> Dict:
+    """Write about `chunks` chunks worth of documents; returns what was written.
+
+    Resumes take resume_share of the chunks and cycle through `formats`;
+    the rest are job postings (one chunk each) in CSV feeds. The same
+    arguments always produce the same files.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    resumes = max(1, round(chunks * resume_share / CHUNKS_PER_RESUME)) if resume_share > 0 else 0
+    jobs = max(0, chunks - resumes * CHUNKS_PER_RESUME)
+    bytes_by_format = dict.fromkeys(formats, 0)
+    for i in range(resumes):
+        extension = formats[i % len(formats)]
+        path = os.path.join(directory, f'resume_{i:07d}{extension}')
+        write_resume(path, resume_text(rng))
+        bytes_by_format[extension] += os.path.getsize(path)
+
+    feeds = []
+    for start in range(0, jobs, rows_per_csv):
+        path = os.path.join(directory, f'jobs_{len(feeds):04d}.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['title', 'company', 'description', 'requirements'])
+            writer.writeheader()
+            writer.writerows(job_row(rng) for _ in range(min(rows_per_csv, jobs - start)))
+        feeds.append(path)
+    bytes_by_format['.csv'] = sum(os.path.getsize(path) for path in feeds)
+    return {
+        'directory': os.path.abspath(directory),
+        'target_chunks': chunks,
+        'resumes': resumes,
+        'job_postings': jobs,
+        'job_feeds': len(feeds),
+        'seed': seed,
+        'bytes_by_format': bytes_by_format,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic resume and job-feed corpus')
+    parser.add_argument('directory')
+    parser.add_argument('--chunks', type=int, default=10000, help='approximate number of chunks to produce')
+    parser.add_argument('--resume-share', type=float, default=0.2, help='fraction of chunks coming from resumes')
+    parser.add_argument('--rows-per-csv', type=int, default=50000)
+    parser.add_argument('--formats', default=','.join(RESUME_FORMATS), help='resume formats to cycle through')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    summary = generate(args.directory, args.chunks, args.resume_share, args.rows_per_csv,
+                       tuple(args.formats.split(',')), args.seed)
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
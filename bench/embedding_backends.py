@@ -0,0 +1,107 @@
+# bench/embedding_backends.py - parity and throughput of the embedding backends
+#
+#   python -m bench.embedding_backends                     # synthetic resume-like texts
+#   python -m bench.embedding_backends --from-store        # chunks of the live vector store
+#   python -m bench.embedding_backends --backends torch,onnx-int8 --threads 4 --json report.json
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from app.deps import EMBEDDING_BACKENDS, embeddings_manager
+from bench.corpus import ROLES, SKILLS
+
+
+def synthetic_texts(n: int, seed: int) -> List[str]:
+    """Resume-like sentences of varying length (the length mix matters for padding)"""
+    rng = np.random.default_rng(seed)
+    texts = []
+    for _ in range(n):
+        sentences = [
+            f'{rng.integers(1, 15)} years as a {rng.choice(ROLES)} working with '
+            f'{", ".join(rng.choice(SKILLS, size=rng.integers(2, 6), replace=False))}.'
+            for _ in range(rng.integers(1, 8))
+        ]
+        texts.append(' '.join(sentences))
+    return texts
+
+
+def store_texts(n: int) -> List[str]:
+    from app.deps import vectorstore_manager
+    vectorstore = vectorstore_manager.get_vectorstore()
+    rows = list(vectorstore.index_to_docstore_id.values())[:n]
+    return [vectorstore.docstore.search(row).page_content for row in rows]
+
+
+def measure(embeddings, texts: List[str], repeats: int) -> Dict:
+    embeddings.embed_documents(texts[:8])  # warm-up: lazy init, first-call allocations
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+        best = min(best, time.perf_counter() - start)
+    return {'vectors': vectors, 'seconds': best}
+
+
+def neighbour_agreement(vectors: np.ndarray, reference: np.ndarray, queries: int, k: int) -> float:
+    """Overlap of each query's top-k neighbours among the texts, vs the reference"""
+    def top_k(matrix):
+        scores = matrix[:queries] @ matrix.T
+        np.fill_diagonal(scores[:, :queries], -np.inf)
+        return np.argsort(-scores, axis=1)[:, :k]
+    found, truth = top_k(vectors), top_k(reference)
+    return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cosine parity and throughput of the embedding backends')
+    parser.add_argument('--backends', default=','.join(EMBEDDING_BACKENDS), help='first one is the reference')
+    parser.add_argument('--from-store', action='store_true', help='use chunks of the current vector store')
+    parser.add_argument('--texts', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=None, help='EMBEDDING_THREADS for every backend')
+    parser.add_argument('--batch-size', type=int, default=None, help='EMBEDDING_BATCH_SIZE for every backend')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the rows to this file')
+    args = parser.parse_args()
+
+    if args.threads:
+        embeddings_manager.threads = args.threads
+    if args.batch_size:
+        embeddings_manager.batch_size = args.batch_size
+    texts = store_texts(args.texts) if args.from_store else synthetic_texts(args.texts, args.seed)
+
+    rows, reference = [], None
+    for backend in args.backends.split(','):
+        result = measure(embeddings_manager.build_backend(backend), texts, args.repeats)
+        vectors = result['vectors']
+        if reference is None:
+            reference = vectors
+        cosine = np.sum(vectors * reference, axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1))
+        rows.append({
+            'backend': backend,
+            'texts_per_second': round(len(texts) / result['seconds'], 1),
+            'speedup': round(rows[0]['seconds'] / result['seconds'], 2) if rows else 1.0,
+            'seconds': round(result['seconds'], 3),
+            'cosine_mean': round(float(cosine.mean()), 6),
+            'cosine_min': round(float(cosine.min()), 6),
+            f'neighbours@{args.k}': round(neighbour_agreement(vectors, reference, min(100, len(texts)), args.k), 4),
+        })
+
+    header = ['backend', 'texts_per_second', 'speedup', 'cosine_mean', 'cosine_min', f'neighbours@{args.k}']
+    print(f'{len(texts)} texts, threads={embeddings_manager.threads or "default"}, '
+          f'batch_size={embeddings_manager.batch_size}, reference = {rows[0]["backend"]}')
+    print(' | '.join(header))
+    for row in rows:
+        print(' | '.join(str(row[column]) for column in header))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump({'texts': len(texts), 'rows': rows}, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# bench/embedding_server.py - a model per API worker vs one shared embedding server
+#
+#   python -m bench.embedding_server --workers 4
+#   python -m bench.embedding_server --workers 4 --threads 8 --request-texts 1 --requests 400 --json server.json
+#   python -m bench.embedding_server --workers 2 --fake-embeddings 384      # socket and batching overhead only
+#
+# Each mode starts --workers processes, as uvicorn --workers would, each
+# with --threads concurrent callers (the search executor). 'per-worker'
+# loads the model in every process; 'server' starts app.embedding_server
+# once and the workers embed through EMBEDDING_SERVER_SOCKET. Models load
+# before the clock starts. Reported per mode: texts/s over all workers,
+# request latency, and peak RSS summed over every process involved.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from bench.harness import environment, latency_summary, peak_rss_mb, write_json
+
+MODES = ('per-worker', 'server')
+
+
+def worker(mode: str, requests: int, request_texts: int, threads: int, seed: int) -> Dict:
+    """Runs in a worker process: load, report ready, wait for the go line on stdin, run"""
+    from bench.harness import install_fake_embeddings
+    if mode == 'per-worker':
+        install_fake_embeddings()
+    from app.deps import embeddings_manager
+    from bench.embedding_backends import synthetic_texts
+
+    started = time.perf_counter()
+    embeddings = embeddings_manager.get_embeddings()
+    embeddings.embed_query('warm-up')  # loads the model, or connects to the server
+    load_seconds = time.perf_counter() - started
+    texts = synthetic_texts(requests * request_texts, seed)
+    print('ready', flush=True)
+    sys.stdin.readline()
+
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    def caller():
+        for i in counter:
+            before = time.perf_counter()
+            embeddings.embed_documents(texts[i * request_texts:(i + 1) * request_texts])
+            latencies.append(time.perf_counter() - before)
+
+    start = time.perf_counter()
+    callers = [threading.Thread(target=caller) for _ in range(threads)]
+    for thread in callers:
+        thread.start()
+    for thread in callers:
+        thread.join()
+    return {
+        'load_seconds': round(load_seconds, 3),
+        'seconds': time.perf_counter() - start,
+        'texts': requests * request_texts,
+        'latencies': latencies,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def serve(socket_path: str):
+    """Runs in the server process; like python -m app.embedding_server, plus --fake-embeddings"""
+    import signal
+    from app.deps import EmbeddingsManager
+    from app.embedding_server import EmbeddingServer
+    manager = EmbeddingsManager()
+    dim = int(os.getenv('BENCH_FAKE_EMBEDDINGS', '0'))
+    if dim:
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+        model = DeterministicFakeEmbedding(size=dim)
+    else:
+        model = manager.build_backend()
+    server = EmbeddingServer(model, manager.model_key, socket_path)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    server.serve_forever()
+
+
+def run_mode(mode: str, args, socket_path: str) -> Dict:
+    env = {**os.environ, 'EMBEDDING_CACHE_MB': '0'}  # every text reaches the model
+    if args.fake_embeddings:
+        env['BENCH_FAKE_EMBEDDINGS'] = str(args.fake_embeddings)
+    server = None
+    if mode == 'server':
+        env['EMBEDDING_SERVER_SOCKET'] = socket_path
+        server = subprocess.Popen([sys.executable, '-m', 'bench.embedding_server', '--serve', socket_path],
+                                  env=env, stdout=subprocess.DEVNULL)
+
+    command = [sys.executable, '-m', 'bench.embedding_server', '--worker', mode, '--requests', str(args.requests),
+               '--request-texts', str(args.request_texts), '--threads', str(args.threads)]
+    workers = [subprocess.Popen(command + ['--seed', str(args.seed + i)], env=env, text=True,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+               for i in range(args.workers)]
+    try:
+        for process in workers:
+            for line in process.stdout:
+                if line.strip() == 'ready':
+                    break
+            else:
+                raise SystemExit(f'{mode} worker failed to start (exit code {process.wait()})')
+        for process in workers:
+            process.stdin.write('go\n')
+            process.stdin.flush()
+        results = [json.loads(process.stdout.read().strip().splitlines()[-1]) for process in workers]
+        server_stats = None
+        if server is not None:
+            from app.embedding_server import server_stats as read_server_stats
+            server_stats = read_server_stats(socket_path)
+    finally:
+        for process in workers:
+            process.wait()
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    seconds = max(result['seconds'] for result in results)
+    texts = sum(result['texts'] for result in results)
+    worker_rss = sum(result['peak_rss_mb'] for result in results)
+    server_rss = server_stats['peak_rss_mb'] if server_stats else 0.0
+    return {
+        'mode': mode,
+        'seconds': round(seconds, 3),
+        'texts_per_second': round(texts / seconds, 1) if seconds else 0.0,
+        'latency': latency_summary([latency for result in results for latency in result['latencies']]),
+        'load_seconds': max(result['load_seconds'] for result in results),
+        'worker_peak_rss_mb': [result['peak_rss_mb'] for result in results],
+        'server': server_stats,
+        'total_peak_rss_mb': round(worker_rss + server_rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Embedding throughput and memory: per-worker models vs a shared server')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--workers', type=int, default=4, help='API worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='concurrent callers per worker')
+    parser.add_argument('--requests', type=int, default=200, help='embed calls per worker')
+    parser.add_argument('--request-texts', type=int, default=1, help='texts per call (1 = a query)')
+    parser.add_argument('--fake-embeddings', type=int, default=0, metavar='DIM')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--serve', metavar='SOCKET', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+    if args.worker:
+        print(json.dumps(worker(args.worker, args.requests, args.request_texts, args.threads, args.seed)))
+        return
+
+    modes = [mode for mode in args.modes.split(',') if mode]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        parser.error(f'unknown modes: {sorted(unknown)}')
+    if args.fake_embeddings:
+        os.environ['BENCH_FAKE_EMBEDDINGS'] = str(args.fake_embeddings)
+    with tempfile.TemporaryDirectory() as directory:
+        rows = [run_mode(mode, args, os.path.join(directory, 'embedding.sock')) for mode in modes]
+
+    print(f'{args.workers} workers x {args.threads} callers, {args.request_texts} texts per call')
+    for row in rows:
+        print(f"{row['mode']:<11} {row['texts_per_second']:>9} texts/s  p50 {row['latency'].get('p50_ms')} ms  "
+              f"p99 {row['latency'].get('p99_ms')} ms  peak RSS {row['total_peak_rss_mb']} MB "
+              f"(workers {row['worker_peak_rss_mb']}"
+              + (f", server {row['server']['peak_rss_mb']})" if row['server'] else ')'))
+    write_json(args.json, {
+        'environment': environment(),
+        'workers': args.workers,
+        'threads': args.threads,
+        'requests': args.requests,
+        'request_texts': args.request_texts,
+        'modes': rows,
+    })
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# bench/harness.py - helpers shared by the ingest and query benchmarks
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Settings that change what a run measures; recorded with every result
+RECORDED_SETTINGS = ('EMBEDDING_BACKEND', 'EMBEDDING_THREADS', 'EMBEDDING_BATCH_SIZE', 'EMBEDDING_CACHE_MB',
+                     'INDEX_TYPE', 'IVF_NLIST', 'NPROBE', 'HNSW_M', 'EF_SEARCH', 'INGEST_BATCH_SIZE',
+                     'LOADER_WORKERS', 'CHUNKER', 'CHUNK_TOKENS', 'DEDUP', 'SEARCH_MODE', 'SHARD_BY',
+                     'QUERY_BATCHING', 'QUERY_BATCH_SIZE', 'RAG_WORKERS', 'RESULT_CACHE_SIZE', 'WARM_UP',
+                     'EMBEDDING_SERVER_SOCKET')
+
+
+def configure(store: str, cache: Optional[str] = None, fake_embeddings: int = 0, **settings: str):
+    """Point the app at a scratch store before it is imported (app.deps reads the env at import)"""
+    os.environ['VECTOR_STORE_PATH'] = store
+    os.environ['EMBEDDING_CACHE_PATH'] = cache or os.path.join(store, 'embedding_cache')
+    os.environ['INDEX_WATCH_INTERVAL'] = '0'
+    if fake_embeddings:
+        os.environ['BENCH_FAKE_EMBEDDINGS'] = str(fake_embeddings)
+    os.environ.update({name: str(value) for name, value in settings.items()})
+
+
+def install_fake_embeddings():
+    """With BENCH_FAKE_EMBEDDINGS=<dim>, replace the model with hash-based vectors.
+
+    Measures everything except the model (loading, splitting, FAISS, the API)
+    on machines without it, and isolates pipeline changes from model time.
+    """
+    dim = int(os.getenv('BENCH_FAKE_EMBEDDINGS', '0'))
+    if not dim:
+        return
+    from langchain_community.embeddings import DeterministicFakeEmbedding
+    import app.deps as deps
+    deps.embeddings_manager._embeddings = DeterministicFakeEmbedding(size=dim)
+
+
+async def wait_until_ready(client, timeout: float = 600.0, interval: float = 0.05):
+    """Poll /health/ready until the API has loaded and warmed up its model and indexes"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while True:
+        response = await client.get('/health/ready')
+        if response.status_code in (200, 404):  # 404: a build from before /health/ready
+            return
+        if response.json().get('state') == 'failed' or asyncio.get_running_loop().time() > deadline:
+            raise RuntimeError(f'API did not become ready: {response.json()}')
+        await asyncio.sleep(interval)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def directory_size(path: str) -> Dict[str, int]:
+    """Bytes per file directly in `path`, plus 'total' for the whole tree"""
+    sizes, total = {}, 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            size = os.path.getsize(os.path.join(root, name))
+            total += size
+            if root == path:
+                sizes[name] = size
+    sizes['total'] = total
+    return sizes
+
+
+def latency_summary(seconds: List[float]) -> Dict[str, float]:
+    if not seconds:
+        return {'count': 0}
+    ms = np.asarray(seconds) * 1000
+    p50, p90, p95, p99 = np.percentile(ms, [50, 90, 95, 99])
+    return {
+        'count': len(ms),
+        'mean_ms': round(float(ms.mean()), 3),
+        'p50_ms': round(float(p50), 3),
+        'p90_ms': round(float(p90), 3),
+        'p95_ms': round(float(p95), 3),
+        'p99_ms': round(float(p99), 3),
+        'max_ms': round(float(ms.max()), 3),
+    }
+
+
+def environment() -> Dict:
+    """What a result depends on besides the code under test"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+    return {
+        'git_commit': commit,
+        'git_dirty': dirty,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'faiss_threads': _faiss_threads(),
+        'settings': {name: os.environ[name] for name in RECORDED_SETTINGS if name in os.environ},
+        'fake_embeddings': int(os.getenv('BENCH_FAKE_EMBEDDINGS', '0')) or None,
+    }
+
+
+def _faiss_threads() -> Optional[int]:
+    try:
+        import faiss
+        return faiss.omp_get_max_threads()
+    except ImportError:
+        return None
+
+
+def write_json(path: Optional[str], data: Dict):
+    if path:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=2)
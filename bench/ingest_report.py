@@ -0,0 +1,91 @@
+# bench/ingest_report.py - per-stage ingest throughput, peak RSS and index size
+#
+#   python -m bench.ingest_report ./bench-data --store ./bench-store
+#   python -m bench.ingest_report ./bench-data --store ./bench-store --fake-embeddings 384 --json ingest.json
+#
+# Run it in a fresh process per measurement: peak RSS is per process and
+# app.deps reads its settings from the environment at import.
+import argparse
+import os
+import shutil
+import time
+from typing import Dict
+
+from bench.harness import configure, directory_size, environment, install_fake_embeddings, peak_rss_mb, write_json
+
+
+def run_ingest(data_path: str, full_rebuild: bool) -> Dict:
+    from ingest.ingest import ResumeIngestor
+    from ingest.jobs import IngestProgress
+    ingestor = ResumeIngestor()
+    ingestor.loader.data_path = data_path
+    progress = IngestProgress()
+    start = time.perf_counter()
+    succeeded = ingestor.ingest_documents(full_rebuild=full_rebuild, progress=progress)
+    seconds = time.perf_counter() - start
+    progress.set_stage('done')
+    snapshot = progress.snapshot()
+    stages = snapshot['stage_seconds']
+    return {
+        'succeeded': succeeded,
+        'seconds': round(seconds, 3),
+        'files': snapshot['files_processed'],
+        'chunks': snapshot['chunks_processed'],
+        'duplicates_dropped': snapshot['duplicates_dropped'],
+        'files_per_second': round(snapshot['files_processed'] / seconds, 2) if seconds else 0.0,
+        'chunks_per_second': round(snapshot['chunks_processed'] / seconds, 2) if seconds else 0.0,
+        'stage_seconds': stages,
+        # Throughput of each stage on its own: parsing files, splitting them, embedding chunks
+        'stage_throughput': {
+            'loading_files_per_second': _rate(snapshot['files_processed'], stages.get('loading')),
+            'splitting_files_per_second': _rate(snapshot['files_processed'], stages.get('splitting')),
+            'embedding_chunks_per_second': _rate(snapshot['chunks_processed'], stages.get('embedding')),
+        },
+    }
+
+
+def reset_store(path: str):
+    """Empty a scratch store so cached embeddings and old versions do not skew the run"""
+    if not os.path.exists(path):
+        return
+    if os.listdir(path) and not os.path.exists(os.path.join(path, 'CURRENT')):
+        raise SystemExit(f'{path} is not empty and does not look like a vector store, refusing to clear it')
+    shutil.rmtree(path)
+
+
+def _rate(count: int, seconds) -> float:
+    return round(count / seconds, 2) if seconds else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure a full ingest of a corpus into a scratch vector store')
+    parser.add_argument('data_path', help='corpus directory, e.g. from python -m bench.corpus')
+    parser.add_argument('--store', required=True, help='scratch VECTOR_STORE_PATH (its contents are replaced)')
+    parser.add_argument('--fake-embeddings', type=int, default=0, metavar='DIM',
+                        help='hash-based vectors instead of the model, to time the rest of the pipeline')
+    parser.add_argument('--rerun', action='store_true', help='also time an incremental run with nothing changed')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    reset_store(args.store)
+    configure(args.store, fake_embeddings=args.fake_embeddings)
+    install_fake_embeddings()
+    from app.deps import vectorstore_manager
+
+    report = {'data_path': args.data_path, 'environment': environment()}
+    report['full'] = run_ingest(args.data_path, full_rebuild=True)
+    if args.rerun:
+        report['unchanged_rerun'] = run_ingest(args.data_path, full_rebuild=False)
+    report['index_bytes'] = directory_size(vectorstore_manager.current_path())
+    report['peak_rss_mb'] = peak_rss_mb()
+
+    full = report['full']
+    print(f"{full['files']} files, {full['chunks']} chunks in {full['seconds']}s "
+          f"({full['chunks_per_second']} chunks/s), peak RSS {report['peak_rss_mb']} MB, "
+          f"index {report['index_bytes']['total'] / 1e6:.1f} MB")
+    print('stages: ' + ', '.join(f'{stage} {seconds}s' for stage, seconds in full['stage_seconds'].items()))
+    write_json(args.json, report)
+
+
+if __name__ == '__main__':
+    main()
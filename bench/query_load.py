@@ -0,0 +1,147 @@
+# bench/query_load.py - query latency percentiles and QPS under concurrent load
+#
+#   python -m bench.query_load --store ./bench-store                    # app in this process (ASGI)
+#   python -m bench.query_load --url http://localhost:8000 --concurrency 1,8,32,64
+#   python -m bench.query_load --store ./bench-store --endpoint similar-jobs --mode hybrid --json load.json
+#
+# Closed loop: each of `concurrency` clients sends its next request as soon
+# as the previous one returns. In-process runs share the CPU between client
+# and server; use --url against uvicorn for numbers comparable to production.
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from bench.corpus import COMPANIES, ROLES, SKILLS, THINGS
+from bench.harness import (configure, environment, install_fake_embeddings, latency_summary, peak_rss_mb,
+                           wait_until_ready, write_json)
+
+ENDPOINTS = {
+    'query': ('/query', 'question'),
+    'similar-jobs': ('/similar-jobs', 'job_description'),
+}
+
+
+def synthetic_queries(n: int, seed: int) -> List[str]:
+    """Distinct recruiter-style questions, so the result cache does not answer them"""
+    rng = np.random.default_rng(seed)
+    templates = [
+        'Who has experience with {a} and {b}?',
+        'Find a {role} who worked on {thing}',
+        '{role} with {a}, {b} and {c}',
+        'Candidates who built {thing} at {company}',
+    ]
+    queries, seen = [], set()
+    while len(queries) < n:
+        a, b, c = rng.choice(SKILLS, size=3, replace=False)
+        query = str(rng.choice(templates)).format(a=a, b=b, c=c, role=rng.choice(ROLES), thing=rng.choice(THINGS),
+                                                  company=rng.choice(COMPANIES))
+        query += f' ({rng.integers(1, 15)}+ years)'
+        if query not in seen or len(seen) > n * 10:
+            seen.add(query)
+            queries.append(query)
+    return queries
+
+
+async def run_level(client, endpoint: str, queries: List[str], concurrency: int, requests: int,
+                    body: Dict) -> Dict:
+    path, field = ENDPOINTS[endpoint]
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            before = time.perf_counter()
+            try:
+                response = await client.post(path, json={**body, field: queries[i % len(queries)]})
+                status = str(response.status_code)
+            except Exception as e:
+                status = type(e).__name__
+            if status == '200':
+                latencies.append(time.perf_counter() - before)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    return {
+        'concurrency': concurrency,
+        'requests': requests,
+        'seconds': round(seconds, 3),
+        'qps': round(len(latencies) / seconds, 1) if seconds else 0.0,
+        'errors': errors,
+        'latency': latency_summary(latencies),
+    }
+
+
+async def run(url: Optional[str], endpoint: str, levels: List[int], requests: int, warmup: int,
+              queries: List[str], body: Dict) -> List[Dict]:
+    import httpx
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    if url:
+        async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+            return await _levels(client, endpoint, levels, requests, warmup, queries, body)
+
+    from app.api import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=60) as client:
+            return await _levels(client, endpoint, levels, requests, warmup, queries, body)
+
+
+async def _levels(client, endpoint, levels, requests, warmup, queries, body) -> List[Dict]:
+    await wait_until_ready(client)
+    # Warm-up queries come from the end of the list so timed ones stay uncached
+    await run_level(client, endpoint, queries[-warmup:] or queries, 1, warmup, body)
+    results = []
+    for offset, concurrency in enumerate(levels):
+        timed = queries[offset * requests:(offset + 1) * requests]
+        result = await run_level(client, endpoint, timed, concurrency, requests, body)
+        print(f"concurrency {concurrency:>4}: {result['qps']:>8} qps, p50 {result['latency'].get('p50_ms')} ms, "
+              f"p99 {result['latency'].get('p99_ms')} ms, errors {result['errors'] or 0}")
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query latency percentiles and throughput through the API')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--store', help='serve this VECTOR_STORE_PATH from the app in this process')
+    target.add_argument('--url', help='base URL of a running API server')
+    parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='query')
+    parser.add_argument('--concurrency', default='1,4,16,64', help='comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=500, help='timed requests per level')
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--mode', choices=('dense', 'hybrid'), default=None)
+    parser.add_argument('--fake-embeddings', type=int, default=0, metavar='DIM')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    if args.store:
+        configure(args.store, fake_embeddings=args.fake_embeddings)
+        install_fake_embeddings()
+    queries = synthetic_queries(args.requests * len(levels) + args.warmup, args.seed)
+    body = {'k': args.k, **({'mode': args.mode} if args.mode else {})}
+    results = asyncio.run(run(args.url, args.endpoint, levels, args.requests, args.warmup, queries, body))
+
+    report = {
+        'target': args.url or 'in-process',
+        'endpoint': args.endpoint,
+        'body': body,
+        'environment': environment(),
+        'levels': results,
+    }
+    if not args.url:
+        report['peak_rss_mb'] = peak_rss_mb()
+    write_json(args.json, report)
+
+
+if __name__ == '__main__':
+    main()
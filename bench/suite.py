@@ -0,0 +1,152 @@
+# bench/suite.py - corpus generation, ingest, cold start and query load in one comparable report
+#
+#   python -m bench.suite --scales 1000,10000 --json bench-main.json
+#   python -m bench.suite --scales 1000,10000 --json bench-branch.json --compare bench-main.json
+#   python -m bench.suite --scales 100000,1000000 --fake-embeddings 384 --skip query
+#
+# Every measurement runs in its own process with a scratch store under
+# --workdir, so runs on different commits see the same corpus (same seed)
+# and start from the same cold state. Settings such as INDEX_TYPE or
+# EMBEDDING_BACKEND are taken from the environment and recorded.
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+from bench.corpus import generate
+from bench.harness import environment, write_json
+
+STEPS = ('ingest', 'cold_start', 'query')
+# Metric name -> (path in a scale's report, True if higher is better), for --compare
+KEY_METRICS = {
+    'ingest chunks/s': (('ingest', 'full', 'chunks_per_second'), True),
+    'ingest loading files/s': (('ingest', 'full', 'stage_throughput', 'loading_files_per_second'), True),
+    'ingest embedding chunks/s': (('ingest', 'full', 'stage_throughput', 'embedding_chunks_per_second'), True),
+    'ingest peak RSS MB': (('ingest', 'peak_rss_mb'), False),
+    'index bytes': (('ingest', 'index_bytes', 'total'), False),
+    'cold start s': (('cold_start', 'median', 'process_seconds'), False),
+    'first query s': (('cold_start', 'median', 'first_query_seconds'), False),
+}
+
+
+def corpus_for(workdir: str, chunks: int, seed: int) -> str:
+    """Corpus directory for a scale, generated once and reused while its parameters match"""
+    directory = os.path.join(workdir, f'corpus-{chunks}')
+    summary_path = os.path.join(directory, 'corpus.json')
+    if os.path.exists(summary_path):
+        with open(summary_path, 'r', encoding='utf-8') as file:
+            summary = json.load(file)
+        if (summary['target_chunks'], summary['seed']) == (chunks, seed):
+            return directory
+    print(f'📝 Generating corpus of ~{chunks} chunks...')
+    os.makedirs(directory, exist_ok=True)
+    summary = generate(os.path.join(directory, 'raw'), chunks, seed=seed)
+    with open(summary_path, 'w', encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+    return directory
+
+
+def run_step(module: str, arguments: List[str], output: str) -> Optional[Dict]:
+    command = [sys.executable, '-m', module, *arguments, '--json', output]
+    print(f'▶️  {" ".join(command[1:])}')
+    result = subprocess.run(command, stdout=subprocess.DEVNULL)
+    if result.returncode != 0:
+        print(f'❌ {module} failed with exit code {result.returncode}')
+        return None
+    with open(output, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def run_scale(workdir: str, chunks: int, args) -> Dict:
+    directory = corpus_for(workdir, chunks, args.seed)
+    store = os.path.join(directory, 'store')
+    fake = ['--fake-embeddings', str(args.fake_embeddings)] if args.fake_embeddings else []
+    result = {'chunks': chunks}
+    with open(os.path.join(directory, 'corpus.json'), 'r', encoding='utf-8') as file:
+        result['corpus'] = json.load(file)
+    if 'ingest' not in args.skip:
+        result['ingest'] = run_step('bench.ingest_report', [os.path.join(directory, 'raw'), '--store', store,
+                                                            '--rerun', *fake], os.path.join(directory, 'ingest.json'))
+    if 'cold_start' not in args.skip:
+        result['cold_start'] = run_step('bench.cold_start', ['--store', store, '--repeats', str(args.repeats), *fake],
+                                        os.path.join(directory, 'cold_start.json'))
+    if 'query' not in args.skip:
+        result['query'] = run_step('bench.query_load', ['--store', store, '--concurrency', args.concurrency,
+                                                        '--requests', str(args.requests), *fake],
+                                   os.path.join(directory, 'query.json'))
+    return result
+
+
+def _lookup(data: Dict, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def key_metrics(scale: Dict) -> Dict[str, tuple]:
+    """{name: (value, higher is better)} for one scale of a report"""
+    metrics = {name: (_lookup(scale, path), higher) for name, (path, higher) in KEY_METRICS.items()}
+    for level in _lookup(scale, ('query', 'levels')) or []:
+        metrics[f'qps @{level["concurrency"]}'] = (level['qps'], True)
+        metrics[f'p99 ms @{level["concurrency"]}'] = (level['latency'].get('p99_ms'), False)
+    return metrics
+
+
+def compare(report: Dict, baseline: Dict):
+    """Print the change of the key metrics against a baseline report, per scale"""
+    previous = {scale['chunks']: key_metrics(scale) for scale in baseline.get('scales', [])}
+    print(f'\nvs baseline {baseline["environment"].get("git_commit")} (positive change is better)')
+    for scale in report['scales']:
+        if scale['chunks'] not in previous:
+            continue
+        print(f'{scale["chunks"]} chunks')
+        old = previous[scale['chunks']]
+        for name, (value, higher_is_better) in key_metrics(scale).items():
+            old_value = old.get(name, (None,))[0]
+            if not value or not old_value:
+                continue
+            change = (value - old_value) / old_value * 100 * (1 if higher_is_better else -1)
+            print(f'  {name:<28} {old_value:>14} -> {value:<14} {change:+.1f}%')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the ingest and query benchmarks at several corpus sizes')
+    parser.add_argument('--scales', default='1000,10000', help='comma-separated corpus sizes in chunks')
+    parser.add_argument('--workdir', default='./data/bench')
+    parser.add_argument('--skip', default='', help=f'comma-separated steps to skip: {",".join(STEPS)}')
+    parser.add_argument('--fake-embeddings', type=int, default=0, metavar='DIM',
+                        help='hash-based vectors instead of the model, to time the rest of the pipeline')
+    parser.add_argument('--repeats', type=int, default=3, help='cold starts per scale')
+    parser.add_argument('--concurrency', default='1,4,16,64')
+    parser.add_argument('--requests', type=int, default=500, help='timed requests per concurrency level')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--compare', help='earlier report to print the change against')
+    parser.add_argument('--json', help='write the report to this file')
+    args = parser.parse_args()
+    args.skip = {step for step in args.skip.split(',') if step}
+    unknown = args.skip - set(STEPS)
+    if unknown:
+        parser.error(f'unknown steps to skip: {sorted(unknown)}')
+
+    workdir = os.path.abspath(args.workdir)
+    started = time.time()
+    report = {
+        'environment': environment(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(started)),
+        'scales': [run_scale(workdir, int(chunks), args) for chunks in args.scales.split(',')],
+    }
+    report['seconds'] = round(time.time() - started, 1)
+    write_json(args.json, report)
+    print(f'✅ Benchmarks finished in {report["seconds"]}s' + (f', report in {args.json}' if args.json else ''))
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            compare(report, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
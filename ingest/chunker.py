@@ -0,0 +1,191 @@
+# ingest/chunker.py - section-aware chunks sized in embedding-model tokens
+import os
+import re
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Heading line -> canonical section name
+RESUME_SECTIONS = {
+    "summary": ("summary", "professional summary", "profile", "objective", "about me"),
+    "experience": ("experience", "work experience", "professional experience", "employment",
+                   "employment history", "work history", "career history"),
+    "skills": ("skills", "technical skills", "core skills", "key skills", "competencies", "technologies"),
+    "education": ("education", "academic background", "qualifications"),
+    "projects": ("projects", "personal projects", "key projects"),
+    "certifications": ("certifications", "certificates", "licenses", "licenses & certifications"),
+}
+JOB_FIELDS = {"Job Title": "title", "Company": "company", "Description": "description",
+              "Requirements": "requirements"}
+
+_HEADING_TO_SECTION = {heading: section for section, headings in RESUME_SECTIONS.items() for heading in headings}
+# A line holding only a known heading (any case, optional trailing colon)
+RESUME_HEADING = re.compile(
+    r"^[ \t]*(" + "|".join(sorted((re.escape(h) for h in _HEADING_TO_SECTION), key=len, reverse=True))
+    + r")[ \t]*:?[ \t]*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+JOB_FIELD = re.compile(r"^(" + "|".join(JOB_FIELDS) + r"):[ \t]*", re.MULTILINE)
+SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+# Rough stand-in for WordPiece when the model tokenizer is not installed
+_APPROX_TOKEN = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+class Section(NamedTuple):
+    name: str
+    heading: str
+    body: str
+
+
+def resume_sections(text: str) -> List[Section]:
+    """Split at heading lines found in one regex pass; text before the first is 'header'"""
+    boundaries = [(m.start(), m.end(), _HEADING_TO_SECTION[m.group(1).lower()], m.group(0).strip())
+                  for m in RESUME_HEADING.finditer(text)]
+    sections = []
+    previous_end, previous_name, previous_heading = 0, "header", ""
+    for start, end, name, heading in boundaries:
+        sections.append(Section(previous_name, previous_heading, text[previous_end:start]))
+        previous_end, previous_name, previous_heading = end, name, heading
+    sections.append(Section(previous_name, previous_heading, text[previous_end:]))
+    return [section for section in sections if section.body.strip()]
+
+
+def job_sections(text: str) -> List[Section]:
+    """Sections of a posting in the 'Field: value' layout ResumeLoader produces"""
+    matches = list(JOB_FIELD.finditer(text))
+    if not matches:
+        return [Section("description", "", text)]
+    sections = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append(Section(JOB_FIELDS[match.group(1)], match.group(1) + ":", text[match.end():end]))
+    return [section for section in sections if section.body.strip()]
+
+
+def load_token_counter(model_name: str) -> Callable[[List[str]], List[int]]:
+    """Token counts (without special tokens) from the model's own tokenizer"""
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+    except Exception as e:
+        print(f"⚠️  Tokenizer for {model_name} unavailable ({e}), estimating token counts")
+        return lambda texts: [len(_APPROX_TOKEN.findall(text)) for text in texts]
+    return lambda texts: [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]] if texts else []
+
+
+class SectionChunker:
+    """Splits resumes at their sections and job postings at their fields.
+
+    Each section is packed greedily from lines (then sentences, then words
+    for oversized lines) into chunks of at most max_tokens model tokens,
+    counting the 2 special tokens the model adds. Chunks never span two
+    sections, so each carries its section in metadata and starts with the
+    section heading. A job posting that fits the budget stays one chunk.
+    Token counts are computed once per piece, in one tokenizer call per
+    section.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = None, overlap_tokens: Optional[int] = None,
+                 count_tokens: Optional[Callable[[List[str]], List[int]]] = None, model_name: Optional[str] = None):
+        self.max_tokens = (max_tokens or int(os.getenv("CHUNK_TOKENS", "256"))) - 2
+        self.overlap_tokens = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0")) if overlap_tokens is None else overlap_tokens
+        self._count_tokens = count_tokens
+        self.model_name = model_name
+
+    @property
+    def count_tokens(self) -> Callable[[List[str]], List[int]]:
+        if self._count_tokens is None:
+            from app.deps import EMBEDDING_MODEL
+            self._count_tokens = load_token_counter(self.model_name or EMBEDDING_MODEL)
+        return self._count_tokens
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunks = []
+        for doc in documents:
+            for section, text in self.split_text(doc.page_content, doc.metadata.get("type")):
+                chunks.append(Document(page_content=text, metadata={**doc.metadata, "section": section}))
+        return chunks
+
+    def split_text(self, text: str, doc_type: Optional[str] = None) -> List[Tuple[str, str]]:
+        """(section, chunk text) pairs"""
+        if doc_type == "job_posting":
+            if self.count_tokens([text])[0] <= self.max_tokens:
+                return [("posting", text.strip())]
+            sections = job_sections(text)
+            # Every piece of a long posting keeps its title and company
+            values = {section.name: section.body.strip() for section in sections}
+            prefix = "\n".join(f"{label}: {values[name]}" for label, name in JOB_FIELDS.items()
+                               if name in ("title", "company") and values.get(name))
+            sections = [s._replace(heading=f"{prefix}\n{s.heading}" if prefix else s.heading)
+                        for s in sections if s.name not in ("title", "company")]
+        else:
+            sections = resume_sections(text)
+
+        result = []
+        for section in sections:
+            result.extend((section.name, chunk) for chunk in self._pack(section))
+        return result
+
+    def _pack(self, section: Section) -> List[str]:
+        heading = section.heading
+        units = [line.strip() for line in section.body.splitlines() if line.strip()]
+        heading_tokens, *counts = self.count_tokens([heading] + units)
+        budget = self.max_tokens - heading_tokens
+        units, counts = self._fit_units(units, counts, budget)
+
+        chunks, current, current_tokens = [], [], 0
+        for unit, tokens in zip(units, counts):
+            if current and current_tokens + tokens > budget:
+                chunks.append(current)
+                current, current_tokens = self._overlap(current)
+                if current_tokens + tokens > budget:
+                    current, current_tokens = [], 0
+            current.append((unit, tokens))
+            current_tokens += tokens
+        if current:
+            chunks.append(current)
+        return ["\n".join(filter(None, [heading] + [unit for unit, _ in chunk])) for chunk in chunks]
+
+    def _overlap(self, chunk: List[Tuple[str, int]]) -> Tuple[List[Tuple[str, int]], int]:
+        """Trailing units of the previous chunk, up to overlap_tokens"""
+        carried, tokens = [], 0
+        for unit, count in reversed(chunk):
+            if tokens + count > self.overlap_tokens:
+                break
+            carried.insert(0, (unit, count))
+            tokens += count
+        return carried, tokens
+
+    def _fit_units(self, units: List[str], counts: List[int], budget: int) -> Tuple[List[str], List[int]]:
+        """Break units over budget into sentences, and sentences over budget into word runs"""
+        if all(count <= budget for count in counts):
+            return units, counts
+        fitted_units, fitted_counts = [], []
+        for unit, count in zip(units, counts):
+            if count <= budget:
+                fitted_units.append(unit)
+                fitted_counts.append(count)
+                continue
+            sentences = SENTENCE_END.split(unit)
+            for sentence, sentence_count in zip(sentences, self.count_tokens(sentences)):
+                if sentence_count <= budget:
+                    fitted_units.append(sentence)
+                    fitted_counts.append(sentence_count)
+                else:
+                    pieces = self._word_runs(sentence, budget)
+                    fitted_units.extend(pieces)
+                    fitted_counts.extend(self.count_tokens(pieces))
+        return fitted_units, fitted_counts
+
+    def _word_runs(self, text: str, budget: int) -> List[str]:
+        words = text.split()
+        runs, current, current_tokens = [], [], 0
+        for word, tokens in zip(words, self.count_tokens(words)):
+            if current and current_tokens + tokens > budget:
+                runs.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += tokens
+        if current:
+            runs.append(" ".join(current))
+        return runs
@@ -0,0 +1,168 @@
+# ingest/dedup.py - near-duplicate chunk detection with MinHash and LSH banding
+import json
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+_PRIME = (1 << 31) - 1  # keeps a * x + b inside uint64
+_WORD = re.compile(r"\w+")
+
+
+def shingle_hashes(text: str, size: int = 3) -> np.ndarray:
+    """crc32 of each run of `size` lowercase words (stable across processes)"""
+    words = _WORD.findall(text.lower())
+    shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) % _PRIME for s in shingles), dtype=np.uint64)
+
+
+class ChunkDeduplicator:
+    """Drops chunks whose word-shingle Jaccard similarity to a kept chunk is
+    at least `threshold`, estimated from MinHash signatures.
+
+    Candidates come from LSH banding: the signature is cut into `bands`
+    bands and chunks sharing any band land in the same bucket, so each new
+    chunk is compared with a handful of candidates instead of every chunk
+    (sub-quadratic overall). Signatures of kept chunks are saved with each
+    vector store version, so later incremental runs dedupe against what is
+    already indexed. For each kept chunk the sources of its dropped copies
+    are remembered and written into its metadata as duplicate_sources.
+    """
+
+    def __init__(self, num_perm: Optional[int] = None, bands: Optional[int] = None,
+                 threshold: Optional[float] = None, min_words: Optional[int] = None, seed: int = 1):
+        self.num_perm = num_perm or int(os.getenv("DEDUP_NUM_PERM", "128"))
+        self.bands = bands or int(os.getenv("DEDUP_BANDS", "32"))
+        if self.num_perm % self.bands:
+            raise ValueError(f"num_perm ({self.num_perm}) must be a multiple of bands ({self.bands})")
+        self.threshold = threshold or float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+        # Short chunks (a heading and one line) are alike by nature, not copies
+        self.min_words = int(os.getenv("DEDUP_MIN_WORDS", "20")) if min_words is None else min_words
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, self.num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, self.num_perm, dtype=np.uint64)
+        self.ids: List[str] = []
+        self.signatures: List[np.ndarray] = []
+        self.links: Dict[str, List[str]] = {}
+        self.removed = set()
+        self.checked = 0
+        self.dropped = 0
+        self._buckets = defaultdict(list)
+        self._touched = set()
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text)
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray):
+        rows = self.num_perm // self.bands
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def _insert(self, chunk_id: str, signature: np.ndarray):
+        position = len(self.ids)
+        self.ids.append(chunk_id)
+        self.signatures.append(signature)
+        for key in self._band_keys(signature):
+            self._buckets[key].append(position)
+
+    def _find(self, signature: np.ndarray) -> Optional[str]:
+        seen = set()
+        for key in self._band_keys(signature):
+            for position in self._buckets.get(key, ()):
+                if position in seen or self.ids[position] in self.removed:
+                    continue
+                seen.add(position)
+                if np.mean(self.signatures[position] == signature) >= self.threshold:
+                    return self.ids[position]
+        return None
+
+    def filter(self, chunks: List[Document], chunk_ids: List[str]) -> Tuple[List[Document], List[str], List[str]]:
+        """(kept chunks, their ids, ids of the kept chunks that the dropped ones duplicate)"""
+        kept, kept_ids, duplicate_of = [], [], []
+        for chunk, chunk_id in zip(chunks, chunk_ids):
+            self.checked += 1
+            if len(_WORD.findall(chunk.page_content)) < self.min_words:
+                kept.append(chunk)
+                kept_ids.append(chunk_id)
+                continue
+            signature = self.signature(chunk.page_content)
+            original = self._find(signature)
+            if original is None:
+                self._insert(chunk_id, signature)
+                kept.append(chunk)
+                kept_ids.append(chunk_id)
+                continue
+            self.dropped += 1
+            source = chunk.metadata.get("source")
+            if source is not None and source not in self.links.setdefault(original, []):
+                self.links[original].append(source)
+                self._touched.add(original)
+            duplicate_of.append(original)
+        return kept, kept_ids, duplicate_of
+
+    def remove(self, chunk_ids: List[str], sources: List[str]):
+        """Forget chunks leaving the index and copies that lived in `sources`"""
+        self.removed.update(chunk_ids)
+        for chunk_id in chunk_ids:
+            if self.links.pop(chunk_id, None):
+                self._touched.add(chunk_id)
+        sources = set(sources)
+        for original, linked in self.links.items():
+            if sources.intersection(linked):
+                linked[:] = [source for source in linked if source not in sources]
+                self._touched.add(original)
+
+    def link_sources(self, vectorstore):
+        """Write duplicate_sources into the metadata of kept chunks whose copies changed"""
+        for chunk_id in self._touched:
+            if chunk_id in self.removed:
+                continue
+            doc = vectorstore.docstore.search(chunk_id)
+            if not isinstance(doc, Document):
+                continue
+            if self.links.get(chunk_id):
+                doc.metadata["duplicate_sources"] = list(self.links[chunk_id])
+            else:
+                doc.metadata.pop("duplicate_sources", None)
+        self._touched.clear()
+
+    def report(self) -> Dict:
+        return {
+            "chunks_checked": self.checked,
+            "duplicates_dropped": self.dropped,
+            "dropped_percent": round(100.0 * self.dropped / self.checked, 2) if self.checked else 0.0,
+        }
+
+    def save(self, directory: str):
+        keep = [i for i, chunk_id in enumerate(self.ids) if chunk_id not in self.removed]
+        signatures = np.stack([self.signatures[i] for i in keep]) if keep else \
+            np.empty((0, self.num_perm), dtype=np.uint32)
+        np.save(os.path.join(directory, "dedup.signatures.npy"), signatures)
+        with open(os.path.join(directory, "dedup.json"), "w", encoding="utf-8") as file:
+            json.dump({
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "ids": [self.ids[i] for i in keep],
+                "links": {original: linked for original, linked in self.links.items() if linked},
+            }, file)
+
+    @classmethod
+    def load(cls, directory: str) -> "ChunkDeduplicator":
+        """State saved with a version, or an empty deduplicator if there is none (or settings changed)"""
+        deduplicator = cls()
+        path = os.path.join(directory, "dedup.json")
+        if not os.path.exists(path):
+            return deduplicator
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        if (data["num_perm"], data["bands"]) != (deduplicator.num_perm, deduplicator.bands):
+            return deduplicator
+        signatures = np.load(os.path.join(directory, "dedup.signatures.npy"))
+        for chunk_id, signature in zip(data["ids"], signatures):
+            deduplicator._insert(chunk_id, signature)
+        deduplicator.links = data["links"]
+        return deduplicator
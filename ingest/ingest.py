@@ -1,47 +1,203 @@
 # ingest/ingest.py - USING VERIFIED IMPORTS
+import hashlib
 import os
+import uuid
+from collections import defaultdict
 from pathlib import Path
+from typing import List, Optional
 
 # Verified imports
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
+import numpy as np
 
-from .loaders import ResumeLoader
+from .chunker import SectionChunker
+from .dedup import ChunkDeduplicator
+from .loaders import SUPPORTED_EXTENSIONS, TABULAR_EXTENSIONS, ResumeLoader
+from .jobs import IngestProgress, StoreLock
+from .manifest import IngestManifest
+from .upload import InvalidUpload, PreparedUpload, UnsupportedFileType, UploadConflict
 from app.deps import embeddings_manager, vectorstore_manager
+from app.index_factory import index_type_of, supports_removal
+from app.shards import Shard, ShardLayout
 
 class ResumeIngestor:
-    def __init__(self):
-        self.loader = ResumeLoader()
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
+    def __init__(self, loader_workers: Optional[int] = None, batch_size: Optional[int] = None):
+        self.loader = ResumeLoader(workers=loader_workers)
+        self.layout = ShardLayout.from_env()
+        # Store being ingested; one per shard in a sharded layout
+        self.store = vectorstore_manager
+        # Chunks embedded and added per step; 0 embeds everything in one go
+        self.batch_size = int(os.getenv('INGEST_BATCH_SIZE', '256')) if batch_size is None else batch_size
+        self.progress = IngestProgress()
+        # Drop near-duplicate chunks before embedding (see ingest/dedup.py)
+        self.dedup = os.getenv('DEDUP', '1') == '1'
+        # "sections": token-sized chunks that follow resume sections and
+        # posting fields; "characters": the original 1000/200 character split
+        if os.getenv('CHUNKER', 'sections') == 'characters':
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=1000,
+                chunk_overlap=200,
+                length_function=len,
+            )
+        else:
+            self.text_splitter = SectionChunker()
     
-    def ingest_documents(self) -> bool:
-        """Main ingestion pipeline"""
+    def ingest_documents(self, full_rebuild: bool = False,
+                         progress: Optional[IngestProgress] = None, shard: Optional[str] = None) -> bool:
+        """Main ingestion pipeline.
+
+        Only files that are new or changed since the last run (according to
+        the manifest stored next to the vector store) are embedded. Chunks
+        owned by changed or deleted files are removed from the existing index
+        in place. Pass full_rebuild=True to ignore the manifest.
+
+        Files are streamed from the loader, split as they arrive and embedded
+        in batches of self.batch_size chunks, so parsing of later files
+        overlaps with embedding of earlier ones.
+
+        Stage and counters are reported through `progress` when given.
+        With a sharded layout (SHARD_BY) each shard is ingested and published
+        in turn, or only `shard` when given.
+        """
+        self.progress = progress or IngestProgress()
+        if not self.layout.sharded:
+            return self._ingest_shard(self.layout.shards["default"], full_rebuild)
+        
+        names = self.layout.discover(self.loader.data_path)
+        if shard is not None:
+            if shard not in names:
+                print(f"❌ Unknown shard {shard!r}, expected one of {names}")
+                return False
+            names = [shard]
+        results = [self._ingest_shard(self.layout.shards[name], full_rebuild) for name in names]
+        return all(results)
+    
+    def _ingest_shard(self, shard: Shard, full_rebuild: bool) -> bool:
+        """Bring one shard's store up to date with its files and publish it"""
+        self.store = shard.store
+        # e.g. the tenant of a tenant shard, so results can be told apart
+        routing_metadata = {field: values[0] for field, values in shard.routing.items() if len(values) == 1}
         try:
-            print("📚 Loading documents...")
-            documents = self.loader.load_documents()
+            self.progress.set_stage("loading")
+            print("📚 Loading documents..." if not self.layout.sharded else f"📚 Loading documents for shard {shard.name}...")
+            file_paths = self.layout.files_for(shard.name, self.loader)
             
-            if not documents:
+            if not file_paths:
+                if self.layout.sharded:
+                    print(f"ℹ️  No documents for shard {shard.name}, skipping")
+                    return True
                 print("❌ No documents found in ./data/raw/")
                 print("💡 Please add your resume (PDF/DOCX/TXT) to data/raw/ folder")
                 return False
             
-            print(f"✅ Loaded {len(documents)} documents")
+            vectorstore = None if full_rebuild else self._load_existing_vectorstore()
+            manifest = IngestManifest()
+            if vectorstore is not None:
+                manifest = IngestManifest.load(self.store.current_path())
+                if not manifest.entries:
+                    # Index predates the manifest, so its chunks cannot be attributed
+                    vectorstore = None
             
-            print("✂️  Splitting documents into chunks...")
-            chunks = self.text_splitter.split_documents(documents)
-            print(f"✅ Created {len(chunks)} chunks")
+            plan = manifest.with_dependents(manifest.diff(file_paths))
+            stale_ids = manifest.chunk_ids(plan.changed + plan.deleted)
+            if stale_ids and not supports_removal(vectorstore.index):
+                # IVF/HNSW cannot drop vectors in place; unchanged chunks come
+                # back from the embedding cache, so a rebuild stays cheap
+                print(f"♻️  {index_type_of(vectorstore.index)} index cannot delete in place, rebuilding")
+                vectorstore, manifest = None, IngestManifest()
+                plan = manifest.diff(file_paths)
+                stale_ids = []
+            self.progress.files_total += len(plan.to_load)
+            print(f"✅ {len(plan.new)} new, {len(plan.changed)} changed, "
+                  f"{len(plan.deleted)} deleted, {len(plan.unchanged)} unchanged files")
             
-            print("🔮 Creating embeddings and vector store...")
-            embeddings = embeddings_manager.get_embeddings()
-            vectorstore = FAISS.from_documents(chunks, embeddings)
+            # A deleted file can own no chunks (all duplicates) and still be
+            # linked from the chunks it duplicated, so it needs a new version
+            if not plan.to_load and not plan.deleted and vectorstore is not None:
+                manifest.save(self.store.current_path())
+                print("🎉 Vector store is already up to date")
+                return True
             
+            if stale_ids:
+                print(f"🗑️  Removing {len(stale_ids)} stale chunks...")
+                self._delete_chunks(vectorstore, stale_ids)
+            manifest.remove(plan.changed + plan.deleted)
+            
+            deduplicator = None
+            if self.dedup:
+                deduplicator = ChunkDeduplicator.load(self.store.current_path()) \
+                    if vectorstore is not None else ChunkDeduplicator()
+                deduplicator.remove(stale_ids, plan.changed + plan.deleted)
+            
+            print("✂️  Splitting and embedding documents in batches...")
+            self.loader.errors = []
+            pending_chunks, pending_ids = [], []
+            total_chunks = 0
+            ids_by_file = defaultdict(list)
+            duplicates_by_file = defaultdict(list)
+            for loaded in self.loader.iter_files(plan.to_load):
+                if loaded.complete:
+                    self.progress.add(files=1)
+                if loaded.error is not None:
+                    # Left out of the manifest (or, if some of its pieces were
+                    # already added, marked changed) so the next run retries it
+                    print(f"⚠️  Could not load {loaded.file_path}: {loaded.error.error_type}: {loaded.error.message}")
+                    manifest.invalidate(loaded.file_path)
+                    continue
+                self.progress.set_stage("splitting")
+                file_chunks = self.text_splitter.split_documents(loaded.documents)
+                for chunk in file_chunks:
+                    chunk.metadata.update(routing_metadata)
+                file_chunk_ids = [str(uuid.uuid4()) for _ in file_chunks]
+                if deduplicator is not None:
+                    file_chunks, file_chunk_ids, duplicate_of = deduplicator.filter(file_chunks, file_chunk_ids)
+                    duplicates_by_file[loaded.file_path].extend(duplicate_of)
+                    self.progress.add(duplicates=len(duplicate_of))
+                # Job feeds come in several pieces; the entry holds all of them
+                ids_by_file[loaded.file_path].extend(file_chunk_ids)
+                manifest.record(loaded.file_path, plan.hashes[loaded.file_path], ids_by_file[loaded.file_path],
+                                duplicates_by_file[loaded.file_path])
+                pending_chunks.extend(file_chunks)
+                pending_ids.extend(file_chunk_ids)
+                
+                batch_size = self._batch_size_for(vectorstore)
+                while batch_size and len(pending_chunks) >= batch_size:
+                    vectorstore = self._add_batch(
+                        vectorstore, pending_chunks[:batch_size], pending_ids[:batch_size]
+                    )
+                    total_chunks += batch_size
+                    del pending_chunks[:batch_size], pending_ids[:batch_size]
+                    batch_size = self._batch_size_for(vectorstore)
+                self.progress.set_stage("loading")
+            
+            if pending_chunks:
+                vectorstore = self._add_batch(vectorstore, pending_chunks, pending_ids)
+                total_chunks += len(pending_chunks)
+            print(f"✅ Embedded {total_chunks} chunks")
+            if deduplicator is not None:
+                report = deduplicator.report()
+                print(f"🧬 Dropped {report['duplicates_dropped']} near-duplicate chunks "
+                      f"({report['dropped_percent']}% of {report['chunks_checked']})")
+            
+            if vectorstore is None:
+                print("❌ No text could be extracted from ./data/raw/")
+                return False
+            
+            self.progress.set_stage("saving")
             print("💾 Saving vector store...")
-            vectorstore_manager.save_vectorstore(vectorstore)
+            embeddings_manager.flush_cache()
+            
+            def write_extras(path: str):
+                manifest.save(path)
+                if deduplicator is not None:
+                    deduplicator.save(path)
+            
+            if deduplicator is not None:
+                deduplicator.link_sources(vectorstore)
+            version = self.store.save_vectorstore(vectorstore, write_extras=write_extras)
+            print(f"✅ Published vector store version {version}")
             
             print("🎉 Ingestion completed successfully!")
             return True
@@ -52,10 +208,170 @@ class ResumeIngestor:
             traceback.print_exc()
             return False
     
+    def prepare_upload(self, file_name: str, data: bytes, shard: Optional[str] = None) -> PreparedUpload:
+        """Parse, split and embed one uploaded file without touching any store.
+
+        The file is placed as if it had been dropped into the data directory
+        (the tenant's subdirectory with SHARD_BY=tenant, where `shard` names
+        the tenant), so the next directory ingest sees it as unchanged once
+        publish_uploads has written it. Raises InvalidUpload for unsupported
+        or empty files and UploadConflict if the file name is taken.
+        """
+        stem, extension = os.path.splitext(os.path.basename(file_name or ""))
+        extension = extension.lower()
+        if not stem or extension not in SUPPORTED_EXTENSIONS:
+            raise UnsupportedFileType(f"Unsupported file type, expected one of {', '.join(SUPPORTED_EXTENSIONS)}")
+        shard_name = self._upload_shard(extension, shard)
+        directory = self.loader.data_path
+        if self.layout.mode == "tenant":
+            directory = os.path.join(directory, shard_name)
+        source_path = os.path.join(directory, stem + extension)
+        if os.path.exists(source_path):
+            raise UploadConflict(f"{source_path} already exists; change the file there and run an ingest instead")
+
+        try:
+            documents = self.loader.load_bytes(source_path, data)
+        except Exception as e:
+            raise InvalidUpload(f"Could not parse {file_name}: {type(e).__name__}: {e}") from e
+        chunks = self.text_splitter.split_documents(documents)
+        if not chunks:
+            raise InvalidUpload(f"No text could be extracted from {file_name}")
+        if shard_name not in self.layout.shards:
+            # First upload for a tenant: register it as a directory ingest would
+            os.makedirs(directory, exist_ok=True)
+            self.layout.discover(self.loader.data_path)
+        routing = self.layout.shards[shard_name].routing
+        for chunk in chunks:
+            chunk.metadata.update({field: values[0] for field, values in routing.items() if len(values) == 1})
+        chunk_ids = [str(uuid.uuid4()) for _ in chunks]
+        vectors = embeddings_manager.get_embeddings().embed_documents([chunk.page_content for chunk in chunks])
+        return PreparedUpload(shard_name, source_path, data, hashlib.sha256(data).hexdigest(), chunks, chunk_ids,
+                              np.asarray(vectors, dtype=np.float32))
+
+    def _upload_shard(self, extension: str, shard: Optional[str]) -> str:
+        if self.layout.mode == "none":
+            if shard is not None:
+                raise InvalidUpload("The vector store is not sharded (SHARD_BY=none), leave out shard")
+            return "default"
+        if self.layout.mode == "type":
+            name = "jobs" if extension in TABULAR_EXTENSIONS else "resumes"
+            if shard is not None and shard != name:
+                raise InvalidUpload(f"{extension} files go to shard {name!r} with SHARD_BY=type")
+            return name
+        if not shard or shard in (".", "..") or shard != os.path.basename(shard):
+            raise InvalidUpload("SHARD_BY=tenant needs the tenant as shard")
+        return shard
+
+    def publish_uploads(self, shard_name: str, uploads: List[PreparedUpload],
+                        progress: Optional[IngestProgress] = None) -> bool:
+        """Write prepared uploads to the data directory and publish them in one new version.
+
+        Their chunks keep the ids they were served under before publication.
+        Near-duplicate removal does not apply to them; the deduplicator state
+        of the current version is carried over unchanged.
+        """
+        self.progress = progress or IngestProgress()
+        self.layout.refresh()
+        self.store = self.layout.shards[shard_name].store
+        try:
+            self.progress.files_total += len(uploads)
+            vectorstore, manifest = None, IngestManifest()
+            if os.path.exists(os.path.join(self.store.current_path(), "index.faiss")):
+                # No rebuild fallback: a store of only the uploads would drop everything else
+                vectorstore = self.store.get_vectorstore(writable=True)
+                manifest = IngestManifest.load(self.store.current_path())
+            carry_dedup = self.dedup and vectorstore is not None
+            # An index that predates the manifest is rebuilt by the next ingest,
+            # which finds the files on disk; entries for them alone would hide the rest
+            track = vectorstore is None or bool(manifest.entries)
+            for upload in uploads:
+                os.makedirs(os.path.dirname(upload.source_path), exist_ok=True)
+                tmp_path = upload.source_path + ".upload.tmp"
+                with open(tmp_path, "wb") as file:
+                    file.write(upload.data)
+                os.replace(tmp_path, upload.source_path)
+                if track:
+                    manifest.record(upload.source_path, upload.sha256, upload.chunk_ids)
+                if vectorstore is None:
+                    vectorstore = self._add_batch(vectorstore, upload.chunks, upload.chunk_ids)
+                else:
+                    # Vectors from the upload, not embedded a second time
+                    texts = [chunk.page_content for chunk in upload.chunks]
+                    vectorstore.add_embeddings(zip(texts, upload.vectors.tolist()),
+                                               metadatas=[chunk.metadata for chunk in upload.chunks],
+                                               ids=upload.chunk_ids)
+                    self.progress.add(chunks=len(upload.chunks))
+                self.progress.add(files=1)
+
+            self.progress.set_stage("saving")
+            current_path = self.store.current_path()
+
+            def write_extras(path: str):
+                if track:
+                    manifest.save(path)
+                if carry_dedup:
+                    ChunkDeduplicator.load(current_path).save(path)
+
+            version = self.store.save_vectorstore(vectorstore, write_extras=write_extras)
+            print(f"✅ Published {len(uploads)} uploaded files to {shard_name} as version {version}")
+            return True
+
+        except Exception as e:
+            print(f"❌ Publishing uploads failed: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+    def _add_batch(self, vectorstore: Optional[FAISS], chunks: List[Document],
+                   chunk_ids: List[str]) -> FAISS:
+        """Embed one batch of chunks and add it to the index, creating it if needed"""
+        self.progress.set_stage("embedding")
+        if vectorstore is None:
+            vectorstore = self.store.create_vectorstore(chunks, chunk_ids)
+        else:
+            vectorstore.add_documents(chunks, ids=chunk_ids)
+        self.progress.add(chunks=len(chunks))
+        return vectorstore
+    
+    def _batch_size_for(self, vectorstore: Optional[FAISS]) -> int:
+        """The first batch of a trained index (IVF) doubles as its training sample"""
+        config = self.store.index_config
+        if vectorstore is None and self.batch_size and config.needs_training:
+            return max(self.batch_size, config.train_size)
+        return self.batch_size
+    
+    def _load_existing_vectorstore(self) -> Optional[FAISS]:
+        """Existing index to update in place, or None to build from scratch"""
+        if not os.path.exists(os.path.join(self.store.current_path(), "index.faiss")):
+            return None
+        try:
+            return self.store.get_vectorstore(writable=True)
+        except Exception as e:
+            print(f"⚠️  Rebuilding from scratch: {e}")
+            return None
+    
+    def _delete_chunks(self, vectorstore: FAISS, chunk_ids: List[str]):
+        known_ids = set(vectorstore.index_to_docstore_id.values())
+        chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id in known_ids]
+        if chunk_ids:
+            vectorstore.delete(chunk_ids)
+    
     def check_existing_data(self) -> bool:
-        """Check if vector store exists"""
-        return os.path.exists(vectorstore_manager.vector_store_path)
+        """Check if vector store exists (any shard, when sharded)"""
+        return any(os.path.exists(os.path.join(shard.store.current_path(), "index.faiss"))
+                   for shard in self.layout.shards.values())
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingest documents from ./data/raw into the vector store")
+    parser.add_argument("--shard", help="only rebuild this shard (SHARD_BY=type or tenant)")
+    parser.add_argument("--full-rebuild", action="store_true", help="ignore the manifest and re-embed everything")
+    args = parser.parse_args()
     ingestor = ResumeIngestor()
-    ingestor.ingest_documents()
\ No newline at end of file
+    root = ingestor.layout.root
+    # Same locks as API ingest jobs, so the two never write a store at once
+    locks = [StoreLock(root)] if args.shard is None else \
+        [StoreLock(os.path.join(root, "shards", args.shard)), StoreLock(root, shared=True)]
+    if not all(lock.acquire() for lock in locks):
+        raise SystemExit(f"❌ An ingest is already running for {root}")
+    ingestor.ingest_documents(full_rebuild=args.full_rebuild, shard=args.shard)
\ No newline at end of file
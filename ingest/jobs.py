@@ -0,0 +1,352 @@
+# ingest/jobs.py - background ingestion jobs with progress reporting
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: jobs only exclude each other within one process
+    fcntl = None
+
+from app.metrics import registry
+
+LOCK_FILENAME = ".ingest.lock"
+# Job status files are rewritten at most this often while a job makes progress
+STATUS_WRITE_INTERVAL = 1.0
+STAGES = ("queued", "loading", "splitting", "embedding", "saving", "done")
+
+STAGE_SECONDS = registry.counter("ingest_stage_seconds_total", "Wall time ingest runs spent in each stage", ("stage",))
+FILES = registry.counter("ingest_files_total", "Files parsed by ingest runs")
+CHUNKS = registry.counter("ingest_chunks_total", "Chunks embedded and added to an index")
+DUPLICATES = registry.counter("ingest_duplicates_dropped_total", "Near-duplicate chunks dropped before embedding")
+JOBS = registry.counter("ingest_jobs_total", "Finished background ingest jobs", ("status",))
+JOB_SECONDS = registry.histogram("ingest_job_seconds", "Duration of background ingest jobs",
+                                 buckets=(1, 5, 15, 60, 300, 900, 3600, 4 * 3600))
+
+
+class IngestProgress:
+    """Counters the ingestor updates as it goes; read by the status endpoint"""
+
+    def __init__(self):
+        self.stage = "queued"
+        self.files_total = 0
+        self.files_done = 0
+        self.chunks_done = 0
+        self.duplicates_dropped = 0
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        # Wall time spent in each stage; the pipeline alternates between them
+        self.stage_seconds: Dict[str, float] = {}
+        self._stage_started: Optional[float] = None
+        self._lock = threading.Lock()
+        # Called after every update, e.g. to publish the progress to other processes
+        self.on_update: Optional[Callable[[], None]] = None
+
+    def set_stage(self, stage: str):
+        with self._lock:
+            now = time.perf_counter()
+            if self.started_at is None:
+                self.started_at = time.time()
+            if self._stage_started is not None:
+                self.stage_seconds[self.stage] = self.stage_seconds.get(self.stage, 0.0) + now - self._stage_started
+                STAGE_SECONDS.inc(now - self._stage_started, stage=self.stage)
+            self._stage_started = now
+            self.stage = stage
+            if stage == "done":
+                self.finished_at = time.time()
+        if self.on_update is not None:
+            self.on_update()
+
+    def add(self, files: int = 0, chunks: int = 0, duplicates: int = 0):
+        with self._lock:
+            self.files_done += files
+            self.chunks_done += chunks
+            self.duplicates_dropped += duplicates
+        if files:
+            FILES.inc(files)
+        if chunks:
+            CHUNKS.inc(chunks)
+        if duplicates:
+            DUPLICATES.inc(duplicates)
+        if self.on_update is not None:
+            self.on_update()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            eta = None
+            if self.files_done and self.files_total > self.files_done and self.finished_at is None:
+                eta = elapsed / self.files_done * (self.files_total - self.files_done)
+            return {
+                "stage": self.stage,
+                "files_total": self.files_total,
+                "files_processed": self.files_done,
+                "chunks_processed": self.chunks_done,
+                "duplicates_dropped": self.duplicates_dropped,
+                "elapsed_seconds": round(elapsed, 2),
+                "files_per_second": round(self.files_done / elapsed, 2) if elapsed else 0.0,
+                "chunks_per_second": round(self.chunks_done / elapsed, 2) if elapsed else 0.0,
+                "eta_seconds": round(eta, 1) if eta is not None else None,
+                "stage_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+            }
+
+
+class IngestJob:
+    def __init__(self, vector_store_path: str):
+        self.job_id = uuid.uuid4().hex
+        self.vector_store_path = vector_store_path
+        self.status = "queued"
+        self.progress = IngestProgress()
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "vector_store_path": self.vector_store_path,
+            "error": self.error,
+            "created_at": self.created_at,
+            **self.progress.snapshot(),
+        }
+
+
+class RecordedJob:
+    """A job as another process last wrote it to the status directory"""
+
+    def __init__(self, record: Dict):
+        self.record = record
+        self.job_id = record.get("job_id")
+        self.vector_store_path = record.get("vector_store_path")
+        self.status = record.get("status")
+        self.created_at = record.get("created_at") or 0.0
+
+    def to_dict(self) -> Dict:
+        return dict(self.record)
+
+
+class StoreLock:
+    """flock on <store>/.ingest.lock, held for a whole ingest run.
+
+    Exclusive for the store a run writes. A run on one shard also holds the
+    sharded root shared, so it excludes runs over the whole store but not
+    runs on other shards. The exclusive holder writes its job id into the
+    file, so a process that is turned away can say which job is in the way.
+    Locks die with their process, so a crashed run never blocks the store.
+    """
+
+    def __init__(self, vector_store_path: str, shared: bool = False):
+        self.path = os.path.join(vector_store_path, LOCK_FILENAME)
+        self.shared = shared
+        self._fd: Optional[int] = None
+
+    def acquire(self, owner: str = "") -> bool:
+        """Take the lock without waiting; False if another run holds it"""
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, (fcntl.LOCK_SH if self.shared else fcntl.LOCK_EX) | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        if not self.shared:
+            os.ftruncate(fd, 0)
+            os.pwrite(fd, owner.encode(), 0)
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            if not self.shared:
+                os.ftruncate(self._fd, 0)
+            os.close(self._fd)  # drops the flock
+            self._fd = None
+
+    def holder(self) -> str:
+        """Job id written by the current exclusive holder, '' if unknown"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return file.read().strip()
+        except OSError:
+            return ""
+
+    def held(self) -> bool:
+        """Whether some run holds the lock exclusively right now"""
+        if fcntl is None or not os.path.exists(self.path):
+            return False
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            return False
+        except BlockingIOError:
+            return True
+        finally:
+            os.close(fd)
+
+
+class IngestAlreadyRunning(Exception):
+    def __init__(self, job):
+        super().__init__(f"Ingest job {job.job_id or '(outside the API)'} is already running "
+                         f"for {job.vector_store_path}")
+        self.job = job
+
+
+class IngestJobManager:
+    """Runs ingestion jobs on background threads, one at a time per vector store.
+
+    Each run holds the store's StoreLock, so runs also exclude each other
+    across API worker processes and the ingest CLI. With status_dir, every
+    job's status is written there as <job_id>.json, and get/list include
+    jobs started by other processes.
+    """
+
+    def __init__(self, max_history: int = 100, status_dir: Optional[str] = None):
+        self.max_history = max_history
+        self.status_dir = status_dir
+        self._jobs: Dict[str, IngestJob] = {}
+        self._active: Dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, vector_store_path: str, run: Callable[[IngestProgress], bool],
+              within: Optional[str] = None) -> IngestJob:
+        """Start run(progress) in the background; it returns True on success.
+
+        within: the store vector_store_path is part of (the root of a
+        sharded store), locked shared for the run.
+        """
+        key = os.path.abspath(vector_store_path)
+        with self._lock:
+            # A whole sharded store and one of its shards (nested paths) conflict too
+            for active_key, active in self._active.items():
+                if os.path.commonpath([active_key, key]) in (active_key, key):
+                    raise IngestAlreadyRunning(active)
+            job = IngestJob(vector_store_path)
+            locks = [StoreLock(vector_store_path)] + ([StoreLock(within, shared=True)] if within else [])
+            for i, lock in enumerate(locks):
+                if not lock.acquire(job.job_id):
+                    for acquired in locks[:i]:
+                        acquired.release()
+                    raise IngestAlreadyRunning(self._holder(lock))
+            self._active[key] = job
+            self._jobs[job.job_id] = job
+            self._trim_history()
+
+        last_write = [0.0]
+
+        def write_progress():
+            if time.monotonic() - last_write[0] >= STATUS_WRITE_INTERVAL:
+                last_write[0] = time.monotonic()
+                self._write_status(job)
+
+        job.progress.on_update = write_progress
+        self._write_status(job)
+        thread = threading.Thread(target=self._run, args=(job, key, run, locks),
+                                  name=f"ingest-{job.job_id[:8]}", daemon=True)
+        thread.start()
+        return job
+
+    def _run(self, job: IngestJob, key: str, run: Callable[[IngestProgress], bool], locks: List[StoreLock]):
+        job.status = "running"
+        try:
+            job.status = "succeeded" if run(job.progress) else "failed"
+            if job.status == "failed":
+                job.error = "Ingestion failed, see server logs"
+        except Exception as e:
+            traceback.print_exc()
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.progress.on_update = None
+            job.progress.set_stage("done")
+            JOBS.inc(status=job.status)
+            JOB_SECONDS.observe(job.progress.finished_at - job.progress.started_at)
+            self._write_status(job)
+            with self._lock:
+                self._active.pop(key, None)
+                for lock in locks:
+                    lock.release()
+
+    def _holder(self, lock: StoreLock) -> RecordedJob:
+        """The job (possibly of another process) holding `lock`"""
+        store = os.path.dirname(lock.path)
+        job_id = lock.holder()
+        record = self._read_status(job_id) if job_id else None
+        if record is None:
+            # Held shared: the runs on shards of this store
+            running = [job for job in self.list() if job.status in ("queued", "running")
+                       and os.path.commonpath([os.path.abspath(store), os.path.abspath(job.vector_store_path)])
+                       == os.path.abspath(store)]
+            if running:
+                return running[0]
+        return RecordedJob(record or {"job_id": job_id or None, "status": "running", "vector_store_path": store})
+
+    def _status_path(self, job_id: str) -> str:
+        return os.path.join(self.status_dir, f"{job_id}.json")
+
+    def _write_status(self, job: IngestJob):
+        if self.status_dir is None:
+            return
+        try:
+            os.makedirs(self.status_dir, exist_ok=True)
+            path = self._status_path(job.job_id)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(job.to_dict(), file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Could not write status of ingest job {job.job_id}: {e}")
+
+    def _read_status(self, job_id: str) -> Optional[Dict]:
+        if self.status_dir is None or not job_id.isalnum():
+            return None
+        try:
+            with open(self._status_path(job_id), "r", encoding="utf-8") as file:
+                record = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if record.get("status") in ("queued", "running") and not StoreLock(record["vector_store_path"]).held():
+            # Its process died mid-run; nothing holds the store any more
+            record.update(status="failed", error="The process running this job exited")
+        return record
+
+    def _trim_history(self):
+        finished = [job for job in self._jobs.values() if job.status in ("succeeded", "failed")]
+        for job in sorted(finished, key=lambda job: job.created_at)[:max(0, len(self._jobs) - self.max_history)]:
+            del self._jobs[job.job_id]
+        if self.status_dir is None or not os.path.isdir(self.status_dir):
+            return
+        files = sorted((entry for entry in os.scandir(self.status_dir) if entry.name.endswith(".json")),
+                       key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:max(0, len(files) - self.max_history)]:
+            record = self._read_status(entry.name[:-len(".json")])
+            if record is not None and record["status"] in ("queued", "running"):
+                continue
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def get(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if job is None:
+            record = self._read_status(job_id)
+            job = RecordedJob(record) if record is not None else None
+        return job
+
+    def list(self):
+        jobs = dict(self._jobs)
+        if self.status_dir is not None and os.path.isdir(self.status_dir):
+            for name in os.listdir(self.status_dir):
+                job_id = name[:-len(".json")] if name.endswith(".json") else None
+                if job_id and job_id not in jobs:
+                    record = self._read_status(job_id)
+                    if record is not None:
+                        jobs[job_id] = RecordedJob(record)
+        return sorted(jobs.values(), key=lambda job: job.created_at, reverse=True)
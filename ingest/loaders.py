@@ -1,101 +1,268 @@
 # ingest/loaders.py - USING VERIFIED IMPORTS
+import io
+import itertools
 import os
-from typing import List
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
 from langchain_core.documents import Document
 from PyPDF2 import PdfReader
 from docx import Document as DocxDocument
 import pandas as pd
 
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt', '.csv', '.parquet')
+# Job feeds, read and yielded a chunk of rows at a time
+TABULAR_EXTENSIONS = ('.csv', '.parquet')
+# Fields of a job posting -> column holding it in the feed
+DEFAULT_JOB_COLUMNS = {"title": "title", "company": "company",
+                       "description": "description", "requirements": "requirements"}
+
+class LoadError(NamedTuple):
+    """A file that could not be parsed"""
+    file_path: str
+    error_type: str
+    message: str
+
+class LoadedFile(NamedTuple):
+    """Documents parsed from one file, or the error that stopped it.
+
+    Job feeds arrive in several pieces; all but the last have complete=False.
+    """
+    file_path: str
+    documents: List[Document]
+    error: Optional[LoadError]
+    complete: bool = True
+
+def parse_column_map(spec: str) -> Dict[str, str]:
+    """Parse a JOB_COLUMN_MAP spec such as title=job_title,company=employer"""
+    pairs = (item.split("=", 1) for item in spec.split(",") if item.strip())
+    return {field.strip(): column.strip() for field, column in pairs}
+
 class ResumeLoader:
-    def __init__(self, data_path: str = "./data/raw"):
+    def __init__(self, data_path: str = "./data/raw", workers: Optional[int] = None,
+                 column_map: Optional[Dict[str, str]] = None, chunk_size: Optional[int] = None):
         self.data_path = data_path
+        self.workers = workers or int(os.getenv('LOADER_WORKERS', '1'))
+        self.column_map = {**DEFAULT_JOB_COLUMNS, **(column_map or parse_column_map(os.getenv('JOB_COLUMN_MAP', '')))}
+        self.chunk_size = chunk_size or int(os.getenv('JOB_FEED_CHUNK_SIZE', '10000'))
+        self.errors: List[LoadError] = []
     
     def load_documents(self) -> List[Document]:
-        """Load all documents from the data directory"""
+        """Load all documents from the data directory.
+
+        Files that fail to parse are skipped and reported in self.errors.
+        """
+        self.errors = []
         documents = []
+        for file_documents in self.load_files(self.list_files()):
+            documents.extend(file_documents)
+        return documents
+    
+    def load_files(self, file_paths: List[str]) -> List[List[Document]]:
+        """Load several files, one list of documents per path in input order.
+
+        Errors are appended to self.errors.
+        """
+        return [loaded.documents for loaded in self.iter_files(file_paths)]
+    
+    def iter_documents(self) -> Iterator[Document]:
+        """Stream documents from the data directory one file at a time"""
+        self.errors = []
+        for loaded in self.iter_files(self.list_files()):
+            yield from loaded.documents
+    
+    def iter_files(self, file_paths: List[str]) -> Iterator[LoadedFile]:
+        """Parse files ahead of the consumer and yield them in input order.
+
+        With workers > 1 the files are parsed in a process pool, since PDF
+        text extraction is CPU-bound; otherwise a single background thread
+        is used. At most 2 * workers files are in flight, so memory stays
+        bounded however far behind the consumer falls. Job feeds are read
+        here in chunks instead (see iter_job_postings) and come out as
+        several LoadedFile pieces.
+        """
+        if not file_paths:
+            return
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            executor = ThreadPoolExecutor(max_workers=1)
         
+        with executor:
+            paths = iter(file_paths)
+            in_flight = deque(
+                (path, self._submit(executor, path))
+                for path in itertools.islice(paths, self.workers * 2)
+            )
+            try:
+                while in_flight:
+                    file_path, future = in_flight.popleft()
+                    next_path = next(paths, None)
+                    if next_path is not None:
+                        in_flight.append((next_path, self._submit(executor, next_path)))
+                    
+                    if future is None:
+                        yield from self._iter_feed_pieces(file_path)
+                        continue
+                    documents, error = future.result()
+                    if error is not None:
+                        self.errors.append(error)
+                    yield LoadedFile(file_path, documents, error)
+            finally:
+                for _, future in in_flight:
+                    if future is not None:
+                        future.cancel()
+    
+    def _submit(self, executor, file_path: str):
+        if file_path.endswith(TABULAR_EXTENSIONS):
+            return None
+        return executor.submit(self._try_load_file, file_path)
+    
+    def _iter_feed_pieces(self, file_path: str) -> Iterator[LoadedFile]:
+        try:
+            for documents in self.iter_job_postings(file_path):
+                yield LoadedFile(file_path, documents, None, complete=False)
+        except Exception as e:
+            error = LoadError(file_path, type(e).__name__, str(e))
+            self.errors.append(error)
+            yield LoadedFile(file_path, [], error)
+            return
+        yield LoadedFile(file_path, [], None)
+    
+    def list_files(self) -> List[str]:
+        """Supported files in the data directory, in a stable order"""
         if not os.path.exists(self.data_path):
             os.makedirs(self.data_path, exist_ok=True)
-            return documents
-        
-        for filename in os.listdir(self.data_path):
-            file_path = os.path.join(self.data_path, filename)
-            if filename.endswith('.pdf'):
-                documents.extend(self._load_pdf(file_path))
-            elif filename.endswith('.docx'):
-                documents.extend(self._load_docx(file_path))
-            elif filename.endswith('.txt'):
-                documents.extend(self._load_txt(file_path))
-            elif filename.endswith('.csv'):
-                documents.extend(self._load_csv(file_path))
+            return []
         
+        return [
+            os.path.join(self.data_path, filename)
+            for filename in sorted(os.listdir(self.data_path))
+            if filename.endswith(SUPPORTED_EXTENSIONS)
+        ]
+    
+    def load_file(self, file_path: str) -> List[Document]:
+        """Load a single file, recording any error in self.errors"""
+        documents, error = self._try_load_file(file_path)
+        if error is not None:
+            self.errors.append(error)
         return documents
     
-    def _load_pdf(self, file_path: str) -> List[Document]:
-        """Load PDF files"""
-        documents = []
+    def load_bytes(self, file_path: str, data: bytes) -> List[Document]:
+        """Parse file contents already in memory, e.g. an upload.
+
+        file_path picks the parser by extension and becomes the documents'
+        source; nothing is read from or written to it. Raises on parse errors.
+        """
+        if not file_path.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise ValueError(f"Unsupported file type, expected one of {', '.join(SUPPORTED_EXTENSIONS)}")
+        return self._load_by_extension(file_path, io.BytesIO(data))
+    
+    def _try_load_file(self, file_path: str) -> Tuple[List[Document], Optional[LoadError]]:
         try:
-            reader = PdfReader(file_path)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            
-            if text.strip():
-                documents.append(Document(
-                    page_content=text,
-                    metadata={"source": file_path, "type": "resume"}
-                ))
+            return self._load_by_extension(file_path), None
         except Exception as e:
-            print(f"Error loading PDF {file_path}: {e}")
+            return [], LoadError(file_path, type(e).__name__, str(e))
+    
+    def _load_by_extension(self, file_path: str, stream: Optional[BinaryIO] = None) -> List[Document]:
+        """Documents of one file, read from `stream` instead of the path when given"""
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension == '.pdf':
+            return self._load_pdf(file_path, stream)
+        elif extension == '.docx':
+            return self._load_docx(file_path, stream)
+        elif extension == '.txt':
+            return self._load_txt(file_path, stream)
+        elif extension in TABULAR_EXTENSIONS:
+            return [doc for documents in self.iter_job_postings(file_path, stream) for doc in documents]
+        return []
+    
+    def _load_pdf(self, file_path: str, stream: Optional[BinaryIO] = None) -> List[Document]:
+        """Load PDF files"""
+        documents = []
+        reader = PdfReader(stream or file_path)
+        text = ""
+        for page in reader.pages:
+            text += (page.extract_text() or "") + "\n"
+        
+        if text.strip():
+            documents.append(Document(
+                page_content=text,
+                metadata={"source": file_path, "type": "resume"}
+            ))
         return documents
     
-    def _load_docx(self, file_path: str) -> List[Document]:
+    def _load_docx(self, file_path: str, stream: Optional[BinaryIO] = None) -> List[Document]:
         """Load DOCX files"""
         documents = []
-        try:
-            doc = DocxDocument(file_path)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            
-            if text.strip():
-                documents.append(Document(
-                    page_content=text,
-                    metadata={"source": file_path, "type": "resume"}
-                ))
-        except Exception as e:
-            print(f"Error loading DOCX {file_path}: {e}")
+        doc = DocxDocument(stream or file_path)
+        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        
+        if text.strip():
+            documents.append(Document(
+                page_content=text,
+                metadata={"source": file_path, "type": "resume"}
+            ))
         return documents
     
-    def _load_txt(self, file_path: str) -> List[Document]:
+    def _load_txt(self, file_path: str, stream: Optional[BinaryIO] = None) -> List[Document]:
         """Load text files"""
         documents = []
-        try:
+        if stream is not None:
+            text = stream.read().decode('utf-8')
+        else:
             with open(file_path, 'r', encoding='utf-8') as file:
                 text = file.read()
-            
-            if text.strip():
-                documents.append(Document(
-                    page_content=text,
-                    metadata={"source": file_path, "type": "resume"}
-                ))
-        except Exception as e:
-            print(f"Error loading TXT {file_path}: {e}")
+        
+        if text.strip():
+            documents.append(Document(
+                page_content=text,
+                metadata={"source": file_path, "type": "resume"}
+            ))
         return documents
     
-    def _load_csv(self, file_path: str) -> List[Document]:
-        """Load CSV files (for job descriptions)"""
-        documents = []
-        try:
-            df = pd.read_csv(file_path)
-            for idx, row in df.iterrows():
-                text = f"Job Title: {row.get('title', '')}\n"
-                text += f"Company: {row.get('company', '')}\n"
-                text += f"Description: {row.get('description', '')}\n"
-                text += f"Requirements: {row.get('requirements', '')}"
-                
-                documents.append(Document(
-                    page_content=text,
-                    metadata={"source": file_path, "type": "job_posting", "row": idx}
-                ))
-        except Exception as e:
-            print(f"Error loading CSV {file_path}: {e}")
-        return documents
\ No newline at end of file
+    def iter_job_postings(self, file_path: str, stream: Optional[BinaryIO] = None) -> Iterator[List[Document]]:
+        """Job postings from a CSV or Parquet feed, one list per chunk of rows.
+
+        Only the mapped columns are read, and the page text is built with
+        column-wise string operations rather than row by row.
+        """
+        if file_path.lower().endswith('.parquet'):
+            frames = self._parquet_chunks(stream or file_path)
+        else:
+            wanted = set(self.column_map.values())
+            frames = pd.read_csv(stream or file_path, usecols=lambda column: column in wanted, dtype=str,
+                                 keep_default_na=False, na_values=[""], chunksize=self.chunk_size)
+        row_offset = 0
+        for frame in frames:
+            yield self._job_documents(frame, file_path, row_offset)
+            row_offset += len(frame)
+    
+    def _parquet_chunks(self, source) -> Iterator[pd.DataFrame]:
+        import pyarrow.parquet as pq
+        parquet = pq.ParquetFile(source)
+        columns = [column for column in self.column_map.values() if column in parquet.schema_arrow.names]
+        for batch in parquet.iter_batches(batch_size=self.chunk_size, columns=columns):
+            yield batch.to_pandas()
+    
+    def _job_documents(self, frame: pd.DataFrame, file_path: str, row_offset: int) -> List[Document]:
+        """Documents for one chunk of job-feed rows"""
+        def column(field: str) -> pd.Series:
+            name = self.column_map[field]
+            if name not in frame:
+                return pd.Series("", index=frame.index)
+            return frame[name].astype(object).where(frame[name].notna(), "").astype(str)
+        
+        texts = ("Job Title: " + column("title")
+                 + "\nCompany: " + column("company")
+                 + "\nDescription: " + column("description")
+                 + "\nRequirements: " + column("requirements"))
+        companies = column("company").tolist()
+        return [
+            Document(
+                page_content=text,
+                metadata={"source": file_path, "type": "job_posting", "row": row_offset + i,
+                          **({"company": company} if company else {})}
+            )
+            for i, (text, company) in enumerate(zip(texts.tolist(), companies))
+        ]
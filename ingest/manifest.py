@@ -0,0 +1,126 @@
+# ingest/manifest.py - tracks which files are already in the vector store
+import hashlib
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+MANIFEST_FILENAME = "manifest.json"
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    """Hash file contents without reading the whole file into memory"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ManifestDiff(NamedTuple):
+    new: List[str]
+    changed: List[str]
+    unchanged: List[str]
+    deleted: List[str]
+    hashes: Dict[str, str]
+
+    @property
+    def to_load(self) -> List[str]:
+        return self.new + self.changed
+
+
+class IngestManifest:
+    """File path -> size, mtime, content hash and chunk ids for one vector store"""
+
+    def __init__(self, entries: Dict[str, Dict] = None):
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, directory: str) -> "IngestManifest":
+        path = os.path.join(directory, MANIFEST_FILENAME)
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.load(file).get("files", {}))
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, MANIFEST_FILENAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": 1, "files": self.entries}, file, indent=1)
+        os.replace(tmp_path, path)
+
+    def diff(self, file_paths: List[str]) -> ManifestDiff:
+        """Compare files on disk against the manifest.
+
+        Size and mtime are checked first; the content hash is only computed
+        when they differ, so unchanged files are never read.
+        """
+        new, changed, unchanged, hashes = [], [], [], {}
+        for file_path in file_paths:
+            stat = os.stat(file_path)
+            entry = self.entries.get(file_path)
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                unchanged.append(file_path)
+                continue
+
+            sha = file_sha256(file_path)
+            hashes[file_path] = sha
+            if entry is None:
+                new.append(file_path)
+            elif entry["sha256"] == sha:
+                # Touched but not modified - keep the chunks, refresh the stat
+                entry["size"], entry["mtime"] = stat.st_size, stat.st_mtime
+                unchanged.append(file_path)
+            else:
+                changed.append(file_path)
+
+        seen = set(file_paths)
+        deleted = [path for path in self.entries if path not in seen]
+        return ManifestDiff(new, changed, unchanged, deleted, hashes)
+
+    def invalidate(self, file_path: str):
+        """Mark a partly indexed file as changed, so the next run replaces its chunks"""
+        if file_path in self.entries:
+            self.entries[file_path].update(size=-1, sha256=None)
+
+    def chunk_ids(self, file_paths: List[str]) -> List[str]:
+        ids = []
+        for file_path in file_paths:
+            ids.extend(self.entries.get(file_path, {}).get("chunk_ids", []))
+        return ids
+
+    def record(self, file_path: str, sha256: str, chunk_ids: List[str], duplicate_of: Optional[List[str]] = None):
+        """duplicate_of: kept chunks (of other files) standing in for this file's dropped duplicates"""
+        stat = os.stat(file_path)
+        self.entries[file_path] = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "sha256": sha256,
+            "chunk_ids": chunk_ids,
+        }
+        if duplicate_of:
+            self.entries[file_path]["duplicate_of"] = sorted(set(duplicate_of))
+
+    def with_dependents(self, plan: ManifestDiff) -> ManifestDiff:
+        """Also reload unchanged files whose duplicates point at chunks being removed.
+
+        Their text is only in the index through those chunks, so they are
+        treated as changed and go through deduplication again.
+        """
+        removing = set(plan.changed + plan.deleted)
+        stale = set(self.chunk_ids(list(removing)))
+        while stale:
+            dependents = [path for path, entry in self.entries.items()
+                          if path not in removing and stale.intersection(entry.get("duplicate_of", ()))]
+            for file_path in dependents:
+                plan.hashes[file_path] = file_sha256(file_path)
+            removing.update(dependents)
+            plan = plan._replace(changed=plan.changed + dependents,
+                                 unchanged=[path for path in plan.unchanged if path not in removing])
+            stale = set(self.chunk_ids(dependents))
+        return plan
+
+    def remove(self, file_paths: List[str]):
+        for file_path in file_paths:
+            self.entries.pop(file_path, None)
@@ -0,0 +1,133 @@
+# ingest/upload.py - single files uploaded through the API: searchable at once, published in the background
+import threading
+import traceback
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .jobs import IngestAlreadyRunning, IngestJobManager, IngestProgress
+
+
+class InvalidUpload(ValueError):
+    """The upload cannot be ingested: unsupported type, unknown shard, no text"""
+
+
+class UnsupportedFileType(InvalidUpload):
+    """The upload's extension is not one the loader can parse"""
+
+
+class UploadConflict(Exception):
+    """A file with the upload's name is already in the data directory or waiting to be published"""
+
+
+class PreparedUpload(NamedTuple):
+    """One uploaded file, parsed, split and embedded, not yet in any store version"""
+    shard: str
+    # Where the file is written when published; also the chunks' source
+    source_path: str
+    data: bytes
+    sha256: str
+    chunks: List[Document]
+    chunk_ids: List[str]
+    vectors: np.ndarray
+
+
+class UploadPublisher:
+    """Accepts prepared uploads and publishes them to their shard's store.
+
+    on_accepted(upload) runs when an upload is queued and should make it
+    searchable (the live segment of ResumeRAG). A background thread then
+    writes the queued files of a shard into the data directory and one new
+    store version, as an ingest job on that store, so it never overlaps a
+    directory ingest (in any process); while one runs, the uploads wait and
+    are retried.
+    on_published(shard, chunk_ids) runs once the version is current. A
+    failed publish is retried; the uploads stay searchable meanwhile.
+    """
+
+    def __init__(self, jobs: IngestJobManager, on_accepted: Callable[[PreparedUpload], None],
+                 on_published: Callable[[str, List[str]], None], retry_seconds: float = 1.0):
+        from .ingest import ResumeIngestor
+        self.jobs = jobs
+        self.on_accepted = on_accepted
+        self.on_published = on_published
+        self.retry_seconds = retry_seconds
+        # Shared by request threads; prepare_upload does not touch its per-run state
+        self.ingestor = ResumeIngestor()
+        self._pending: Dict[str, List[PreparedUpload]] = {}
+        self._publishing: Dict[str, List[PreparedUpload]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, name="upload-publisher", daemon=True).start()
+
+    def prepare(self, file_name: str, data: bytes, shard: Optional[str] = None) -> PreparedUpload:
+        upload = self.ingestor.prepare_upload(file_name, data, shard)
+        self._check_name(upload.source_path)
+        return upload
+
+    def submit(self, upload: PreparedUpload):
+        with self._lock:
+            self._check_name(upload.source_path)
+            self.on_accepted(upload)
+            self._pending.setdefault(upload.shard, []).append(upload)
+        self._wake.set()
+
+    def pending(self) -> Dict[str, int]:
+        """Uploads per shard not yet in a published version"""
+        with self._lock:
+            counts = {}
+            for queue in (self._pending, self._publishing):
+                for shard, uploads in queue.items():
+                    if uploads:
+                        counts[shard] = counts.get(shard, 0) + len(uploads)
+            return counts
+
+    def _check_name(self, source_path: str):
+        queued = (upload.source_path for queue in (self._pending, self._publishing)
+                  for uploads in queue.values() for upload in uploads)
+        if source_path in queued:
+            raise UploadConflict(f"{source_path} was just uploaded and is still being published")
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.retry_seconds)
+            self._wake.clear()
+            with self._lock:
+                shards = [shard for shard, uploads in self._pending.items()
+                          if uploads and shard not in self._publishing]
+                for shard in shards:
+                    self._start(shard)
+
+    def _start(self, shard: str):
+        """Claim the shard's store for a publish job; called with the lock held"""
+        uploads = self._pending[shard]
+        layout = self.ingestor.layout
+        store_path = layout.shards[shard].store.vector_store_path
+        try:
+            self.jobs.start(store_path, lambda progress: self._publish(shard, uploads, progress),
+                            within=layout.root if layout.sharded else None)
+        except IngestAlreadyRunning:
+            return  # a directory ingest holds the store; tried again on the next tick
+        self._pending[shard] = []
+        self._publishing[shard] = uploads
+
+    def _publish(self, shard: str, uploads: List[PreparedUpload], progress: IngestProgress) -> bool:
+        from .ingest import ResumeIngestor
+        try:
+            # A fresh ingestor per run: it keeps the store it works on as state
+            published = ResumeIngestor().publish_uploads(shard, uploads, progress)
+        except Exception:
+            traceback.print_exc()
+            published = False
+        if published:
+            try:
+                self.on_published(shard, [chunk_id for upload in uploads for chunk_id in upload.chunk_ids])
+            except Exception:
+                traceback.print_exc()
+        with self._lock:
+            del self._publishing[shard]
+            if not published:
+                self._pending[shard] = uploads + self._pending.get(shard, [])
+        self._wake.set()
+        return published
@@ -0,0 +1,49 @@
+# tests/conftest.py - temporary stores and hash-based embeddings for the test suite
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Read when app.deps is imported; tests never touch the on-disk embedding cache
+os.environ['EMBEDDING_CACHE_MB'] = '0'
+
+import app.deps as deps  # noqa: E402
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """Hash-based vectors instead of the model (see bench.harness.install_fake_embeddings)"""
+    from langchain_community.embeddings import DeterministicFakeEmbedding
+    monkeypatch.setattr(deps.embeddings_manager, '_embeddings', DeterministicFakeEmbedding(size=32))
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch, fake_embeddings):
+    """Empty ./data/raw and an unsharded flat store, both under tmp_path"""
+    monkeypatch.chdir(tmp_path)
+    for name in ('SHARD_BY', 'INDEX_TYPE', 'CHUNKER', 'DEDUP'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setattr(deps.vectorstore_manager, 'vector_store_path', str(tmp_path / 'vectorstore'))
+    raw = tmp_path / 'data' / 'raw'
+    raw.mkdir(parents=True)
+    return raw
+
+
+@pytest.fixture
+def serve(workspace, monkeypatch):
+    """serve() -> TestClient for the API, searching what has been ingested into the workspace"""
+    from fastapi.testclient import TestClient
+    import app.api as api
+    from app.rag import ResumeRAG
+
+    def serve(batching: bool = True):
+        monkeypatch.setenv('QUERY_BATCHING', '1' if batching else '0')
+        monkeypatch.setenv('WARM_UP', '0')
+        monkeypatch.setenv('INDEX_WATCH_INTERVAL', '0')
+        rag = ResumeRAG()
+        rag.start()
+        monkeypatch.setattr(api, 'rag_system', rag)
+        return TestClient(api.app)
+
+    return serve
@@ -0,0 +1,191 @@
+# tests/test_api.py - request validation and endpoint behaviour of the HTTP API
+import json
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.api as api
+from app.executor import ExecutorSaturated
+from ingest.ingest import ResumeIngestor
+
+
+@pytest.fixture
+def client():
+    # No lifespan: requests that pass validation would wait for a store
+    return TestClient(api.app)
+
+
+@pytest.mark.parametrize('field', ['nprobe', 'ef_search'])
+@pytest.mark.parametrize('value', [0, -1, 'many'])
+@pytest.mark.parametrize('path, text_field', [('/query', 'question'), ('/similar-jobs', 'job_description')])
+def test_search_parameters_must_be_positive(client, path, text_field, field, value):
+    response = client.post(path, json={text_field: 'python developer', field: value})
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'][-1] == field
+
+
+@pytest.fixture
+def resumes(workspace):
+    (workspace / 'alice.txt').write_text('Alice Smith. Senior Python developer, Django and Postgres.',
+                                         encoding='utf-8')
+    assert ResumeIngestor().ingest_documents()
+
+
+@pytest.mark.parametrize('batching', [True, False])
+def test_unknown_filter_field_is_a_bad_request(resumes, serve, batching):
+    client = serve(batching)
+    response = client.post('/query', json={'question': 'python', 'filters': {'colour': 'red'}})
+    assert response.status_code == 400
+    assert "Cannot filter on 'colour'" in response.json()['detail']
+    response = client.post('/similar-jobs', json={'job_description': 'python', 'filters': {'colour': 'red'}})
+    assert response.status_code == 400
+
+    response = client.post('/query', json={'question': 'python', 'filters': {'type': 'resume'}})
+    assert response.status_code == 200
+    assert [source['type'] for source in response.json()['sources']] == ['resume']
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_unknown_filter_field_fails_the_whole_batch_up_front(resumes, serve, stream):
+    queries = [{'question': 'python'}, {'question': 'django', 'filters': {'colour': 'red'}}]
+    response = serve().post('/query/batch', json={'queries': queries, 'stream': stream})
+    assert response.status_code == 400
+    assert "'colour'" in response.json()['detail']
+
+
+@pytest.mark.parametrize('path, text_field', [('/query', 'question'), ('/similar-jobs', 'job_description')])
+def test_unknown_search_mode_is_rejected(client, path, text_field):
+    response = client.post(path, json={text_field: 'python developer', 'mode': 'weird'})
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'][-1] == 'mode'
+
+
+def test_hybrid_mode_finds_exact_terms(resumes, serve):
+    response = serve().post('/query', json={'question': 'Postgres', 'mode': 'hybrid', 'k': 1})
+    assert response.status_code == 200
+    assert 'Postgres' in response.json()['sources'][0]['content']
+
+
+@pytest.mark.parametrize('k', [0, -1, 101, 'many'])
+def test_bulk_match_k_is_bounded(client, k):
+    response = client.post('/match/bulk', json={'jobs': [{'id': 'j', 'text': 'python'}], 'k': k})
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['loc'][-1] == 'k'
+
+
+class FillingExecutor:
+    """search_executor that runs `capacity` tasks and is saturated after that"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+    async def run(self, fn, *args, **kwargs):
+        if not self.capacity:
+            raise ExecutorSaturated('search executor is saturated')
+        self.capacity -= 1
+        return fn(*args, **kwargs)
+
+
+def test_streamed_batch_reports_queries_the_executor_rejected(resumes, serve, monkeypatch):
+    client = serve()
+    monkeypatch.setattr(api, 'BATCH_STREAM_CHUNK', 2)
+    monkeypatch.setattr(api, 'search_executor', FillingExecutor(1))
+    queries = [{'question': text} for text in ('python', 'django', 'postgres', 'spark', 'react')]
+    response = client.post('/query/batch', json={'queries': queries, 'stream': True})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line['index'] for line in lines] == [0, 1, 2, 3, 4]
+    assert all('result' in line for line in lines[:2])
+    assert [line.get('error') for line in lines[2:]] == ['search executor is saturated'] * 3
+
+
+@pytest.mark.parametrize('backend, model', [
+    ('torch', 'sentence-transformers/all-MiniLM-L6-v2'),
+    ('onnx-int8', 'sentence-transformers/all-MiniLM-L6-v2@int8'),
+])
+def test_status_reports_the_embedding_backend(client, workspace, monkeypatch, backend, model):
+    monkeypatch.setattr(api.embeddings_manager, 'backend', backend)
+    embeddings = client.get('/status').json()['embeddings']
+    assert (embeddings['backend'], embeddings['model']) == (backend, model)
+
+
+def test_status_reports_the_embedding_server(client, workspace, monkeypatch):
+    assert client.get('/status').json()['embeddings']['server'] is None
+    monkeypatch.setattr(api.embeddings_manager, 'server_socket', '/run/embeddings.sock')
+    assert client.get('/status').json()['embeddings']['server'] == '/run/embeddings.sock'
+
+
+@pytest.fixture
+def ingest_started(monkeypatch):
+    """Shards that /ingest started a (no-op) job for"""
+    started = []
+    monkeypatch.setattr(api, '_run_ingest', lambda full_rebuild, progress, shard=None: started.append(shard) or True)
+    return started
+
+
+@pytest.mark.parametrize('shard', ['../../../escaped', '../resumes', 'resumes/../../x', 'nope'])
+def test_ingest_rejects_unknown_shards(client, workspace, monkeypatch, ingest_started, shard):
+    monkeypatch.setenv('SHARD_BY', 'type')
+    response = client.post('/ingest', params={'shard': shard})
+    assert response.status_code == 404
+    assert ingest_started == []
+    # Nothing (not even a lock file) is created where the shard would have been
+    assert not os.path.exists(os.path.join(api.vectorstore_manager.vector_store_path, 'shards', shard))
+
+
+def test_ingest_accepts_shards_of_the_data_directory(client, workspace, monkeypatch, ingest_started):
+    monkeypatch.setenv('SHARD_BY', 'tenant')
+    (workspace / 'acme').mkdir()
+    assert client.post('/ingest', params={'shard': 'globex'}).status_code == 404
+    response = client.post('/ingest', params={'shard': 'acme'})
+    assert response.status_code == 202
+    job_id = response.json()['job_id']
+    for _ in range(250):
+        status = client.get(f'/ingest/{job_id}').json()['status']
+        if status not in ('queued', 'running'):
+            break
+        time.sleep(0.02)
+    assert status == 'succeeded'
+    assert ingest_started == ['acme']
+
+
+@pytest.fixture
+def directory_ingest_running(monkeypatch):
+    """A directory ingest holding the store until the returned event is set"""
+    from ingest.jobs import IngestJobManager
+    jobs = IngestJobManager()
+    monkeypatch.setattr(api, 'ingest_jobs', jobs)
+    monkeypatch.setattr(api, '_upload_publisher', None)
+    done = threading.Event()
+    jobs.start(api.vectorstore_manager.vector_store_path, lambda progress: done.wait(30))
+    yield done
+    done.set()
+
+
+def test_uploads_are_searchable_before_they_are_published(resumes, serve, directory_ingest_running):
+    client = serve()
+    text = 'Bob Jones. Data engineer, Spark, Airflow and Kafka.'
+    response = client.post('/documents', files={'file': ('bob.txt', text.encode('utf-8'), 'text/plain')})
+    assert response.status_code == 201
+    upload = response.json()
+    assert upload['published'] is False and upload['chunk_ids']
+
+    # The ingest still holds the store, so the upload is served from the live index only
+    sources = [hit['source'] for hit in client.post('/query', json={'question': text, 'k': 5}).json()['sources']]
+    assert sources.count(upload['source']) == 1
+    assert client.get('/status').json()['unpublished_uploads'] == {upload['shard']: 1}
+    assert not os.path.exists(upload['source'])
+    assert client.post('/documents', files={'file': ('bob.txt', b'again', 'text/plain')}).status_code == 409
+
+    directory_ingest_running.set()
+    for _ in range(250):
+        if not client.get('/status').json()['unpublished_uploads']:
+            break
+        time.sleep(0.02)
+    assert client.get('/status').json()['unpublished_uploads'] == {}
+    assert os.path.exists(upload['source'])
+    sources = [hit['source'] for hit in client.post('/query', json={'question': text, 'k': 5}).json()['sources']]
+    assert sources.count(upload['source']) == 1
@@ -0,0 +1,103 @@
+# tests/test_batching.py - QueryBatcher batching, failure isolation and limits
+import threading
+
+import pytest
+
+from app.batching import QueryBatcher
+from app.executor import ExecutorSaturated
+
+
+class FakeSearch:
+    """search_batch that returns '<text>:<rank>' hits and fails on texts starting with 'bad'"""
+
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, texts, k, **options):
+        self.release.wait(5)
+        self.calls.append((list(texts), k, options))
+        if any(text.startswith('bad') for text in texts):
+            raise RuntimeError('search failed')
+        return [[f'{text}:{rank}' for rank in range(k)] for text in texts]
+
+
+def submit_all(batcher, queries):
+    """Submit while the batcher is held up, so every query lands in one batch"""
+    search = batcher.search_batch
+    search.release.clear()
+    futures = [batcher.submit(text, k, **options) for text, k, options in queries]
+    search.release.set()
+    return futures
+
+
+def test_concurrent_queries_share_one_search():
+    search = FakeSearch()
+    batcher = QueryBatcher(search, max_wait_ms=200)
+    futures = submit_all(batcher, [('python', 2, {}), ('java', 4, {}), ('sql', 1, {})])
+    assert [future.result(5) for future in futures] == [
+        ['python:0', 'python:1'],
+        ['java:0', 'java:1', 'java:2', 'java:3'],
+        ['sql:0'],
+    ]
+    # One call with the largest k, sliced per caller
+    assert search.calls == [(['python', 'java', 'sql'], 4, {})]
+    assert batcher.stats()['batches'] == 1
+
+
+def test_options_split_batches():
+    search = FakeSearch()
+    batcher = QueryBatcher(search, max_wait_ms=200)
+    futures = submit_all(batcher, [('a', 1, {'nprobe': 8}), ('b', 1, {}), ('c', 1, {'nprobe': 8})])
+    assert [future.result(5) for future in futures] == [['a:0'], ['b:0'], ['c:0']]
+    assert sorted(search.calls, key=str) == sorted([(['a', 'c'], 1, {'nprobe': 8}), (['b'], 1, {})], key=str)
+
+
+def test_failed_query_does_not_fail_its_batch():
+    search = FakeSearch()
+    batcher = QueryBatcher(search, max_wait_ms=200)
+    futures = submit_all(batcher, [('python', 1, {}), ('bad query', 1, {}), ('java', 1, {})])
+    assert futures[0].result(5) == ['python:0']
+    assert futures[2].result(5) == ['java:0']
+    with pytest.raises(RuntimeError, match='search failed'):
+        futures[1].result(5)
+    # The batch, then each query alone
+    assert search.calls[0][0] == ['python', 'bad query', 'java']
+    assert [call[0] for call in search.calls[1:]] == [['python'], ['bad query'], ['java']]
+
+
+@pytest.mark.parametrize('k', [0, -1, True, 2.0, '3', None])
+def test_invalid_k_is_rejected_on_submit(k):
+    search = FakeSearch()
+    batcher = QueryBatcher(search)
+    with pytest.raises(ValueError, match='k must be a positive integer'):
+        batcher.submit('python', k)
+    assert batcher.search('python', 1) == ['python:0']
+    assert search.calls == [(['python'], 1, {})]
+
+
+def test_max_pending_rejects_excess_queries():
+    search = FakeSearch()
+    batcher = QueryBatcher(search, max_wait_ms=1, max_pending=2)
+    search.release.clear()
+    futures = [batcher.submit('a', 1), batcher.submit('b', 1)]
+    with pytest.raises(ExecutorSaturated):
+        batcher.submit('c', 1)
+    search.release.set()
+    assert [future.result(5) for future in futures] == [['a:0'], ['b:0']]
+    assert batcher.stats()['rejected'] == 1
+    # Finished queries free their slots
+    assert batcher.search('d', 1) == ['d:0']
+    assert batcher.stats()['pending'] == 0
+
+
+def test_cancelled_queries_are_skipped():
+    search = FakeSearch()
+    batcher = QueryBatcher(search, max_wait_ms=200)
+    search.release.clear()
+    futures = [batcher.submit('a', 1), batcher.submit('b', 1)]
+    assert futures[0].cancel()
+    search.release.set()
+    assert futures[1].result(5) == ['b:0']
+    assert [call[0] for call in search.calls] == [['b']]
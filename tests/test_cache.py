@@ -0,0 +1,111 @@
+# tests/test_cache.py - query-path caches and their invalidation on reload
+import os
+
+import pytest
+
+from app import cache as cache_module
+from app.cache import LRUCache, normalize_query
+from ingest.ingest import ResumeIngestor
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, 'monotonic', clock)
+    return clock
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1  # a is now the most recent
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 3, 'misses': 1, 'hit_rate': 0.75}
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(maxsize=4, ttl=10)
+    cache.set('a', 1)
+    clock.now += 9.9
+    assert cache.get('a') == 1
+    clock.now += 0.2
+    assert cache.get('a', 'gone') == 'gone'
+    assert cache.stats()['size'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_without_ttl_entries_never_expire(clock):
+    cache = LRUCache(maxsize=4)
+    cache.set('a', 1)
+    clock.now += 10 ** 9
+    assert cache.get('a') == 1
+
+
+def test_zero_maxsize_disables_the_cache():
+    cache = LRUCache(maxsize=0)
+    cache.set('a', 1)
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_clear_keeps_counters():
+    cache = LRUCache()
+    cache.set('a', 1)
+    cache.get('a')
+    cache.clear()
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_normalize_query():
+    assert normalize_query('  Senior   PYTHON\tdeveloper\n') == 'senior python developer'
+
+
+@pytest.fixture
+def rag(workspace, monkeypatch):
+    monkeypatch.setenv('QUERY_BATCHING', '0')
+    monkeypatch.setenv('WARM_UP', '0')
+    monkeypatch.setenv('INDEX_WATCH_INTERVAL', '0')
+    monkeypatch.setenv('DEDUP', '0')
+    (workspace / 'alice.txt').write_text('Alice Smith. Senior Python developer, Django and Postgres.',
+                                         encoding='utf-8')
+    assert ResumeIngestor().ingest_documents()
+    from app.rag import ResumeRAG
+    rag = ResumeRAG()
+    rag.start()
+    return rag
+
+
+def test_results_are_cached_until_a_new_version_is_loaded(rag, workspace):
+    first = rag.simple_search('python developer', k=5)
+    assert [source['source'] for source in first['sources']] == [os.path.join('./data/raw', 'alice.txt')]
+    # Same query after normalization: served from the cache
+    assert rag.simple_search('  Python   DEVELOPER ', k=5) == first
+    assert rag.results.stats()['hits'] == 1
+
+    # Nothing new published: the cache survives a reload
+    generation = rag.generation
+    rag.reload()
+    assert rag.generation == generation
+    assert rag.results.stats()['size'] == 1
+
+    (workspace / 'bob.txt').write_text('Bob Jones. Python data engineer, Spark and Airflow.', encoding='utf-8')
+    assert ResumeIngestor().ingest_documents()
+    rag.reload()
+    assert rag.generation == generation + 1
+    assert rag.results.stats()['size'] == 0
+    second = rag.simple_search('python developer', k=5)
+    assert len(second['sources']) == 2
+    assert rag.results.stats()['misses'] == 2
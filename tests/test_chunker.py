@@ -0,0 +1,91 @@
+# tests/test_chunker.py - section-aware chunking in model tokens
+from langchain_core.documents import Document
+
+from ingest.chunker import SectionChunker, resume_sections
+
+
+def count_words(texts):
+    """One token per word, so budgets are easy to reason about"""
+    return [len(text.split()) for text in texts]
+
+
+def chunker(max_tokens, overlap_tokens=0):
+    # max_tokens includes the 2 special tokens the model adds
+    return SectionChunker(max_tokens=max_tokens, overlap_tokens=overlap_tokens, count_tokens=count_words)
+
+
+RESUME = """Alice Smith
+alice@example.com
+
+Experience:
+Acme Corp, senior engineer, built the billing platform
+Globex, engineer, maintained the data pipelines
+
+SKILLS
+Python, Django, Postgres
+"""
+
+
+def test_resume_sections():
+    sections = resume_sections(RESUME)
+    assert [(section.name, section.heading) for section in sections] == [
+        ('header', ''), ('experience', 'Experience:'), ('skills', 'SKILLS'),
+    ]
+    assert 'Globex' in sections[1].body and 'Python' not in sections[1].body
+
+
+def test_chunks_follow_sections_and_start_with_their_heading():
+    resume = Document(page_content=RESUME, metadata={'source': 'a.txt', 'type': 'resume'})
+    chunks = chunker(64).split_documents([resume])
+    assert [chunk.metadata['section'] for chunk in chunks] == ['header', 'experience', 'skills']
+    assert all(chunk.metadata['source'] == 'a.txt' for chunk in chunks)
+    assert chunks[1].page_content.splitlines()[0] == 'Experience:'
+    assert chunks[2].page_content == 'SKILLS\nPython, Django, Postgres'
+
+
+def test_chunks_stay_within_the_token_budget():
+    lines = [f'line {i} with five words' for i in range(40)]
+    text = 'Experience\n' + '\n'.join(lines)
+    pieces = chunker(22).split_text(text)
+    assert len(pieces) > 1
+    for section, piece in pieces:
+        assert section == 'experience'
+        assert count_words([piece])[0] <= 20
+        assert piece.startswith('Experience\n')
+    # Nothing lost or repeated without overlap
+    body = [line for _, piece in pieces for line in piece.splitlines()[1:]]
+    assert body == lines
+
+
+def test_oversized_lines_are_split_into_sentences_then_words():
+    sentence = 'one two three four five six seven eight.'
+    long_line = ' '.join([sentence] * 3) + ' ' + ' '.join(f'w{i}' for i in range(30))
+    pieces = chunker(12).split_text('Summary\n' + long_line)
+    assert all(count_words([piece])[0] <= 10 for _, piece in pieces)
+    assert ' '.join(piece.split('\n', 1)[1] for _, piece in pieces).split() == long_line.split()
+
+
+def test_overlap_carries_trailing_lines():
+    lines = [f'l{i} a b c' for i in range(6)]
+    # 12 tokens after the special tokens and the heading: three lines per chunk
+    split = chunker(2 + 1 + 12, overlap_tokens=4).split_text('Skills\n' + '\n'.join(lines))
+    pieces = [piece.splitlines()[1:] for _, piece in split]
+    assert pieces[0] == lines[:3]
+    assert pieces[1][0] == lines[2]
+
+
+POSTING = ('Job Title: Backend Engineer\nCompany: Acme\n'
+           'Description: ' + ' '.join(['build services'] * 20) + '\n'
+           'Requirements: ' + ' '.join(['python sql'] * 20))
+
+
+def test_short_posting_stays_one_chunk():
+    assert chunker(256).split_text(POSTING, 'job_posting') == [('posting', POSTING.strip())]
+
+
+def test_long_posting_pieces_keep_title_and_company():
+    pieces = chunker(32).split_text(POSTING, 'job_posting')
+    assert {section for section, _ in pieces} == {'description', 'requirements'}
+    for section, piece in pieces:
+        assert piece.startswith('Job Title: Backend Engineer\nCompany: Acme\n')
+        assert count_words([piece])[0] <= 30
@@ -0,0 +1,114 @@
+# tests/test_dedup.py - near-duplicate chunks, their links and re-ingestion
+import os
+
+from langchain_core.documents import Document
+
+from app.deps import vectorstore_manager
+from ingest.dedup import ChunkDeduplicator
+from ingest.ingest import ResumeIngestor
+from ingest.manifest import IngestManifest
+
+RESUME = (
+    'Alice Smith is a senior Python developer with ten years of backend experience, '
+    'building Django services on Postgres, running them on Kubernetes and mentoring a team of five engineers.'
+)
+OTHER = (
+    'Bob Jones is a data engineer who builds Spark pipelines and Airflow schedules on AWS, '
+    'owns the warehouse models in dbt and writes the on-call runbooks for the analytics platform.'
+)
+
+
+def doc(text, source):
+    return Document(page_content=text, metadata={'source': source})
+
+
+def write(raw, name, text):
+    (raw / name).write_text(text, encoding='utf-8')
+    return os.path.join('./data/raw', name)
+
+
+def ingest():
+    assert ResumeIngestor().ingest_documents()
+    return IngestManifest.load(vectorstore_manager.current_path())
+
+
+def indexed():
+    vectorstore = vectorstore_manager.get_vectorstore(writable=True)
+    return {doc_id: vectorstore.docstore.search(doc_id) for doc_id in vectorstore.index_to_docstore_id.values()}
+
+
+def test_filter_drops_copies_and_links_their_sources():
+    deduplicator = ChunkDeduplicator()
+    kept, kept_ids, duplicate_of = deduplicator.filter(
+        [doc(RESUME, 'a.txt'), doc(OTHER, 'b.txt'), doc(RESUME, 'c.txt'), doc(RESUME + ' ', 'd.txt')],
+        ['a0', 'b0', 'c0', 'd0'],
+    )
+    assert kept_ids == ['a0', 'b0']
+    assert [chunk.metadata['source'] for chunk in kept] == ['a.txt', 'b.txt']
+    assert duplicate_of == ['a0', 'a0']
+    assert deduplicator.links == {'a0': ['c.txt', 'd.txt']}
+    assert deduplicator.report()['chunks_checked'] == 4
+
+
+def test_short_chunks_are_never_dropped():
+    deduplicator = ChunkDeduplicator()
+    _, kept_ids, duplicate_of = deduplicator.filter([doc('Skills', 'a.txt'), doc('Skills', 'b.txt')], ['a0', 'b0'])
+    assert kept_ids == ['a0', 'b0']
+    assert duplicate_of == []
+
+
+def test_removed_chunks_and_sources_are_forgotten():
+    deduplicator = ChunkDeduplicator()
+    deduplicator.filter([doc(RESUME, 'a.txt'), doc(RESUME, 'b.txt')], ['a0', 'b0'])
+    deduplicator.remove([], ['b.txt'])
+    assert deduplicator.links == {'a0': []}
+
+    # Once the kept chunk leaves the index, its text is new again
+    deduplicator.remove(['a0'], ['a.txt'])
+    _, kept_ids, _ = deduplicator.filter([doc(RESUME, 'c.txt')], ['c0'])
+    assert kept_ids == ['c0']
+
+
+def test_state_is_saved_with_the_version(tmp_path):
+    deduplicator = ChunkDeduplicator()
+    deduplicator.filter([doc(RESUME, 'a.txt'), doc(RESUME, 'b.txt')], ['a0', 'b0'])
+    deduplicator.save(str(tmp_path))
+    loaded = ChunkDeduplicator.load(str(tmp_path))
+    assert loaded.links == {'a0': ['b.txt']}
+    _, kept_ids, duplicate_of = loaded.filter([doc(RESUME, 'c.txt')], ['c0'])
+    assert kept_ids == [] and duplicate_of == ['a0']
+
+
+def test_ingest_links_duplicates_and_reingests_dependents(workspace):
+    alice = write(workspace, 'alice.txt', RESUME)
+    copy = write(workspace, 'copy.txt', RESUME)
+    manifest = ingest()
+
+    # The copy adds no chunks; the original carries its source
+    original_ids = manifest.entries[alice]['chunk_ids']
+    assert manifest.entries[copy]['chunk_ids'] == []
+    assert manifest.entries[copy]['duplicate_of'] == sorted(original_ids)
+    docs = indexed()
+    assert set(docs) == set(original_ids)
+    assert [d.metadata.get('duplicate_sources') for d in docs.values()] == [[copy]] * len(docs)
+
+    # Changing the original drops the chunks the copy pointed at, so the
+    # unchanged copy is loaded again and now gets chunks of its own
+    write(workspace, 'alice.txt', OTHER)
+    manifest = ingest()
+    copy_ids = manifest.entries[copy]['chunk_ids']
+    assert copy_ids and 'duplicate_of' not in manifest.entries[copy]
+    docs = indexed()
+    assert set(docs) == set(manifest.entries[alice]['chunk_ids'] + copy_ids)
+    assert not set(docs) & set(original_ids)
+    assert all('duplicate_sources' not in d.metadata for d in docs.values())
+
+
+def test_deleting_a_copy_unlinks_it(workspace):
+    write(workspace, 'alice.txt', RESUME)
+    write(workspace, 'copy.txt', RESUME)
+    ingest()
+    os.remove(workspace / 'copy.txt')
+    manifest = ingest()
+    assert list(manifest.entries) == [os.path.join('./data/raw', 'alice.txt')]
+    assert all('duplicate_sources' not in d.metadata for d in indexed().values())
@@ -0,0 +1,78 @@
+# tests/test_docstore.py - columnar docstore files and row-addressed reads
+import pytest
+from langchain_core.documents import Document
+
+from app.deps import vectorstore_manager
+from app.docstore import ColumnarDocstore, RowIdMapping, has_columnar, write_columnar
+from ingest.ingest import ResumeIngestor
+
+ROWS = [
+    ('id-a', Document(page_content='Python developer', metadata={'source': 'a.pdf', 'type': 'resume'})),
+    ('id-b', Document(page_content='', metadata={})),
+    ('id-c', Document(page_content='Zürich · naïve café ✓', metadata={'source': 'c.txt', 'row': 3})),
+]
+
+
+@pytest.fixture
+def docstore(tmp_path):
+    write_columnar(str(tmp_path), ROWS)
+    return ColumnarDocstore(str(tmp_path))
+
+
+def test_round_trip(docstore, tmp_path):
+    assert has_columnar(str(tmp_path))
+    assert len(docstore) == len(ROWS)
+    for row, (doc_id, doc) in enumerate(ROWS):
+        assert docstore.chunk_id(row) == doc_id
+        found = docstore.search(row)
+        assert (found.page_content, found.metadata) == (doc.page_content, doc.metadata)
+    # langchain passes the index_to_docstore_id value, which is the row
+    assert docstore.search('2').page_content == ROWS[2][1].page_content
+
+
+def test_rows_outside_the_store_are_not_found(docstore):
+    assert docstore.search(3) == 'ID 3 not found.'
+    assert docstore.search(-1) == 'ID -1 not found.'
+
+
+def test_to_in_memory(docstore):
+    in_memory, index_to_id = docstore.to_in_memory()
+    assert index_to_id == {0: 'id-a', 1: 'id-b', 2: 'id-c'}
+    assert in_memory.search('id-c').metadata == {'source': 'c.txt', 'row': 3}
+
+
+def test_empty_store(tmp_path):
+    write_columnar(str(tmp_path), [])
+    docstore = ColumnarDocstore(str(tmp_path))
+    assert len(docstore) == 0
+    assert docstore.search(0) == 'ID 0 not found.'
+    assert not has_columnar(str(tmp_path / 'nowhere'))
+
+
+def test_row_id_mapping():
+    mapping = RowIdMapping(3)
+    assert len(mapping) == 3
+    assert list(mapping) == [0, 1, 2]
+    assert dict(mapping.items()) == {0: 0, 1: 1, 2: 2}
+    assert mapping[2] == 2 and 1 in mapping
+    assert 3 not in mapping and -1 not in mapping
+    with pytest.raises(KeyError):
+        mapping[3]
+
+
+def test_saved_versions_open_memory_mapped(workspace, monkeypatch):
+    monkeypatch.setenv('DEDUP', '0')
+    (workspace / 'alice.txt').write_text('Alice Smith. Senior Python developer.', encoding='utf-8')
+    (workspace / 'bob.txt').write_text('Bob Jones. Data engineer, Spark and Airflow.', encoding='utf-8')
+    assert ResumeIngestor().ingest_documents()
+
+    writable = vectorstore_manager.get_vectorstore(writable=True)
+    served = vectorstore_manager.get_vectorstore()
+    assert isinstance(served.docstore, ColumnarDocstore)
+    assert isinstance(served.index_to_docstore_id, RowIdMapping)
+    assert len(served.index_to_docstore_id) == served.index.ntotal == writable.index.ntotal
+    for row, doc_id in writable.index_to_docstore_id.items():
+        assert served.docstore.chunk_id(row) == doc_id
+        assert served.docstore.search(row).page_content == writable.docstore.search(doc_id).page_content
+    hits = served.similarity_search('Bob Jones. Data engineer, Spark and Airflow.', k=1)
+    assert hits[0].metadata['source'].endswith('bob.txt')
@@ -0,0 +1,71 @@
+# tests/test_embedding_cache.py - on-disk embedding cache: LRU, sharing and reopening
+import numpy as np
+
+from app.embedding_cache import CachedEmbeddings, EmbeddingCache, cache_key
+
+
+def key(text):
+    return cache_key('model', True, text)
+
+
+def vector(value, dim=4):
+    return np.full((1, dim), value, dtype=np.float32)
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, capacity=2)
+    cache.put_many([key('a')], vector(1))
+    cache.put_many([key('b')], vector(2))
+    assert set(cache.get_many([key('a')])) == {key('a')}  # a is now the most recent
+    cache.put_many([key('c')], vector(3))
+    found = cache.get_many([key('a'), key('b'), key('c')])
+    assert set(found) == {key('a'), key('c')}
+    assert found[key('c')].tolist() == [3.0] * 4
+    assert cache.stats() == {'entries': 2, 'capacity': 2, 'hits': 3, 'misses': 1}
+
+
+def test_slot_key_is_rechecked_on_read(tmp_path):
+    # Two processes sharing the cache: the second still maps 'a' to a slot
+    # the first has since given to 'b'
+    first = EmbeddingCache(str(tmp_path), dim=4, capacity=1)
+    first.put_many([key('a')], vector(1))
+    second = EmbeddingCache(str(tmp_path), dim=4, capacity=1)
+    first.put_many([key('b')], vector(2))
+    assert second.get_many([key('a')]) == {}
+    assert second.stats()['misses'] == 1
+
+
+def test_reopening_restores_entries_and_lru_order(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, capacity=2)
+    cache.put_many([key('a'), key('b')], np.concatenate([vector(1), vector(2)]))
+    cache.get_many([key('a')])
+    cache.flush()
+
+    reopened = EmbeddingCache(str(tmp_path), dim=4, capacity=2)
+    assert reopened.get_many([key('b')])[key('b')].tolist() == [2.0] * 4
+    reopened.put_many([key('c')], vector(3))
+    assert set(reopened.get_many([key('a'), key('b'), key('c')])) == {key('b'), key('c')}
+
+
+def test_changed_shape_starts_empty(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dim=4, capacity=2)
+    cache.put_many([key('a')], vector(1))
+    cache.flush()
+    assert EmbeddingCache(str(tmp_path), dim=8, capacity=2).get_many([key('a')]) == {}
+
+
+def test_cached_embeddings_only_embed_unseen_texts(tmp_path):
+    model = CountingEmbeddings()
+    embeddings = CachedEmbeddings(model, 'model', True, str(tmp_path), max_bytes=1024)
+    assert embeddings.embed_documents(['ab', 'abc', 'ab']) == [[2.0, 1.0, 0.0], [3.0, 1.0, 0.0], [2.0, 1.0, 0.0]]
+    assert embeddings.embed_documents(['abc', 'abcd']) == [[3.0, 1.0, 0.0], [4.0, 1.0, 0.0]]
+    assert model.texts == ['ab', 'abc', 'abcd']
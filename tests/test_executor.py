@@ -0,0 +1,48 @@
+# tests/test_executor.py - BoundedExecutor capacity limits
+import asyncio
+import threading
+
+import pytest
+
+from app.executor import BoundedExecutor, ExecutorSaturated
+
+
+def test_rejects_beyond_workers_plus_queue():
+    executor = BoundedExecutor('test', max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        running = asyncio.ensure_future(executor.run(release.wait, 5))
+        queued = asyncio.ensure_future(executor.run(lambda: 'queued'))
+        await asyncio.sleep(0)
+        with pytest.raises(ExecutorSaturated, match='test executor is saturated'):
+            await executor.run(lambda: 'rejected')
+        assert executor.stats() == {'max_workers': 1, 'max_queue': 1, 'in_flight': 2, 'rejected': 1}
+        release.set()
+        assert await asyncio.gather(running, queued) == [True, 'queued']
+        # Finished tasks give their slots back
+        assert await executor.run(lambda: 'again') == 'again'
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert executor.stats()['in_flight'] == 0
+
+
+def test_errors_reach_the_caller_and_free_the_slot():
+    executor = BoundedExecutor('test', max_workers=1, max_queue=0)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    async def main():
+        with pytest.raises(RuntimeError, match='boom'):
+            await executor.run(fail)
+        assert await executor.run(lambda: 'ok') == 'ok'
+
+    try:
+        asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert executor.stats()['rejected'] == 0
@@ -0,0 +1,75 @@
+# tests/test_filters.py - FilterIndex postings and bitmap selectors
+import faiss
+import numpy as np
+import pytest
+
+from app.filters import FilterIndex, freeze_filters
+
+METADATAS = [
+    {'type': 'resume', 'source': 'a.pdf', 'section': 'skills'},
+    {'type': 'resume', 'source': 'a.pdf', 'section': 'experience'},
+    {'type': 'job_posting', 'source': 'jobs.csv', 'company': 'Acme'},
+    {'type': 'job_posting', 'source': 'jobs.csv', 'company': 'Globex'},
+    {'type': 'resume', 'source': 'b.pdf', 'section': 'skills'},
+    {'type': 'job_posting', 'source': 'jobs.csv', 'company': float('nan')},
+]
+
+
+@pytest.fixture
+def index():
+    return FilterIndex.build(METADATAS)
+
+
+def test_matching_rows(index):
+    assert index.matching_rows({'type': 'resume'}).tolist() == [0, 1, 4]
+    # Several values of a field: any of them
+    assert index.matching_rows({'company': ['Acme', 'Globex']}).tolist() == [2, 3]
+    # Several fields: all of them
+    assert index.matching_rows({'type': 'resume', 'section': 'skills'}).tolist() == [0, 4]
+    assert index.matching_rows({'type': 'resume', 'company': 'Acme'}).tolist() == []
+    assert index.matching_rows({'type': 'cover_letter'}).tolist() == []
+
+
+def test_missing_values_are_not_indexed(index):
+    assert index.ntotal == len(METADATAS)
+    assert index.values('company') == ['Acme', 'Globex']
+    assert index.values('section') == ['experience', 'skills']
+
+
+def test_unknown_field_is_rejected(index):
+    with pytest.raises(ValueError, match='tenant'):
+        index.matching_rows({'tenant': 'acme'})
+
+
+def test_selector_bitmap_marks_matching_rows(index):
+    selector = index.selector({'section': 'skills'})
+    assert selector.count == 2
+    bits = np.unpackbits(selector.bitmap, bitorder='little')[:index.ntotal]
+    assert np.flatnonzero(bits).tolist() == [0, 4]
+    assert [selector.selector.is_member(row) for row in range(index.ntotal)] == \
+        [row in (0, 4) for row in range(index.ntotal)]
+
+
+def test_selector_restricts_faiss_search(index):
+    vectors = np.random.default_rng(0).random((index.ntotal, 8), dtype=np.float32)
+    flat = faiss.IndexFlatL2(8)
+    flat.add(vectors)
+    selector = index.selector({'type': 'job_posting', 'company': ['Globex', 'Acme']})
+    _, rows = flat.search(vectors[:1], index.ntotal, params=faiss.SearchParameters(sel=selector.selector))
+    assert sorted(row for row in rows[0].tolist() if row >= 0) == [2, 3]
+
+
+def test_selectors_are_cached_by_filter(index):
+    first = index.selector({'type': ['resume', 'job_posting'], 'source': 'a.pdf'})
+    assert index.selector({'source': ['a.pdf'], 'type': ['job_posting', 'resume']}) is first
+    assert freeze_filters({'type': 'resume'}) == freeze_filters({'type': ['resume']})
+    assert freeze_filters({}) is None
+
+
+def test_save_and_load(index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = FilterIndex.load(str(tmp_path))
+    assert loaded.ntotal == index.ntotal
+    assert loaded.postings == index.postings
+    assert loaded.matching_rows({'type': 'job_posting'}).tolist() == [2, 3, 5]
+    assert FilterIndex.load(str(tmp_path / 'nowhere')) is None
@@ -0,0 +1,105 @@
+# tests/test_lexical.py - BM25 index and reciprocal-rank fusion
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from app.lexical import MAX_TERM_LENGTH, BM25Index, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    'Senior Python developer, Django and Postgres.',
+    'Java developer with Spring Boot; some Python scripting.',
+    'Data engineer: Spark, Airflow, Python, Python and more Python.',
+    'Frontend engineer working in React and TypeScript.',
+    'C++ and C# developer, node.js tooling, AWS-SAA-C03 certified.',
+]
+
+
+def reference_scores(query, k1=1.2, b=0.75):
+    """Okapi BM25 written out directly, to check the array implementation against"""
+    docs = [Counter(tokenize(text)) for text in TEXTS]
+    avg_length = sum(sum(doc.values()) for doc in docs) / len(docs)
+    scores = {}
+    for term in set(tokenize(query)):
+        df = sum(term in doc for doc in docs)
+        idf = math.log1p((len(docs) - df + 0.5) / (df + 0.5))
+        for row, doc in enumerate(docs):
+            if term in doc:
+                norm = k1 * (1 - b + b * sum(doc.values()) / avg_length)
+                scores[row] = scores.get(row, 0.0) + idf * doc[term] * (k1 + 1) / (doc[term] + norm)
+    return scores
+
+
+@pytest.fixture
+def index():
+    return BM25Index.build(TEXTS)
+
+
+def test_tokenize_keeps_technical_terms():
+    assert tokenize('C++, C#, Node.js and AWS-SAA-C03.') == ['c++', 'c#', 'node.js', 'and', 'aws-saa-c03']
+    assert tokenize('x' * (MAX_TERM_LENGTH + 1) + ' python') == ['python']
+
+
+def test_terms_are_sorted(index):
+    assert list(index.terms) == sorted(index.terms)
+    assert len(index.offsets) == len(index.terms) + 1
+
+
+@pytest.mark.parametrize('query', ['python developer', 'c++ node.js', 'typescript', 'python python engineer'])
+def test_scores_match_reference(index, query):
+    expected = reference_scores(query)
+    scores, rows = index.search(query, k=len(TEXTS))
+    assert sorted(rows.tolist()) == sorted(expected)
+    assert list(scores) == sorted(scores, reverse=True)
+    for score, row in zip(scores, rows):
+        assert score == pytest.approx(expected[row], rel=1e-5)
+
+
+def test_top_k(index):
+    scores, rows = index.search('python', k=2)
+    assert rows.tolist() == [2, 0]
+    assert len(scores) == 2
+
+
+def test_unknown_terms_and_prefixes_find_nothing(index):
+    for query in ('', 'kubernetes', 'pyth', 'pythons', 'x' * 200):
+        scores, rows = index.search(query, k=3)
+        assert len(scores) == len(rows) == 0
+
+
+def test_allowed_rows_restrict_results(index):
+    _, rows = index.search('python developer', k=5, allowed_rows=np.array([1, 3, 4]))
+    assert sorted(rows.tolist()) == [1, 4]
+    _, rows = index.search('python', k=5, allowed_rows=np.array([], dtype=np.int64))
+    assert len(rows) == 0
+
+
+def test_save_and_load_memory_mapped(index, tmp_path):
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    for name in ('terms', 'offsets', 'rows', 'tfs', 'doc_lengths'):
+        assert isinstance(getattr(loaded, name), np.memmap)
+        assert np.array_equal(getattr(loaded, name), getattr(index, name))
+    for query in ('python developer', 'aws-saa-c03 react'):
+        expected_scores, expected_rows = index.search(query, k=5)
+        scores, rows = loaded.search(query, k=5)
+        assert rows.tolist() == expected_rows.tolist()
+        assert np.allclose(scores, expected_scores)
+    assert BM25Index.load(str(tmp_path / 'nowhere')) is None
+
+
+def test_empty_index(tmp_path):
+    index = BM25Index.build([])
+    index.save(str(tmp_path))
+    scores, rows = BM25Index.load(str(tmp_path)).search('python', k=3)
+    assert len(scores) == len(rows) == 0
+
+
+def test_reciprocal_rank_fusion():
+    dense = [('a', 1), ('a', 2), ('b', 7)]
+    lexical = [('b', 7), ('a', 1), ('b', 9)]
+    # ('a', 1): 1/61 + 1/62; ('b', 7): 1/63 + 1/61; ('a', 2): 1/62; ('b', 9): 1/63
+    assert reciprocal_rank_fusion([dense, lexical], k=3) == [('a', 1), ('b', 7), ('a', 2)]
+    assert reciprocal_rank_fusion([[3, 1], [1]], k=10, rrf_k=0) == [1, 3]
+    assert reciprocal_rank_fusion([], k=5) == []
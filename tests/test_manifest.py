@@ -0,0 +1,117 @@
+# tests/test_manifest.py - manifest diffs and incremental ingestion
+import os
+
+from app.deps import vectorstore_manager
+from ingest.ingest import ResumeIngestor
+from ingest.manifest import IngestManifest, file_sha256
+
+TEXTS = {
+    'alice.txt': 'Alice Smith. Senior Python developer with ten years of backend work on Django and Postgres.',
+    'bob.txt': 'Bob Jones. Data engineer building Spark pipelines and Airflow schedules on AWS.',
+    'carol.txt': 'Carol White. Frontend engineer working in React, TypeScript and design systems.',
+}
+
+
+def write(raw, name, text):
+    (raw / name).write_text(text, encoding='utf-8')
+    return os.path.join('./data/raw', name)
+
+
+def ingest():
+    assert ResumeIngestor(batch_size=2).ingest_documents()
+    return IngestManifest.load(vectorstore_manager.current_path())
+
+
+def indexed_ids():
+    vectorstore = vectorstore_manager.get_vectorstore(writable=True)
+    ids = set(vectorstore.index_to_docstore_id.values())
+    assert vectorstore.index.ntotal == len(ids)
+    return ids
+
+
+def test_diff_classifies_files(tmp_path):
+    paths = {}
+    for name, text in TEXTS.items():
+        paths[name] = str(tmp_path / name)
+        (tmp_path / name).write_text(text, encoding='utf-8')
+    manifest = IngestManifest()
+    for path in paths.values():
+        manifest.record(path, file_sha256(path), [path + '#0'])
+
+    # Touched (new mtime, same bytes), modified, deleted and added
+    stat = os.stat(paths['alice.txt'])
+    os.utime(paths['alice.txt'], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    (tmp_path / 'bob.txt').write_text(TEXTS['bob.txt'] + ' Also Kafka.', encoding='utf-8')
+    os.remove(paths['carol.txt'])
+    dave = tmp_path / 'dave.txt'
+    dave.write_text('Dave Brown. Site reliability engineer.', encoding='utf-8')
+
+    diff = manifest.diff([paths['alice.txt'], paths['bob.txt'], str(dave)])
+    assert diff.new == [str(dave)]
+    assert diff.changed == [paths['bob.txt']]
+    assert diff.unchanged == [paths['alice.txt']]
+    assert diff.deleted == [paths['carol.txt']]
+    assert diff.to_load == [str(dave), paths['bob.txt']]
+    # Only the files whose size or mtime moved were hashed
+    assert set(diff.hashes) == {paths['alice.txt'], paths['bob.txt'], str(dave)}
+    # The touched file keeps its chunks with the new mtime, so it is not hashed next time
+    assert manifest.entries[paths['alice.txt']]['mtime'] == os.stat(paths['alice.txt']).st_mtime
+
+
+def test_manifest_round_trip(tmp_path):
+    manifest = IngestManifest({'a.txt': {'size': 1, 'mtime': 2.0, 'sha256': 'x', 'chunk_ids': ['1', '2']}})
+    manifest.save(str(tmp_path))
+    loaded = IngestManifest.load(str(tmp_path))
+    assert loaded.entries == manifest.entries
+    assert loaded.chunk_ids(['a.txt', 'missing.txt']) == ['1', '2']
+    assert IngestManifest.load(str(tmp_path / 'nowhere')).entries == {}
+
+
+def test_incremental_ingest_updates_index_in_place(workspace, monkeypatch):
+    monkeypatch.setenv('DEDUP', '0')
+    paths = {name: write(workspace, name, text) for name, text in TEXTS.items()}
+    manifest = ingest()
+    assert set(manifest.entries) == set(paths.values())
+    before = {path: entry['chunk_ids'] for path, entry in manifest.entries.items()}
+    assert all(before.values())
+    assert set(manifest.chunk_ids(list(paths.values()))) == indexed_ids()
+
+    deleted = []
+    delete_chunks = ResumeIngestor._delete_chunks
+
+    def record_delete(self, vectorstore, chunk_ids):
+        deleted.extend(chunk_ids)
+        delete_chunks(self, vectorstore, chunk_ids)
+
+    monkeypatch.setattr(ResumeIngestor, '_delete_chunks', record_delete)
+    write(workspace, 'bob.txt', TEXTS['bob.txt'] + ' Recently moved to Flink and Kafka streams.')
+    os.remove(workspace / 'carol.txt')
+    dave = write(workspace, 'dave.txt', 'Dave Brown. Site reliability engineer running Kubernetes.')
+    manifest = ingest()
+
+    # Changed and deleted files lose exactly their chunks; the unchanged file keeps its ids
+    assert sorted(deleted) == sorted(before[paths['bob.txt']] + before[paths['carol.txt']])
+    assert set(manifest.entries) == {paths['alice.txt'], paths['bob.txt'], dave}
+    assert manifest.entries[paths['alice.txt']]['chunk_ids'] == before[paths['alice.txt']]
+    assert not set(manifest.entries[paths['bob.txt']]['chunk_ids']) & set(before[paths['bob.txt']])
+    ids = indexed_ids()
+    assert set(manifest.chunk_ids(list(manifest.entries))) == ids
+    assert not ids & set(before[paths['carol.txt']])
+
+    # Nothing changed: no removals, no new version
+    deleted.clear()
+    version = vectorstore_manager.current_version()
+    ingest()
+    assert deleted == []
+    assert vectorstore_manager.current_version() == version
+    assert indexed_ids() == ids
+
+
+def test_full_rebuild_ignores_manifest(workspace, monkeypatch):
+    monkeypatch.setenv('DEDUP', '0')
+    path = write(workspace, 'alice.txt', TEXTS['alice.txt'])
+    first = ingest().entries[path]['chunk_ids']
+    assert ResumeIngestor().ingest_documents(full_rebuild=True)
+    manifest = IngestManifest.load(vectorstore_manager.current_path())
+    assert not set(manifest.entries[path]['chunk_ids']) & set(first)
+    assert set(manifest.entries[path]['chunk_ids']) == indexed_ids()
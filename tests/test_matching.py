@@ -0,0 +1,57 @@
+# tests/test_matching.py - blockwise job/resume top-k matching
+import numpy as np
+import pytest
+
+from app.matching import MatchEngine, MatchItem
+
+
+class TableEmbeddings:
+    """Fixed random vectors per text"""
+
+    def __init__(self, texts, dim=8):
+        rng = np.random.default_rng(0)
+        self.vectors = {text: rng.normal(size=dim).tolist() for text in texts}
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+
+JOBS = [MatchItem(f'job-{i}', f'job text {i}') for i in range(7)]
+RESUMES = [MatchItem(f'resume-{i}', f'resume text {i}') for i in range(5)]
+
+
+@pytest.fixture
+def engine():
+    embeddings = TableEmbeddings([item.text for item in JOBS + RESUMES])
+    return MatchEngine(embeddings, block_size=2, batch_size=3)
+
+
+def expected_scores(engine):
+    jobs = engine.embed([job.text for job in JOBS])
+    resumes = engine.embed([resume.text for resume in RESUMES])
+    return jobs @ resumes.T
+
+
+@pytest.mark.parametrize('k', [1, 3, 10])
+def test_blockwise_top_k_matches_full_scoring(engine, k):
+    scores = expected_scores(engine)
+    records = list(engine.match(JOBS, RESUMES, k))
+    assert [record['kind'] for record in records] == ['job'] * len(JOBS) + ['resume'] * len(RESUMES)
+    for record, row in zip(records[:len(JOBS)], scores):
+        best = np.argsort(-row, kind='stable')[:k]
+        assert [match['id'] for match in record['matches']] == [RESUMES[i].id for i in best]
+        assert [match['score'] for match in record['matches']] == pytest.approx(row[best].tolist(), abs=1e-5)
+    for record, column in zip(records[len(JOBS):], scores.T):
+        best = np.argsort(-column, kind='stable')[:k]
+        assert [match['id'] for match in record['matches']] == [JOBS[i].id for i in best]
+
+
+def test_nothing_to_match(engine):
+    assert list(engine.match([], RESUMES, 3)) == []
+    assert list(engine.match(JOBS, [], 3)) == []
+
+
+@pytest.mark.parametrize('k', [0, -1, True, 2.5, None])
+def test_invalid_k_is_rejected_before_any_output(engine, k):
+    with pytest.raises(ValueError, match='k must be a positive integer'):
+        engine.match(JOBS, RESUMES, k)
@@ -0,0 +1,63 @@
+# tests/test_shards.py - shard layout, discovery and query routing
+import pytest
+
+from app.filters import freeze_filters
+from app.shards import ShardLayout
+
+
+@pytest.fixture
+def by_type(tmp_path):
+    return ShardLayout(str(tmp_path / 'vectorstore'), 'type')
+
+
+@pytest.fixture
+def by_tenant(tmp_path):
+    raw = tmp_path / 'raw'
+    for tenant in ('acme', 'globex', 'initech'):
+        (raw / tenant).mkdir(parents=True)
+    (raw / 'loose.txt').write_text('not a tenant', encoding='utf-8')
+    layout = ShardLayout(str(tmp_path / 'vectorstore'), 'tenant')
+    assert layout.discover(str(raw)) == ['acme', 'globex', 'initech']
+    return layout
+
+
+def test_unfiltered_queries_go_to_every_shard(by_type):
+    assert by_type.route(None) == [('resumes', None), ('jobs', None)]
+
+
+def test_filter_excluding_a_shard_skips_it(by_type):
+    # The shard's routing value satisfies the filter, so it is dropped inside the shard
+    assert by_type.route({'type': 'job_posting'}) == [('jobs', None)]
+    assert by_type.route({'type': ['resume', 'job_posting']}) == [('resumes', None), ('jobs', None)]
+    assert by_type.route({'type': 'cover_letter'}) == []
+
+
+def test_other_filters_are_kept_for_the_shard(by_type):
+    assert by_type.route({'type': 'resume', 'section': 'skills'}) == \
+        [('resumes', freeze_filters({'section': 'skills'}))]
+    assert by_type.route(freeze_filters({'company': 'Acme'})) == \
+        [('resumes', freeze_filters({'company': 'Acme'})), ('jobs', freeze_filters({'company': 'Acme'}))]
+
+
+def test_tenant_routing(by_tenant):
+    assert [name for name, _ in by_tenant.route(None)] == ['acme', 'globex', 'initech']
+    assert by_tenant.route({'tenant': ['globex', 'umbrella'], 'type': 'resume'}) == \
+        [('globex', freeze_filters({'type': 'resume'}))]
+    assert by_tenant.shards['acme'].routing == {'tenant': ['acme']}
+
+
+def test_new_tenants_are_picked_up_by_other_layouts(by_tenant, tmp_path):
+    other = ShardLayout(by_tenant.root, 'tenant')
+    assert list(other.shards) == ['acme', 'globex', 'initech']
+    assert other.shards['acme'].store.vector_store_path == str(tmp_path / 'vectorstore' / 'shards' / 'acme')
+
+
+def test_unsharded_layout_has_one_default_shard(tmp_path):
+    layout = ShardLayout(str(tmp_path), 'none')
+    assert not layout.sharded
+    assert layout.route({'type': 'resume'}) == [('default', freeze_filters({'type': 'resume'}))]
+
+
+def test_unknown_mode_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match='SHARD_BY'):
+        ShardLayout(str(tmp_path), 'region')